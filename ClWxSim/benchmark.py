@@ -0,0 +1,281 @@
+"""Benchmark suite for the fluid_solver kernels and a full Controller tick, across grid sizes
+
+Usage:
+    python -m ClWxSim.benchmark --sizes 32 72 128 256 512 --output bench.json
+    python -m ClWxSim.benchmark --baseline bench.json
+
+Results are written as JSON, one entry per case and grid size holding the best and median time per call.
+Given a baseline file (an earlier output) each result is compared against it, and the exit code is 1 if any case
+has slowed down by more than the threshold.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from ClWxSim.data.World import World
+from ClWxSim.run import add_test_sources
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.sim.boundary import BOUNDARIES, get_boundary
+from ClWxSim.sim.workspace import Workspace
+import ClWxSim.sim.fluid_solver as solver
+
+DEFAULT_SIZES = (32, 72, 128, 256, 512)
+FORMAT_VERSION = 1
+
+def _fields(N, seed=0):
+    """returns a random density field and a random velocity field [u v], all of size N+2"""
+    rng = np.random.default_rng(seed)
+    shape = (N + 2, N + 2)
+    return rng.random(shape), rng.random(shape) - 0.5, rng.random(shape) - 0.5
+
+def _world(N, bnd):
+    """returns a World with the runner's test sources added"""
+    wld = World("benchmark World", wld_grid_size=N, boundary=bnd)
+    add_test_sources(wld)
+    return wld
+
+# Each case takes (N, backend, boundary policy) and returns a function that runs the case once
+
+def _add_source(N, backend, bnd):
+    x, s, _ = _fields(N)
+    ws = Workspace(N)
+    return lambda: solver.add_source(N, x, s, 0.1, ws)
+
+def _set_bnd(N, backend, bnd):
+    x, _, _ = _fields(N)
+    return lambda: solver.set_bnd(N, 1, x, bnd, backend)
+
+def _lin_solve(N, backend, bnd):
+    x0, _, _ = _fields(N)
+    x = np.zeros_like(x0)
+    ws = Workspace(N)
+    a = 0.1 * 0.00001 * N * N
+    return lambda: solver.lin_solve(N, 0, x, x0, a, 1 + 4 * a, bnd, backend, ws)
+
+def _diffuse(N, backend, bnd):
+    x0, _, _ = _fields(N)
+    x = np.zeros_like(x0)
+    ws = Workspace(N)
+
+    def run():
+        x[:] = 0
+        solver.diffuse(N, 0, x, x0, 0.00001, 0.1, bnd, backend, ws)
+    return run
+
+def _advect(N, backend, bnd):
+    d0, u, v = _fields(N)
+    d = np.zeros_like(d0)
+    ws = Workspace(N)
+    return lambda: solver.advect(N, 0, d, d0, u, v, 0.1, bnd=bnd, backend=backend, ws=ws)
+
+def _project(N, backend, bnd):
+    _, u0, v0 = _fields(N)
+    u, v = u0.copy(), v0.copy()
+    p = np.zeros_like(u)
+    div = np.zeros_like(u)
+    ws = Workspace(N)
+
+    def run():
+        u[:] = u0
+        v[:] = v0
+        solver.project(N, u, v, p, div, bnd, backend, ws)
+    return run
+
+def _coriolis(N, backend, bnd):
+    wld = World("benchmark World", wld_grid_size=N, boundary=bnd)
+    _, u, v = _fields(N)
+    return lambda: solver.coriolis(N, u, v, 0.1, wld.angular_vel, 1., wld, bnd, backend, wld.workspace)
+
+def _calc_pressure_grad(N, backend, bnd):
+    wld = _world(N, bnd)
+    return lambda: wld.calcPressureGrad(wld.air_pressure, wld.air_pressure_grad_u, wld.air_pressure_grad_v)
+
+def _tick(N, backend, bnd):
+    wld = _world(N, bnd)
+    sim = Controller(wld, backend=backend)
+    sim.begin_pgf_tick = 1
+    sim.running = True
+    return sim.tick
+
+CASES = {
+    "add_source": _add_source,
+    "set_bnd": _set_bnd,
+    "lin_solve": _lin_solve,
+    "diffuse": _diffuse,
+    "advect": _advect,
+    "project": _project,
+    "coriolis": _coriolis,
+    "calcPressureGrad": _calc_pressure_grad,
+    "tick": _tick,
+}
+
+def time_case(func, min_time=0.2, repeats=5):
+    """returns the best and median time (in seconds) of one call to func, and the number of calls timed
+
+    func is called once to warm up (eg fill the workspace and compile kernels), then timed in repeats batches,
+    each batch holding enough calls to take about min_time / repeats.
+
+    Args:
+        func (function): Takes no arguments
+        min_time (float, optional): Rough total time to spend timing, in seconds, defaults to 0.2
+        repeats (int, optional): Number of batches to time, defaults to 5
+    """
+
+    func()
+
+    start = time.perf_counter()
+    func()
+    once = max(time.perf_counter() - start, 1e-7)
+    number = max(1, int(min_time / repeats / once))
+
+    per_call = []
+    for r in range(repeats):
+        start = time.perf_counter()
+        for k in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number)
+
+    return min(per_call), statistics.median(per_call), number * repeats
+
+def run_benchmarks(sizes=DEFAULT_SIZES, cases=None, backend="numpy", boundary="walls", min_time=0.2, repeats=5, progress=None):
+    """Runs each case at each grid size and returns the results, in the form written to JSON
+
+    Args:
+        sizes (sequence of int, optional): Grid sizes to run, defaults to DEFAULT_SIZES
+        cases (sequence of str, optional): Names of the CASES to run, defaults to all of them
+        backend (str, optional): fluid_solver backend, defaults to "numpy"
+        boundary (str, optional): Boundary policy name, defaults to "walls"
+        min_time (float, optional): Rough time to spend timing each case at each size, in seconds, defaults to 0.2
+        repeats (int, optional): Number of batches to time each case in, defaults to 5
+        progress (function, optional): Called with each result as soon as it is ready
+    """
+
+    if cases is None:
+        cases = list(CASES)
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        raise ValueError("Unknown benchmark cases {}, expected some of {}".format(unknown, list(CASES)))
+
+    bnd = get_boundary(boundary)
+    backend = solver.resolve_backend(backend)
+
+    results = []
+    for N in sizes:
+        for name in cases:
+            best, median, calls = time_case(CASES[name](N, backend, bnd), min_time, repeats)
+            result = {"case": name, "N": N, "best_ms": 1000 * best, "median_ms": 1000 * median, "calls": calls}
+            results.append(result)
+            if progress is not None:
+                progress(result)
+
+    return {
+        "version": FORMAT_VERSION,
+        "meta": {
+            "backend": backend,
+            "boundary": boundary,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def compare(results, baseline, threshold=0.2):
+    """returns each result compared against the baseline, adding "baseline_ms", "ratio" and "status" to a copy of it
+
+    The status is "regression" if the best time has grown by more than threshold, "improvement" if it has
+    shrunk by more than threshold, "ok" otherwise, or "new" if the baseline has no result for that case and size.
+
+    Args:
+        results (dict): Output of run_benchmarks
+        baseline (dict): An earlier output of run_benchmarks
+        threshold (float, optional): Fractional change in best time that counts as a regression or improvement, defaults to 0.2
+    """
+
+    base = {(r["case"], r["N"]): r for r in baseline["results"]}
+
+    compared = []
+    for r in results["results"]:
+        r = dict(r)
+        b = base.get((r["case"], r["N"]))
+        if b is None:
+            r["status"] = "new"
+        else:
+            r["baseline_ms"] = b["best_ms"]
+            r["ratio"] = r["best_ms"] / b["best_ms"] if b["best_ms"] > 0 else float("inf")
+            if r["ratio"] > 1 + threshold:
+                r["status"] = "regression"
+            elif r["ratio"] < 1 / (1 + threshold):
+                r["status"] = "improvement"
+            else:
+                r["status"] = "ok"
+        compared.append(r)
+    return compared
+
+def parse_args(argv=None):
+    """returns the parsed command line arguments
+
+    Args:
+        argv (list of str, optional): Arguments to parse, defaults to sys.argv[1:]
+    """
+
+    parser = argparse.ArgumentParser(prog="python -m ClWxSim.benchmark", description="Benchmark the ClWxSim solver kernels and a full tick")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="grid sizes to run (default: %(default)s)")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="cases to run (default: all)")
+    parser.add_argument("--backend", choices=solver.BACKENDS, default="numpy", help="solver backend (default: %(default)s)")
+    parser.add_argument("--boundary", choices=sorted(BOUNDARIES), default="walls", help="boundary policy (default: %(default)s)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="rough seconds to spend timing each case at each size (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=5, help="batches to time each case in (default: %(default)s)")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to, printed if not given")
+    parser.add_argument("--baseline", default=None, help="JSON file of earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="fractional slow down counted as a regression (default: %(default)s)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Runs the benchmarks from the command line and returns the exit code, 1 if any regressions were found
+
+    Args:
+        argv (list of str, optional): Command line arguments, defaults to sys.argv[1:]
+    """
+
+    args = parse_args(argv)
+
+    def progress(r):
+        print("{:<18} N={:<5} best {:>10.4f} ms  median {:>10.4f} ms".format(r["case"], r["N"], r["best_ms"], r["median_ms"]), file=sys.stderr)
+
+    results = run_benchmarks(args.sizes, args.cases, args.backend, args.boundary, args.min_time, args.repeats, progress)
+
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results["comparison"] = compare(results, baseline, args.threshold)
+        results["meta"]["baseline"] = args.baseline
+        for r in results["comparison"]:
+            if r["status"] != "ok":
+                print("{:<11} {:<18} N={:<5} {}".format(r["status"], r["case"], r["N"],
+                      "{:.2f}x baseline".format(r["ratio"]) if "ratio" in r else "no baseline result"), file=sys.stderr)
+        regressions = [r for r in results["comparison"] if r["status"] == "regression"]
+
+    text = json.dumps(results, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if regressions:
+        print("{} regression(s) against {}".format(len(regressions), args.baseline), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
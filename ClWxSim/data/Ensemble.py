@@ -0,0 +1,63 @@
+from ClWxSim.data.World import World
+import numpy as np
+
+class Ensemble(World):
+    """A set of Worlds that share a grid, stored as stacked arrays so they can be simulated in a single pass
+
+    Every world data array has shape (members, N+2, N+2), member k of the ensemble is array[k].
+    Members differ in their initial state (eg perturbations added to air_pressure[k]) and in their parameters.
+    Parameters (angular_vel, dt, diff, visc and starting_pressure) are either one float shared by every member,
+    or an array of shape (members, 1, 1) which broadcasts across the member axis, see member_param.
+
+    A Controller steps every member of an Ensemble with each tick, exactly as it would a single World.
+
+    Attributes:
+        members (int): Number of worlds in the ensemble
+    """
+
+    def __init__(self, world_name, members, data_loc="", wld_grid_size=72, grid_sq_size=100, atmos_height=8.5, starting_pressure=1013., angular_vel = .000072, boundary="walls", dt=None, diff=None, visc=None):
+        """Creates a new Ensemble object, arguments not listed here are as for World
+
+        Args:
+            world_name (str): The name to give the Ensemble
+            members (int): Number of worlds in the ensemble
+            wld_grid_size (int, optional): Height and Width excluding boundary cells of every member's data arrays, defaults to 72
+            starting_pressure (float or sequence, optional): Starting pressure, or one per member, defaults to 1013 mbar
+            angular_vel (float or sequence, optional): Angular velocity of planet (in rad/s), or one per member, defaults to earth (ie .000072)
+            boundary (str or boundary policy, optional): Boundary policy shared by every member, defaults to "walls"
+            dt (float or sequence, optional): Length of each tick, or one per member, defaults to World.dt
+            diff (float or sequence, optional): Pressure diffusion rate, or one per member, defaults to World.diff
+            visc (float or sequence, optional): Wind diffusion rate, or one per member, defaults to World.visc
+        """
+
+        if members < 1:
+            raise ValueError("An Ensemble needs at least one member, not {}".format(members))
+        self.members = members
+
+        super().__init__(world_name, data_loc, wld_grid_size, grid_sq_size, atmos_height, self.member_param(starting_pressure), self.member_param(angular_vel), boundary)
+
+        if dt is not None:
+            self.dt = self.member_param(dt)
+        if diff is not None:
+            self.diff = self.member_param(diff)
+        if visc is not None:
+            self.visc = self.member_param(visc)
+
+    @property
+    def field_shape(self):
+        """returns the shape of every world data array"""
+        return (self.members, self.grid_size, self.grid_size)
+
+    def member_param(self, value):
+        """returns a parameter in the form the solver broadcasts across members
+
+        Args:
+            value (float or sequence): One value shared by every member (returned as a float), or one value per member (returned as a (members, 1, 1) array)
+        """
+
+        arr = np.asarray(value, dtype=float)
+        if arr.ndim == 0:
+            return float(arr)
+        if arr.size != self.members:
+            raise ValueError("Expected one value per member ({}), got {}".format(self.members, arr.size))
+        return arr.reshape(self.members, 1, 1)
@@ -0,0 +1,41 @@
+import numpy as np
+
+class Geometry:
+    """Planetary geometry of a World's grid, which only depends on the grid size and angular velocity
+
+    Per row values are stored as (N+2, 1) column arrays so they broadcast across a whole (N+2, N+2) field.
+    If angular_vel is an array of one value per Ensemble member, shape (K, 1, 1), coriolis_f has shape (K, N+2, 1).
+
+    Attributes:
+        N (int): Size of the grid excluding boundary cells
+        angular_vel (float or array): Angular velocity of planet the cache was built for, measured in rad/s
+        lat (float array): Latitude of each row, measured in degrees, row 0 is the south pole
+        sin_lat (float array): Sine of the latitude of each row
+        cos_lat (float array): Cosine of the latitude of each row, the relative width of a cell at that row
+        coriolis_f (float array): Coriolis parameter of each row (2 * angular_vel * sin(lat)), measured in rad/s
+    """
+
+    def __init__(self, N, angular_vel):
+        """Creates a new Geometry cache
+
+        Args:
+            N (int): Size of the grid excluding boundary cells
+            angular_vel (float or array): Angular velocity of planet, measured in rad/s, or one per member with shape (K, 1, 1)
+        """
+
+        self.N = N
+        self.angular_vel = angular_vel
+
+        # Latitude is linear in the row number (see fluid_solver.calc_lat)
+        rows = np.arange(N + 2, dtype=float)
+        self.lat = (-(((N - rows) / N * 180) - 90))[:, np.newaxis]
+
+        lat_rad = np.radians(self.lat)
+        self.sin_lat = np.sin(lat_rad)
+        self.cos_lat = np.cos(lat_rad)
+
+        self.coriolis_f = 2 * angular_vel * self.sin_lat
+
+    def matches(self, N, angular_vel):
+        """returns True if this cache was built for the given grid size and angular velocity"""
+        return self.N == N and np.array_equal(self.angular_vel, angular_vel)
@@ -1,4 +1,8 @@
 from ClWxSim.utils.logging import Logger
+from ClWxSim.data import checkpoint
+from ClWxSim.data.Geometry import Geometry
+from ClWxSim.sim.boundary import get_boundary
+from ClWxSim.sim.workspace import Workspace
 import numpy as np
 
 class World:
@@ -21,6 +25,9 @@ class World:
         atmos_height (float): Height of the World's atmosphere assuming a uniform density, measured in km
         grid_sq_vol (float): An esimation of the volume of air a grid square holds, measured in km^3
         angular_vel (float): Angular velocity of planet, measured in rad/s
+        geometry (Geometry): Cached latitude and Coriolis values for the grid, see get_geometry
+        boundary (boundary policy): How the edges of the grid are treated by the solver, see ClWxSim.sim.boundary
+        workspace (Workspace): Scratch arrays reused by the solver every tick
     """
 
     # -- Attributes --
@@ -33,7 +40,7 @@ class World:
 
     # -- Functions --
 
-    def __init__(self, world_name, data_loc="", wld_grid_size=72, grid_sq_size=100, atmos_height=8.5, starting_pressure=1013., angular_vel = .000072):
+    def __init__(self, world_name, data_loc="", wld_grid_size=72, grid_sq_size=100, atmos_height=8.5, starting_pressure=1013., angular_vel = .000072, boundary="walls"):
         """Creates a new World object
 
         Args:
@@ -43,6 +50,7 @@ class World:
             grid_sq_size (int, optional): Height and Width of each grid square (in km), defaults to 100 km
             atmos_height (float, optional): Height of the World's atmosphere assuming a uniform density, defaults to 8.5 km
             angular_vel (float, optional): Angular velocity of planet (in rad/s), defaults to earth (ie .000072)
+            boundary (str or boundary policy, optional): Boundary policy, or its name ("walls", "periodic" or "polar"), defaults to "walls"
         """
 
         # Set attrs
@@ -54,30 +62,37 @@ class World:
         self.wld_grid_size = wld_grid_size
         self.grid_size = wld_grid_size + 2
         self.angular_vel = angular_vel
+        self.boundary = get_boundary(boundary)
         # self.grid_sq_size = grid_sq_size
         # self.atmos_height = atmos_height
 
         # self.grid_sq_vol = atmos_height * (grid_sq_size ** 2)
 
+        # Cache values that only depend on the grid size and angular velocity
+        self.geometry = Geometry(self.wld_grid_size, self.angular_vel)
+
+        # Scratch arrays for the solver, kept for the life of the World so ticks do not allocate
+        self.workspace = Workspace(self.wld_grid_size)
+
         # Create debuging data arrays (e.g. coriolis force map)
-        self.dbg_coriolis_u = np.zeros((self.grid_size, self.grid_size))
-        self.dbg_coriolis_v = np.zeros((self.grid_size, self.grid_size))
+        self.dbg_coriolis_u = np.zeros(self.field_shape)
+        self.dbg_coriolis_v = np.zeros(self.field_shape)
 
         # Create world data arrays
-        self.air_vel_u = np.zeros((self.grid_size, self.grid_size))    # x wind velocity map
-        self.air_vel_u_prev = np.zeros((self.grid_size, self.grid_size))
+        self.air_vel_u = np.zeros(self.field_shape)    # x wind velocity map
+        self.air_vel_u_prev = np.zeros(self.field_shape)
 
-        self.air_vel_v = np.zeros((self.grid_size, self.grid_size))    # y wind velocity map
-        self.air_vel_v_prev = np.zeros((self.grid_size, self.grid_size))
+        self.air_vel_v = np.zeros(self.field_shape)    # y wind velocity map
+        self.air_vel_v_prev = np.zeros(self.field_shape)
 
-        self.air_pressure = np.full((self.grid_size, self.grid_size), starting_pressure)  # pressure map
-        self.air_pressure_prev = np.full((self.grid_size, self.grid_size), starting_pressure)
+        self.air_pressure = np.full(self.field_shape, starting_pressure)  # pressure map
+        self.air_pressure_prev = np.full(self.field_shape, starting_pressure)
 
-        self.air_pressure_grad_u = np.zeros((self.grid_size, self.grid_size))   # pressure gradient (x and y)
-        self.air_pressure_grad_v = np.zeros((self.grid_size, self.grid_size))
+        self.air_pressure_grad_u = np.zeros(self.field_shape)   # pressure gradient (x and y)
+        self.air_pressure_grad_v = np.zeros(self.field_shape)
 
-        self.air_pressure_grad_u_prev = np.zeros((self.grid_size, self.grid_size))  # previous pressure gradient (x and y)
-        self.air_pressure_grad_v_prev = np.zeros((self.grid_size, self.grid_size))
+        self.air_pressure_grad_u_prev = np.zeros(self.field_shape)  # previous pressure gradient (x and y)
+        self.air_pressure_grad_v_prev = np.zeros(self.field_shape)
 
         # self.air_humidity = np.zeros((grid_size, grid_size))
         #
@@ -94,65 +109,92 @@ class World:
         # Setup Logger
         self.logger = Logger(log_ID="world-{}".format(self.world_name))
 
-        self.logger.log("{} instantiated".format(self.world_name))
+        self.logger.log("{} instantiated", self.world_name)
 
     def clear_data(self):
         """clear all weather data"""
 
-        self.air_vel_u = np.zeros((self.grid_size, self.grid_size))    # x wind velocity map
-        self.air_vel_u_prev = np.zeros((self.grid_size, self.grid_size))
+        self.dbg_coriolis_u = np.zeros(self.field_shape)
+        self.dbg_coriolis_v = np.zeros(self.field_shape)
+
+        self.air_vel_u = np.zeros(self.field_shape)    # x wind velocity map
+        self.air_vel_u_prev = np.zeros(self.field_shape)
+
+        self.air_vel_v = np.zeros(self.field_shape)    # y wind velocity map
+        self.air_vel_v_prev = np.zeros(self.field_shape)
+
+        self.air_pressure = np.full(self.field_shape, self.starting_pressure)  # pressure map
+        self.air_pressure_prev = np.full(self.field_shape, self.starting_pressure)
 
-        self.air_vel_v = np.zeros((self.grid_size, self.grid_size))    # y wind velocity map
-        self.air_vel_v_prev = np.zeros((self.grid_size, self.grid_size))
+        self.air_pressure_grad_u = np.zeros(self.field_shape)   # pressure gradient (x and y)
+        self.air_pressure_grad_v = np.zeros(self.field_shape)
 
-        self.air_pressure = np.full((self.grid_size, self.grid_size), self.starting_pressure)  # pressure map
-        self.air_pressure_prev = np.full((self.grid_size, self.grid_size), self.starting_pressure)
+        self.air_pressure_grad_u_prev = np.zeros(self.field_shape)  # previous pressure gradient (x and y)
+        self.air_pressure_grad_v_prev = np.zeros(self.field_shape)
 
-        self.air_pressure_grad_u_prev = np.zeros((self.grid_size, self.grid_size))  # previous pressure gradient (x and y)
-        self.air_pressure_grad_v_prev = np.zeros((self.grid_size, self.grid_size))
+        self.get_geometry()
+        if self.workspace.N != self.wld_grid_size:
+            self.workspace = Workspace(self.wld_grid_size)
 
-    def calcPressureGrad(self, pressure):
-        """returns the u and v pressure gradient maps"""
+    @property
+    def field_shape(self):
+        """returns the shape of every world data array"""
+        return (self.grid_size, self.grid_size)
 
-        # Get gradient of high pressure areas
-        p_grad = np.gradient(pressure)
+    def get_geometry(self):
+        """returns the Geometry cache, rebuilding it first if the grid size or angular velocity has changed"""
 
-        p_grad_u = np.zeros((self.grid_size,self.grid_size))
-        p_grad_v = np.zeros((self.grid_size,self.grid_size))
+        if not self.geometry.matches(self.wld_grid_size, self.angular_vel):
+            self.geometry = Geometry(self.wld_grid_size, self.angular_vel)
+        return self.geometry
+
+    def calcPressureGrad(self, pressure, p_grad_u=None, p_grad_v=None):
+        """returns the u and v pressure gradient maps (pointing from high to low pressure)
+
+        Matches -np.gradient(pressure): central differences inside the array, one sided differences at its edges.
+
+        Args:
+            pressure (float array): The pressure map
+            p_grad_u (float array, optional): Array to store the u gradient in, a new array is made if not given
+            p_grad_v (float array, optional): Array to store the v gradient in, a new array is made if not given
+        """
 
-        p_grad_u[0:self.grid_size,0:self.grid_size] = -p_grad[1][0:self.grid_size,0:self.grid_size]
-        p_grad_v[0:self.grid_size,0:self.grid_size] = -p_grad[0][0:self.grid_size,0:self.grid_size]
+        if p_grad_u is None:
+            p_grad_u = np.zeros(pressure.shape)
+        if p_grad_v is None:
+            p_grad_v = np.zeros(pressure.shape)
+
+        # u gradient is along the last axis, v gradient is along the one before it
+        for grad, fwd, back, mid, first, second, last, before_last in (
+                (p_grad_u, np.s_[..., 2:], np.s_[..., :-2], np.s_[..., 1:-1], np.s_[..., 0], np.s_[..., 1], np.s_[..., -1], np.s_[..., -2]),
+                (p_grad_v, np.s_[..., 2:, :], np.s_[..., :-2, :], np.s_[..., 1:-1, :], np.s_[..., 0, :], np.s_[..., 1, :], np.s_[..., -1, :], np.s_[..., -2, :])):
+            np.subtract(pressure[back], pressure[fwd], out=grad[mid])
+            grad[mid] *= 0.5
+            np.subtract(pressure[first], pressure[second], out=grad[first])
+            np.subtract(pressure[before_last], pressure[last], out=grad[last])
 
         return p_grad_u, p_grad_v
 
-    # def load(self):
-    #     try:
-    #         np.load(data_loc+"air_humidity.cws")
-    #         np.load(data_loc+"air_vectors.cws")
-    #         np.load(data_loc+"air_temp.cws")
-    #         np.load(data_loc+"air_pressure.cws")
-    #         np.load(data_loc+"air_precip.cws")
-    #
-    #         np.load(data_loc+"ground_temp.cws")
-    #         np.load(data_loc+"ground_height.cws")
-    #         np.load(data_loc+"ground_water.cws")
-    #
-    #         self.logger.log("{} loaded".format(world_name))
-    #     except Exception as e:
-    #         self.logger.log("{} failed loading: [{e}]".format(world_name, e))
-    #
-    # def save(self):
-    #     try:
-    #         np.save(data_loc+"air_humidity.cws", self.air_humidity)
-    #         np.save(data_loc+"air_vectors.cws", self.air_vectors)
-    #         np.save(data_loc+"air_temp.cws", self.air_temp)
-    #         np.save(data_loc+"air_pressure.cws", self.air_pressure)
-    #         np.save(data_loc+"air_precip.cws", self.air_precip)
-    #
-    #         np.save(data_loc+"ground_temp.cws", self.ground_temp)
-    #         np.save(data_loc+"ground_height.cws", self.ground_height)
-    #         np.save(data_loc+"ground_water.cws", self.ground_water)
-    #
-    #         self.logger.log("{} saved".format(world_name))
-    #     except Exception as e:
-    #         self.logger.log("{} failed saving: [{}]".format(world_name, e))
+    @staticmethod
+    def load(path, mmap=True):
+        """returns the World (or Ensemble) saved in a checkpoint file, see ClWxSim.data.checkpoint
+
+        Args:
+            path (str): Location of the checkpoint file
+            mmap (bool, optional): If true the World's arrays are mapped (copy on write) from the file instead of read, defaults to True
+        """
+        return checkpoint.restore_world(path, mmap)
+
+    def save(self, path):
+        """Saves the World's arrays and parameters to a checkpoint file, see ClWxSim.data.checkpoint
+
+        Args:
+            path (str): Location of the checkpoint file, replaced if it already exists
+        """
+
+        try:
+            checkpoint.save(path, self)
+            self.logger.log("{} saved to {}", self.world_name, path)
+        except Exception as e:
+            self.logger.error("{} failed saving: [{}]", self.world_name, e)
+            raise
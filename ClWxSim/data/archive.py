@@ -0,0 +1,311 @@
+"""Contains the ArchiveWriter, which streams World fields to disk every few ticks, and the Archive that reads them back lazily
+
+An archive is a folder holding:
+    - meta.json: the fields, frame shape and dtype, decimation, tick interval, chunk length and compression
+    - ticks.bin and times.bin: the tick number (int64) and simulated time (float64) of every frame
+    - for each field, either <field>.raw, its frames stored raw one after another (no compression),
+      or <field>.zchunks, chunks of chunk_frames frames each compressed with zlib, with <field>.zindex
+      holding the (offset, length, frames) of each chunk
+
+Frames are appended as they come, only one chunk per field is kept in memory (none without compression),
+and the reader works out the number of frames from the files, so every frame written before a crash can be read
+(for compressed archives, every frame of the chunks written).
+Raw fields are read through memory maps, compressed fields decompress only the chunks a slice touches.
+"""
+
+import json
+import os
+import zlib
+
+import numpy as np
+
+FORMAT_VERSION = 1
+COMPRESSIONS = (None, "zlib")
+
+# World arrays archived if no fields are given
+DEFAULT_FIELDS = ("air_pressure", "air_vel_u", "air_vel_v")
+
+class ArchiveWriter:
+    """Appends frames of a World's fields to an archive folder, see the module docstring
+
+    Attributes:
+        path (str): The archive folder
+        fields (tuple of str): Names of the World arrays archived
+        every (int): Tick interval between frames, see after_tick
+        decimate (int): Only every decimate'th row and column of each field is kept
+        dtype (numpy dtype): Type the fields are stored as
+        compression (str or None): "zlib", or None to store frames raw
+        chunk_frames (int): Frames per compressed chunk
+        frames (int): Number of frames appended so far
+    """
+
+    def __init__(self, path, fields=DEFAULT_FIELDS, every=1, decimate=1, dtype=np.float32, compression=None, chunk_frames=16, level=1):
+        """Creates a new archive folder (replacing any archive already there) ready to append frames to
+
+        Args:
+            path (str): Folder to write the archive to, created if needed
+            fields (tuple of str, optional): World arrays to archive, defaults to DEFAULT_FIELDS
+            every (int, optional): Archive a frame every this many ticks, see after_tick, defaults to 1
+            decimate (int, optional): Keep every decimate'th row and column, defaults to 1 (every cell)
+            dtype (numpy dtype, optional): Type to store the fields as, None to keep the World's type, defaults to float32
+            compression (str, optional): "zlib" to compress each chunk losslessly, defaults to None (raw, memory mappable)
+            chunk_frames (int, optional): Frames per compressed chunk, defaults to 16
+            level (int, optional): zlib compression level, defaults to 1 (fastest)
+        """
+
+        if compression not in COMPRESSIONS:
+            raise ValueError("Unknown compression '{}', expected one of {}".format(compression, COMPRESSIONS))
+        if every < 1 or decimate < 1 or chunk_frames < 1:
+            raise ValueError("every, decimate and chunk_frames must be at least 1")
+
+        self.path = path
+        self.fields = tuple(fields)
+        self.every = every
+        self.decimate = decimate
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.compression = compression
+        self.chunk_frames = chunk_frames
+        self.level = level
+        self.frames = 0
+
+        self._shape = None
+        self._files = {}
+        self._chunks = {}       # Frames of the chunk being filled, per field (compressed archives only)
+
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name in ("meta.json", "ticks.bin", "times.bin") or name.endswith((".raw", ".zchunks", ".zindex")):
+                os.remove(os.path.join(path, name))
+
+    def after_tick(self, sim):
+        """Appends a frame of the Controller's World if one is due after its latest tick"""
+        if sim.tickNum % self.every == 0:
+            self.append(sim.world, sim.tickNum, float(np.max(sim.sim_time)))
+
+    def append(self, world, tick, time=0.):
+        """Appends one frame of the World's fields
+
+        Args:
+            world (World): The World to archive
+            tick (int): The World's tick number
+            time (float, optional): The World's simulated time, defaults to 0
+        """
+
+        frame = {name: self._decimated(getattr(world, name)) for name in self.fields}
+        if self._shape is None:
+            self._open(frame[self.fields[0]])
+
+        for name, arr in frame.items():
+            if arr.shape != self._shape:
+                raise ValueError("{} has shape {}, the archive's frames are {}".format(name, arr.shape, self._shape))
+            if self.compression is None:
+                self._files[name].write(memoryview(arr).cast("B"))
+            else:
+                self._chunks[name].append(arr)
+
+        self._files["ticks"].write(np.int64(tick).tobytes())
+        self._files["times"].write(np.float64(time).tobytes())
+        self.frames += 1
+
+        if self.compression is not None and self.frames % self.chunk_frames == 0:
+            self._flush_chunks()
+
+    def _decimated(self, arr):
+        arr = arr[..., ::self.decimate, ::self.decimate]
+        if self.compression is None:
+            # Written out straight away, so a view of the World's array will do
+            return np.ascontiguousarray(arr, dtype=self.dtype or arr.dtype)
+        return np.array(arr, dtype=self.dtype or arr.dtype, order="C")
+
+    def _open(self, first):
+        """Opens the archive's files and writes its metadata, once the first frame gives the frame shape"""
+
+        self._shape = first.shape
+        self.dtype = first.dtype
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "fields": self.fields,
+                "shape": list(self._shape),
+                "dtype": self.dtype.str,
+                "every": self.every,
+                "decimate": self.decimate,
+                "compression": self.compression,
+                "chunk_frames": self.chunk_frames,
+            }, f, indent=1)
+
+        for name in ("ticks", "times"):
+            self._files[name] = open(os.path.join(self.path, name + ".bin"), "wb")
+        for name in self.fields:
+            if self.compression is None:
+                self._files[name] = open(os.path.join(self.path, name + ".raw"), "wb")
+            else:
+                self._files[name] = open(os.path.join(self.path, name + ".zchunks"), "wb")
+                self._files[name + ".zindex"] = open(os.path.join(self.path, name + ".zindex"), "wb")
+                self._chunks[name] = []
+
+    def _flush_chunks(self):
+        """Compresses and writes the chunk being filled of every field"""
+
+        for name, frames in self._chunks.items():
+            if not frames:
+                continue
+            data = zlib.compress(np.stack(frames).tobytes(), self.level)
+            f = self._files[name]
+            offset = f.tell()
+            f.write(data)
+            # The index entry is written after the chunk, so an index entry always points at a whole chunk
+            f.flush()
+            index = self._files[name + ".zindex"]
+            index.write(np.array([offset, len(data), len(frames)], dtype=np.int64).tobytes())
+            index.flush()
+            frames.clear()
+
+    def flush(self):
+        """Writes everything appended so far to disk, including a compressed archive's part filled chunk
+
+        A part filled chunk is written as a chunk of its own, so flushing a compressed archive often makes it larger.
+        """
+
+        if self.compression is not None:
+            self._flush_chunks()
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        """Flushes and closes the archive, nothing can be appended afterwards"""
+
+        if self._files:
+            self.flush()
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Archive:
+    """Reads an archive written by an ArchiveWriter, archive[field] gives a FieldSeries to slice lazily
+
+    Attributes:
+        path (str): The archive folder
+        meta (dict): The archive's metadata, see ArchiveWriter
+        fields (tuple of str): Names of the archived fields
+        ticks (int64 array): Tick number of each frame
+        times (float64 array): Simulated time of each frame
+    """
+
+    def __init__(self, path):
+        """Opens an archive folder
+
+        Args:
+            path (str): The archive folder
+        """
+
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["version"] > FORMAT_VERSION:
+            raise ValueError("{} is a version {} archive, this version of ClWxSim reads up to version {}".format(path, self.meta["version"], FORMAT_VERSION))
+
+        self.fields = tuple(self.meta["fields"])
+        self.shape = tuple(self.meta["shape"])
+        self.dtype = np.dtype(self.meta["dtype"])
+
+        # A frame only counts once every one of its files holds it
+        frames = [os.path.getsize(os.path.join(path, "ticks.bin")) // 8, os.path.getsize(os.path.join(path, "times.bin")) // 8]
+        self._series = {name: FieldSeries(self, name) for name in self.fields}
+        frames += [len(series._stored) for series in self._series.values()]
+        self.frames = min(frames)
+
+        self.ticks = np.fromfile(os.path.join(path, "ticks.bin"), dtype=np.int64, count=self.frames)
+        self.times = np.fromfile(os.path.join(path, "times.bin"), dtype=np.float64, count=self.frames)
+
+    def __len__(self):
+        return self.frames
+
+    def __getitem__(self, field):
+        return self._series[field]
+
+    def tick_slice(self, start=None, stop=None):
+        """returns the slice of frames from tick start up to (not including) tick stop, either may be None for no limit"""
+        first = 0 if start is None else int(np.searchsorted(self.ticks, start, side="left"))
+        last = self.frames if stop is None else int(np.searchsorted(self.ticks, stop, side="left"))
+        return slice(first, last)
+
+class FieldSeries:
+    """The frames of one archived field, indexed like a (frames, ...frame shape) array without reading it all
+
+    Indexing with a frame index or slice, optionally followed by indices or slices of the frame, reads only the frames
+    (and for compressed archives, the chunks) that are needed, eg series[10:20, 5:40, 5:40].
+    """
+
+    def __init__(self, archive, name):
+        self.archive = archive
+        self.name = name
+        if archive.meta["compression"] is None:
+            frame_bytes = int(np.prod(archive.shape)) * archive.dtype.itemsize
+            path = os.path.join(archive.path, name + ".raw")
+            count = os.path.getsize(path) // frame_bytes if frame_bytes else 0
+            self._stored = np.memmap(path, dtype=archive.dtype, mode="r", shape=(count,) + archive.shape) if count else np.zeros((0,) + archive.shape, archive.dtype)
+            self._index = None
+        else:
+            index = np.fromfile(os.path.join(archive.path, name + ".zindex"), dtype=np.int64)
+            self._index = index[:len(index) // 3 * 3].reshape(-1, 3)
+            self._starts = np.concatenate(([0], np.cumsum(self._index[:, 2])))
+            self._stored = range(int(self._starts[-1]))
+            self._cache = (None, None)
+
+    @property
+    def shape(self):
+        return (self.archive.frames,) + self.archive.shape
+
+    def __len__(self):
+        return self.archive.frames
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        frames, region = key[0], key[1:]
+
+        if isinstance(frames, (int, np.integer)):
+            if not -len(self) <= frames < len(self):
+                raise IndexError("frame {} is out of range for {} frames".format(frames, len(self)))
+            return self._read(slice(frames % len(self), frames % len(self) + 1))[(0,) + region]
+        if not isinstance(frames, slice):
+            raise TypeError("frames can only be selected by an index or a slice, not {}".format(type(frames).__name__))
+        return self._read(frames)[(slice(None),) + region]
+
+    def _read(self, frames):
+        """returns the frames selected by a slice, a memory map view for raw archives"""
+
+        start, stop, step = frames.indices(len(self))
+        if self._index is None:
+            return self._stored[start:stop:step]
+
+        wanted = np.arange(start, stop, step)
+        out = np.empty((len(wanted),) + self.archive.shape, self.archive.dtype)
+        if not len(wanted):
+            return out
+        chunks = np.searchsorted(self._starts, wanted, side="right") - 1
+        for chunk in np.unique(chunks):
+            data = self._chunk(chunk)
+            mask = chunks == chunk
+            out[mask] = data[wanted[mask] - self._starts[chunk]]
+        return out
+
+    def _chunk(self, chunk):
+        """returns the decompressed frames of one chunk, the last chunk read is kept"""
+
+        if self._cache[0] == chunk:
+            return self._cache[1]
+        offset, length, count = self._index[chunk]
+        with open(os.path.join(self.archive.path, self.name + ".zchunks"), "rb") as f:
+            f.seek(offset)
+            data = zlib.decompress(f.read(length))
+        frames = np.frombuffer(data, dtype=self.archive.dtype).reshape((int(count),) + self.archive.shape)
+        self._cache = (chunk, frames)
+        return frames
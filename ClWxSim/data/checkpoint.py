@@ -0,0 +1,264 @@
+"""Contains functions for saving a simulation's state to a checkpoint file and restoring it, and the Checkpointer that saves them in the background
+
+A checkpoint is a single file:
+    - MAGIC, then the format version and the length of the header, both little endian uint32
+    - the header, JSON holding the World's (or Ensemble's) parameters, the Controller's state and where each array is
+    - each of the World's FIELDS, stored raw (C order) starting on a multiple of ALIGN bytes
+
+So restoring maps the arrays straight out of the file, with nothing to parse but the header. They are mapped
+copy on write, ticks change the restored World without ever changing the file.
+"""
+
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+from ClWxSim.utils.logging import Logger
+
+MAGIC = b"CLWXCKPT"
+FORMAT_VERSION = 1
+ALIGN = 64          # Arrays start on a multiple of this many bytes
+
+# World arrays stored in every checkpoint
+FIELDS = ("air_vel_u", "air_vel_v", "air_vel_u_prev", "air_vel_v_prev", "air_pressure", "air_pressure_prev",
+          "air_pressure_grad_u", "air_pressure_grad_v", "air_pressure_grad_u_prev", "air_pressure_grad_v_prev",
+          "dbg_coriolis_u", "dbg_coriolis_v")
+
+# Controller attributes stored in every checkpoint
+CONTROLLER_STATE = ("tickNum", "sim_time", "begin_pgf_tick", "adaptive_dt", "max_dt_scale", "pgf_modifier", "coriolis_modifier", "wind_modifier")
+
+_prefix = struct.Struct("<8sII")
+
+def _param(value):
+    """returns a World parameter (a float, or one value per member) in a form JSON can store"""
+    if value is None or np.ndim(value) == 0:
+        return value if value is None or isinstance(value, (bool, int)) else float(value)
+    return np.asarray(value, dtype=float).ravel().tolist()
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+def capture(world, sim=None):
+    """returns (header, arrays), a copy of everything a checkpoint holds, see write
+
+    The copies are taken at once, so the checkpoint can be written later (eg on another thread) while ticks carry on.
+
+    Args:
+        world (World or Ensemble): The World to copy
+        sim (Controller, optional): The Controller whose state (tick number, simulated time, ...) to copy
+    """
+
+    header = {
+        "version": FORMAT_VERSION,
+        "world": {
+            "type": "Ensemble" if hasattr(world, "members") else "World",
+            "world_name": world.world_name,
+            "members": getattr(world, "members", None),
+            "wld_grid_size": world.wld_grid_size,
+            "boundary": world.boundary.name,
+            "starting_pressure": _param(world.starting_pressure),
+            "angular_vel": _param(world.angular_vel),
+            "dt": _param(world.dt),
+            "diff": _param(world.diff),
+            "visc": _param(world.visc),
+        },
+        "controller": None if sim is None else dict({name: _param(getattr(sim, name)) for name in CONTROLLER_STATE}, backend=sim.backend),
+    }
+    return header, {name: np.array(getattr(world, name), order="C") for name in FIELDS}
+
+def write(path, header, arrays):
+    """Writes a checkpoint file, first to "<path>.tmp" which then replaces path, so path always holds a whole checkpoint
+
+    Args:
+        path (str): Location of the checkpoint file
+        header (dict): Header from capture, the arrays' locations are added to it
+        arrays (dict): Arrays from capture
+    """
+
+    header = dict(header, arrays={})
+    offset = 0
+    for name, arr in arrays.items():
+        header["arrays"][name] = {"offset": offset, "shape": list(arr.shape), "dtype": arr.dtype.str}
+        offset = _aligned(offset + arr.nbytes)
+
+    text = json.dumps(header).encode("utf-8")
+    start = _aligned(_prefix.size + len(text))
+    for entry in header["arrays"].values():
+        entry["offset"] += start
+    # Offsets are written into the header, so its length may have grown, move the arrays along until it fits
+    while True:
+        text = json.dumps(header).encode("utf-8")
+        needed = _aligned(_prefix.size + len(text))
+        if needed <= start:
+            break
+        for entry in header["arrays"].values():
+            entry["offset"] += needed - start
+        start = needed
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_prefix.pack(MAGIC, FORMAT_VERSION, len(text)))
+        f.write(text)
+        for name, arr in arrays.items():
+            f.seek(header["arrays"][name]["offset"])
+            f.write(memoryview(np.ascontiguousarray(arr)).cast("B"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def save(path, world, sim=None):
+    """Saves a checkpoint of the World (and the Controller's state, if given) to path
+
+    Args:
+        path (str): Location of the checkpoint file
+        world (World or Ensemble): The World to save
+        sim (Controller, optional): The Controller running the World
+    """
+    write(path, *capture(world, sim))
+
+def read_header(path):
+    """returns the header of a checkpoint file, raising ValueError if it is not a checkpoint this version can read"""
+
+    with open(path, "rb") as f:
+        prefix = f.read(_prefix.size)
+        if len(prefix) < _prefix.size:
+            raise ValueError("{} is not a ClWxSim checkpoint".format(path))
+        magic, version, length = _prefix.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError("{} is not a ClWxSim checkpoint".format(path))
+        if version > FORMAT_VERSION:
+            raise ValueError("{} is a version {} checkpoint, this version of ClWxSim reads up to version {}".format(path, version, FORMAT_VERSION))
+        return json.loads(f.read(length).decode("utf-8"))
+
+def load(path, mmap=True):
+    """returns (header, arrays) from a checkpoint file
+
+    Args:
+        path (str): Location of the checkpoint file
+        mmap (bool, optional): If true the arrays are mapped (copy on write) from the file, if false they are read into memory, defaults to True
+    """
+
+    header = read_header(path)
+    arrays = {}
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode="c")
+        for name, entry in header["arrays"].items():
+            arrays[name] = np.ndarray(tuple(entry["shape"]), dtype=np.dtype(entry["dtype"]), buffer=data, offset=entry["offset"])
+    else:
+        with open(path, "rb") as f:
+            for name, entry in header["arrays"].items():
+                dtype = np.dtype(entry["dtype"])
+                f.seek(entry["offset"])
+                arrays[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(entry["shape"]))).reshape(entry["shape"])
+    return header, arrays
+
+def restore_world(path, mmap=True):
+    """returns a new World (or Ensemble) holding the state saved in a checkpoint file
+
+    Args:
+        path (str): Location of the checkpoint file
+        mmap (bool, optional): If true the World's arrays are mapped from the file, see load, defaults to True
+    """
+
+    # Imported here as World imports the solver, which does not need to know about checkpoints
+    from ClWxSim.data.Ensemble import Ensemble
+    from ClWxSim.data.World import World
+
+    header, arrays = load(path, mmap)
+    params = header["world"]
+    if params["type"] == "Ensemble":
+        world = Ensemble(params["world_name"], params["members"], wld_grid_size=params["wld_grid_size"], starting_pressure=params["starting_pressure"],
+                         angular_vel=params["angular_vel"], boundary=params["boundary"], dt=params["dt"], diff=params["diff"], visc=params["visc"])
+    else:
+        world = World(params["world_name"], wld_grid_size=params["wld_grid_size"], starting_pressure=params["starting_pressure"],
+                      angular_vel=params["angular_vel"], boundary=params["boundary"])
+        world.dt, world.diff, world.visc = params["dt"], params["diff"], params["visc"]
+
+    for name, arr in arrays.items():
+        if arr.shape != world.field_shape:
+            raise ValueError("{} in {} has shape {}, expected {}".format(name, path, arr.shape, world.field_shape))
+        setattr(world, name, arr)
+    return world
+
+def restore_state(sim, header):
+    """Sets a Controller's tick number, simulated time and other state to those in a checkpoint header"""
+
+    state = header.get("controller")
+    if state is None:
+        return
+    for name in CONTROLLER_STATE:
+        value = state[name]
+        if isinstance(value, list):
+            value = np.reshape(value, (-1, 1, 1))
+        setattr(sim, name, value)
+
+class Checkpointer:
+    """Saves checkpoints of a Controller every few ticks, written to disk on a background thread
+
+    The World is copied on the tick thread (a memory copy, quick next to a tick), then written while ticks carry on.
+    If the last checkpoint is still being written when the next is due, the next is skipped rather than waiting.
+
+    Attributes:
+        path (str): Location of the checkpoint file, may hold "{tick}" to keep a file per checkpoint
+        every (int): Tick interval between checkpoints
+        written (int): Number of checkpoints written
+        skipped (int): Number of checkpoints skipped because the last was still being written
+        error (Exception or None): The error raised by the last write, if it failed
+    """
+
+    def __init__(self, path, every):
+        """Creates a new Checkpointer
+
+        Args:
+            path (str): Location of the checkpoint file, may hold "{tick}" which is replaced by the tick number
+            every (int): Save a checkpoint every this many ticks
+        """
+
+        if every < 1:
+            raise ValueError("Checkpoints must be at least 1 tick apart, not {}".format(every))
+
+        self.path = path
+        self.every = every
+        self.written = 0
+        self.skipped = 0
+        self.error = None
+        self.logger = Logger(log_ID="checkpointer")
+
+        from concurrent.futures import ThreadPoolExecutor   # Imported here, most runs never save checkpoints
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ClWxSim checkpoint")
+        self._future = None
+        self._lock = threading.Lock()
+
+    def after_tick(self, sim):
+        """Starts writing a checkpoint if one is due after the Controller's latest tick"""
+
+        if sim.tickNum % self.every != 0:
+            return
+        if self._future is not None and not self._future.done():
+            self.skipped += 1
+            self.logger.warning("Checkpoint for tick {} skipped, the last is still being written", sim.tickNum)
+            return
+
+        header, arrays = capture(sim.world, sim)
+        self._future = self._executor.submit(self._write, self.path.format(tick=sim.tickNum), header, arrays)
+
+    def _write(self, path, header, arrays):
+        try:
+            write(path, header, arrays)
+            with self._lock:
+                self.written += 1
+        except Exception as e:
+            self.error = e
+            self.logger.error("Error writing checkpoint {}: [{}]", path, e)
+
+    def wait(self):
+        """Waits for the checkpoint being written (if any) to be finished"""
+        if self._future is not None:
+            self._future.result()
+
+    def close(self):
+        """Finishes the checkpoint being written (if any) and stops the background thread"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,270 @@
+"""Contains Stations, which record the values of a few cells of a World every tick into ring buffers, and read, which loads the samples they write to disk
+
+Each station is a cell, given by its x (column) and y (row) or by its latitude and longitude. After every tick each
+field is gathered at every station at once (one np.take per field) straight into a slot of a preallocated ring
+buffer, so recording costs next to nothing per tick and never allocates. The buffers hold the last capacity
+samples, read them with series, ticks and times.
+
+Given a path, samples are written to disk in bulk rather than overwritten: whenever the buffers fill up, and on
+flush and close. The path is a folder holding:
+    - meta.json: the stations, fields, sample shape and dtype
+    - ticks.bin and times.bin: the tick number (int64) and simulated time (float64) of every sample
+    - <field>.raw for each field, its samples stored raw one after another
+
+Rows are taken to be linear in latitude, row 0 at the south pole (see fluid_solver.calc_lat), and columns likewise
+to be linear in longitude, from -180 to 180 degrees.
+"""
+
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# World arrays recorded if no fields are given, the values SimTestsPage shows for a cell
+DEFAULT_FIELDS = ("air_pressure", "air_vel_u", "air_vel_v", "dbg_coriolis_u", "dbg_coriolis_v")
+
+def cell_at(N, lat, lon):
+    """returns the (x, y) of the central cell nearest a latitude and longitude, see the module docstring
+
+    Args:
+        N (int): Size of the grid excluding boundary cells
+        lat (float): Latitude, measured in degrees from -90 (south pole) to 90
+        lon (float): Longitude, measured in degrees from -180 to 180
+    """
+
+    y = int(round((lat + 90) / 180 * N))
+    x = int(round((lon + 180) / 360 * N))
+    return min(max(x, 1), N), min(max(y, 1), N)
+
+class Stations:
+    """Records a World's fields at a set of cells after every tick, see the module docstring
+
+    Attributes:
+        world (World or Ensemble): The World the stations are in
+        fields (tuple of str): Names of the World arrays recorded
+        capacity (int): Number of samples the ring buffers hold
+        path (str or None): Folder samples are written to, see flush
+        names (list of str): Name of each station, in the order of the last axis of each series
+        count (int): Number of samples recorded so far, including any no longer in the buffers
+        written (int): Number of samples written to path so far
+    """
+
+    def __init__(self, world, fields=DEFAULT_FIELDS, capacity=1024, path=None, dtype=None):
+        """Creates a new Stations with no stations, add them with add, then add it to a Controller's observers to start recording
+
+        Args:
+            world (World or Ensemble): The World to record
+            fields (tuple of str, optional): World arrays to record, defaults to DEFAULT_FIELDS
+            capacity (int, optional): Number of samples the ring buffers hold, defaults to 1024
+            path (str, optional): Folder to write samples to (replacing any samples already there), defaults to None (old samples are overwritten)
+            dtype (numpy dtype, optional): Type to store samples as, defaults to None (the World's type)
+        """
+
+        if capacity < 1:
+            raise ValueError("Stations need a capacity of at least 1 sample, not {}".format(capacity))
+
+        self.world = world
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.path = path
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.names = []
+        self.count = 0
+        self.written = 0
+
+        self._cells = []        # (x, y) of each station
+        self._index = None      # Flat index of each station's cell in a field
+        self._buffers = {}
+        self._ticks = np.zeros(capacity, dtype=np.int64)
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._files = {}
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            for name in os.listdir(path):
+                if name in ("meta.json", "ticks.bin", "times.bin") or name.endswith(".raw"):
+                    os.remove(os.path.join(path, name))
+
+    def add(self, name, x=None, y=None, lat=None, lon=None):
+        """Adds a station at a cell, given either by x and y or by lat and lon, and returns its (x, y)
+
+        Stations can only be added before the first sample is recorded.
+
+        Args:
+            name (str): Name of the station
+            x (int, optional): Column of the cell, boundary cells are 0 and N+1
+            y (int, optional): Row of the cell, boundary cells are 0 and N+1
+            lat (float, optional): Latitude of the station, measured in degrees, see cell_at
+            lon (float, optional): Longitude of the station, measured in degrees, see cell_at
+        """
+
+        if self.count:
+            raise RuntimeError("Stations can only be added before the first sample is recorded")
+        if name in self.names:
+            raise ValueError("There is already a station named '{}'".format(name))
+        if lat is not None or lon is not None:
+            if x is not None or y is not None or lat is None or lon is None:
+                raise ValueError("Give a station either an x and y or a lat and lon")
+            x, y = cell_at(self.world.wld_grid_size, lat, lon)
+        elif x is None or y is None:
+            raise ValueError("Give a station either an x and y or a lat and lon")
+
+        size = self.world.grid_size
+        if not (0 <= x < size and 0 <= y < size):
+            raise ValueError("Cell ({}, {}) is outside the {} by {} grid".format(x, y, size, size))
+
+        self.names.append(name)
+        self._cells.append((int(x), int(y)))
+        self._index = None
+        return self._cells[-1]
+
+    def cells(self):
+        """returns the (x, y) of every station"""
+        return list(self._cells)
+
+    def _allocate(self):
+        """Works out each station's flat index and allocates the ring buffers, once the stations are known"""
+
+        if not self.names:
+            raise RuntimeError("No stations have been added")
+        size = self.world.grid_size
+        self._index = np.array([y * size + x for x, y in self._cells], dtype=np.intp)
+        for name in self.fields:
+            arr = getattr(self.world, name)
+            # Ensemble fields have a leading member axis, which is kept
+            shape = (self.capacity,) + arr.shape[:-2] + (len(self.names),)
+            self._buffers[name] = np.zeros(shape, dtype=self.dtype or arr.dtype)
+
+    def after_tick(self, sim):
+        """Records a sample of the Controller's World after its latest tick"""
+        self.sample(sim.world, sim.tickNum, float(np.max(sim.sim_time)))
+
+    def sample(self, world, tick, time=0.):
+        """Records the World's fields at every station into the next slot of the ring buffers
+
+        If the buffers are full and samples have not been written to path yet, they are written first.
+
+        Args:
+            world (World): The World to sample, must have the same grid as the one the stations were added to
+            tick (int): The World's tick number
+            time (float, optional): The World's simulated time, defaults to 0
+        """
+
+        if self._index is None:
+            self._allocate()
+        if self.path is not None and self.count - self.written == self.capacity:
+            self.flush()
+
+        slot = self.count % self.capacity
+        for name, buffer in self._buffers.items():
+            arr = getattr(world, name)
+            # The indices were checked in add, so clip mode skips the check (and the copy it needs)
+            np.take(arr.reshape(arr.shape[:-2] + (-1,)), self._index, axis=-1, out=buffer[slot], mode="clip")
+        self._ticks[slot] = tick
+        self._times[slot] = time
+        self.count += 1
+
+    def _slots(self, start=None):
+        """returns the ring buffer slots of the samples from sample number start (default the oldest held) onwards, oldest first"""
+
+        first = max(self.count - self.capacity, 0 if start is None else start)
+        return np.arange(first, self.count) % self.capacity
+
+    def series(self, field, station=None):
+        """returns a copy of the samples of a field held by the buffers, oldest first
+
+        The array has shape (samples, stations), or (samples, members, stations) for an Ensemble.
+
+        Args:
+            field (str): Name of the field
+            station (str, optional): Only return this station's samples, dropping the last axis, defaults to None (every station)
+        """
+
+        if field not in self.fields:
+            raise KeyError("'{}' is not recorded, the fields are {}".format(field, self.fields))
+        if self._index is None:
+            return np.zeros((0,) + (() if station is not None else (len(self.names),)))
+        samples = self._buffers[field][self._slots()]
+        if station is not None:
+            return samples[..., self.names.index(station)]
+        return samples
+
+    def ticks(self):
+        """returns the tick number of each sample held by the buffers, oldest first"""
+        return self._ticks[self._slots()]
+
+    def times(self):
+        """returns the simulated time of each sample held by the buffers, oldest first"""
+        return self._times[self._slots()]
+
+    def _open(self):
+        """Opens the files in path and writes its metadata, once the first samples are flushed"""
+
+        sample = self._buffers[self.fields[0]]
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "stations": [{"name": name, "x": x, "y": y} for name, (x, y) in zip(self.names, self._cells)],
+                "fields": self.fields,
+                "shape": list(sample.shape[1:]),
+                "dtype": sample.dtype.str,
+            }, f, indent=1)
+
+        for name in ("ticks", "times"):
+            self._files[name] = open(os.path.join(self.path, name + ".bin"), "wb")
+        for name in self.fields:
+            self._files[name] = open(os.path.join(self.path, name + ".raw"), "wb")
+
+    def flush(self):
+        """Writes every sample not written yet to path, in one write per file"""
+
+        if self.path is None or self.written == self.count:
+            return
+        if not self._files:
+            self._open()
+
+        slots = self._slots(self.written)
+        for name in self.fields:
+            self._files[name].write(self._buffers[name][slots].tobytes())
+        self._files["ticks"].write(self._ticks[slots].tobytes())
+        self._files["times"].write(self._times[slots].tobytes())
+        for f in self._files.values():
+            f.flush()
+        self.written = self.count
+
+    def close(self):
+        """Flushes and closes the files in path, the buffers can still be read afterwards"""
+
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read(path):
+    """returns a dict of the samples written to a Stations folder: "stations" (the station names), "cells" (their (x, y)),
+    "tick", "time" and a (samples, ..., stations) array per field
+
+    Args:
+        path (str): The Stations folder
+    """
+
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError("{} holds station samples of format version {}, expected {}".format(path, meta["version"], FORMAT_VERSION))
+
+    data = {"stations": [station["name"] for station in meta["stations"]],
+            "cells": [(station["x"], station["y"]) for station in meta["stations"]],
+            "tick": np.fromfile(os.path.join(path, "ticks.bin"), dtype=np.int64),
+            "time": np.fromfile(os.path.join(path, "times.bin"), dtype=np.float64)}
+    for name in meta["fields"]:
+        data[name] = np.fromfile(os.path.join(path, name + ".raw"), dtype=np.dtype(meta["dtype"])).reshape([-1] + meta["shape"])
+    return data
@@ -0,0 +1,325 @@
+"""Headless batch runner, runs a simulation at full speed without Tk, matplotlib or keyboard input
+
+Usage:
+    python -m ClWxSim.run --size 100 --ticks 1000 --output-dir out/ --output-every 100
+
+Each output is a .npz file holding the pressure and wind arrays, named "<world name>_<tick>.npz".
+Once the run is finished the tick rate, and the simulated seconds run per wall clock second, are printed.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from ClWxSim.data.World import World
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.sim.boundary import BOUNDARIES
+import ClWxSim.sim.fluid_solver as solver
+
+OUTPUT_FIELDS = ("air_pressure", "air_vel_u", "air_vel_v")   # World arrays written to each output file
+
+def add_test_sources(wld):
+    """Adds the standard test sources (a low and a high pressure cell and a light breeze), placed relative to the grid size
+
+    Args:
+        wld (World): The World to add the sources to
+    """
+
+    N = wld.wld_grid_size
+    added_p_grid = np.zeros((wld.grid_size, wld.grid_size))
+    for i, j, p in ((N // 5, N // 2, -15.), (N // 2, 7 * N // 10, 15.)):
+        added_p_grid[i, j] = p
+        added_p_grid[i - 1, j] = p
+        added_p_grid[i + 1, j] = p
+        added_p_grid[i, j - 1] = p
+        added_p_grid[i, j + 1] = p
+
+    added_u_grid = np.zeros((wld.grid_size, wld.grid_size))
+    added_u_grid[1:wld.grid_size-1, 1:wld.grid_size-1] = .0001
+
+    added_v_grid = np.zeros((wld.grid_size, wld.grid_size))
+    added_v_grid[1:wld.grid_size-1, 1:wld.grid_size-1] = .0001
+
+    solver.add_source(N, wld.air_pressure, added_p_grid, wld.dt)
+    solver.add_source(N, wld.air_vel_u, added_u_grid, wld.dt)
+    solver.add_source(N, wld.air_vel_v, added_v_grid, wld.dt)
+
+def add_file_sources(wld, path):
+    """Adds sources stored in a .npz file, which may hold any of the arrays named in OUTPUT_FIELDS
+
+    Args:
+        wld (World): The World to add the sources to
+        path (str): Location of the .npz file, its arrays must be the same size as the World's
+    """
+
+    with np.load(path) as sources:
+        for name in OUTPUT_FIELDS:
+            if name in sources:
+                solver.add_source(wld.wld_grid_size, getattr(wld, name), sources[name], wld.dt)
+
+def write_output(wld, tick, output_dir):
+    """Writes the World's OUTPUT_FIELDS to "<output_dir>/<world name>_<tick>.npz" and returns the file's location
+
+    Args:
+        wld (World): The World to save
+        tick (int): The tick number to name the file with
+        output_dir (str): Folder to write to, must already exist
+    """
+
+    path = os.path.join(output_dir, "{}_{}.npz".format(wld.world_name, tick))
+    np.savez(path, tick=tick, **{name: getattr(wld, name) for name in OUTPUT_FIELDS})
+    return path
+
+def run(sim, ticks, output_dir=None, output_every=0, report_every=0):
+    """Runs ticks in a tight loop and returns the timings
+
+    Args:
+        sim (Controller): The Controller to run, it is set running for the length of the run
+        ticks (int): Number of ticks to run
+        output_dir (str, optional): Folder to write outputs to (created if needed), no outputs are written if not given
+        output_every (int, optional): Write an output every this many ticks, 0 to only write one after the last tick
+        report_every (int, optional): Print progress every this many ticks, 0 for no progress reports
+
+    Returns:
+        dict: "ticks" run, "tick_time" and "output_time" (total seconds spent in each), "ticks_per_s", "ms_per_tick",
+            "sim_time" (simulated seconds run), "sim_rate" (simulated seconds per second spent ticking) and "outputs" (list of files written)
+    """
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    tick_time = 0.
+    output_time = 0.
+    outputs = []
+    sim_start = sim.sim_time
+
+    sim.running = True
+    try:
+        for k in range(1, ticks + 1):
+            start = time.perf_counter()
+            sim.tick()
+            tick_time += time.perf_counter() - start
+
+            if output_dir is not None and ((output_every and k % output_every == 0) or k == ticks):
+                start = time.perf_counter()
+                outputs.append(write_output(sim.world, sim.tickNum, output_dir))
+                output_time += time.perf_counter() - start
+
+            if report_every and k % report_every == 0:
+                print("Reached tick {} ({:.1f} ticks/s)".format(sim.tickNum, k / tick_time if tick_time else float("inf")))
+    finally:
+        sim.running = False
+
+    return {
+        "ticks": ticks,
+        "tick_time": tick_time,
+        "output_time": output_time,
+        "ticks_per_s": ticks / tick_time if tick_time else float("inf"),
+        "ms_per_tick": 1000 * tick_time / ticks if ticks else 0.,
+        "sim_time": sim.sim_time - sim_start,
+        "sim_rate": (sim.sim_time - sim_start) / tick_time if tick_time else 0.,
+        "outputs": outputs,
+    }
+
+def print_profile(report):
+    """Prints a Profiler report as a table of mean ms per tick and share of the tick for each phase and kernel
+
+    Args:
+        report (dict): A report from Profiler.report
+    """
+
+    ticks = max(report["ticks"], 1)
+    tick_total = report["tick"]["total"] or 1.
+    print("{:<20} {:>10} {:>12} {:>7}".format("", "calls", "ms/tick", "%"))
+    for kind in ("phases", "kernels"):
+        print(kind.capitalize())
+        for name, t in sorted(report[kind].items(), key=lambda item: -item[1]["total"]):
+            print("  {:<18} {:>10} {:>12.3f} {:>7.1f}".format(name, t["calls"], 1000 * t["total"] / ticks, 100 * t["total"] / tick_total))
+    print("{:<20} {:>10} {:>12.3f} {:>7.1f}".format("Whole tick", report["ticks"], 1000 * report["tick"]["total"] / ticks, 100.))
+
+def parse_station(text, kind=int):
+    """returns (name, a, b) from a "name=a,b" command line argument, a and b converted with kind"""
+
+    name, sep, values = text.partition("=")
+    values = values.split(",")
+    try:
+        if not name or not sep or len(values) != 2:
+            raise ValueError(text)
+        return name, kind(values[0]), kind(values[1])
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected name=a,b, not '{}'".format(text))
+
+def parse_station_latlon(text):
+    """returns (name, lat, lon) from a "name=lat,lon" command line argument"""
+    return parse_station(text, float)
+
+def parse_args(argv=None):
+    """returns the parsed command line arguments
+
+    Args:
+        argv (list of str, optional): Arguments to parse, defaults to sys.argv[1:]
+    """
+
+    parser = argparse.ArgumentParser(prog="python -m ClWxSim.run", description="Run a ClWxSim simulation without a UI")
+    parser.add_argument("--name", default="world", help="world name, used to name output files (default: %(default)s)")
+    parser.add_argument("--size", type=int, default=100, help="grid size excluding boundary cells (default: %(default)s)")
+    parser.add_argument("--ticks", type=int, default=1000, help="number of ticks to run (default: %(default)s)")
+    parser.add_argument("--starting-pressure", type=float, default=1013., help="starting pressure in mbar (default: %(default)s)")
+    parser.add_argument("--angular-vel", type=float, default=.000072, help="planet's angular velocity in rad/s (default: %(default)s)")
+    parser.add_argument("--boundary", choices=sorted(BOUNDARIES), default="walls", help="boundary policy (default: %(default)s)")
+    parser.add_argument("--backend", choices=solver.BACKENDS, default="numpy", help="solver backend (default: %(default)s)")
+    parser.add_argument("--begin-pgf-tick", type=int, default=Controller.begin_pgf_tick, help="tick the pressure gradient force is first applied on (default: %(default)s)")
+    parser.add_argument("--sources", default="test", help="initial sources, 'test' for the standard test sources, 'none', or a .npz file of arrays to add (default: %(default)s)")
+    parser.add_argument("--output-dir", default=None, help="folder to write .npz outputs to, no outputs are written if not given")
+    parser.add_argument("--output-every", type=int, default=0, help="write an output every this many ticks, 0 for only after the last tick (default: %(default)s)")
+    parser.add_argument("--report-every", type=int, default=0, help="print progress every this many ticks, 0 for none (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=1, help="threads to split the solver kernels between, by strips of rows (default: %(default)s)")
+    parser.add_argument("--tiles", type=int, default=0, help="split each tick into this many strips of rows, one worker process each, 0 to run in this process (default: %(default)s)")
+    parser.add_argument("--adaptive-dt", action="store_true", help="choose each tick's length from the wind speed, sub-stepping when World.dt would not be stable and taking longer steps when the wind is calm")
+    parser.add_argument("--max-dt-scale", type=float, default=Controller.max_dt_scale, help="longest adaptive tick as a multiple of World.dt (default: %(default)s)")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file to save the run to, may hold {tick} to keep one file per checkpoint")
+    parser.add_argument("--checkpoint-every", type=int, default=0, help="save a checkpoint every this many ticks, written in the background, 0 for only after the last tick (default: %(default)s)")
+    parser.add_argument("--restore", default=None, help="checkpoint file to carry on from, instead of starting a new World (the grid, boundary and world parameters come from the checkpoint)")
+    parser.add_argument("--archive", default=None, help="folder to stream pressure and wind frames to, read them back with ClWxSim.data.archive.Archive")
+    parser.add_argument("--archive-every", type=int, default=1, help="archive a frame every this many ticks (default: %(default)s)")
+    parser.add_argument("--archive-decimate", type=int, default=1, help="archive every this many'th row and column (default: %(default)s)")
+    parser.add_argument("--archive-float64", action="store_true", help="archive frames as float64 rather than float32")
+    parser.add_argument("--archive-compress", action="store_true", help="compress archived frames with zlib, in chunks (compressed archives are not memory mapped when read)")
+    parser.add_argument("--frames", default=None, help="images to render of the pressure and wind, a .png path holding {tick} (eg frames/world_{tick}.png) for an image sequence, or a video file (eg run.mp4 or run.gif) written with ffmpeg, rendered by worker processes with matplotlib")
+    parser.add_argument("--frames-every", type=int, default=1, help="render a frame every this many ticks (default: %(default)s)")
+    parser.add_argument("--frames-processes", type=int, default=1, help="worker processes rendering frames (default: %(default)s)")
+    parser.add_argument("--frames-fps", type=float, default=30., help="frame rate of a --frames video (default: %(default)s)")
+    parser.add_argument("--metrics", default=None, help="JSON lines file to append live metrics (ticks/s, ms/tick mean and p95, simulated s per wall s, memory) to every --metrics-every ticks")
+    parser.add_argument("--metrics-every", type=int, default=100, help="append metrics every this many ticks (default: %(default)s)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve the latest metrics as JSON at http://127.0.0.1:PORT/ while the run lasts, 0 for any free port")
+    parser.add_argument("--station", type=parse_station, action="append", default=[], metavar="NAME=X,Y", help="record the pressure, wind and Coriolis values of cell (X, Y) every tick, repeat for each station")
+    parser.add_argument("--station-latlon", type=parse_station_latlon, action="append", default=[], metavar="NAME=LAT,LON", help="as --station, for the cell nearest a latitude and longitude in degrees")
+    parser.add_argument("--stations-dir", default=None, help="folder to write --station samples to, in bulk, read them back with ClWxSim.data.stations.read")
+    parser.add_argument("--profile", action="store_true", help="time each phase of the tick and each solver kernel, and print the timings at the end")
+
+    args = parser.parse_args(argv)
+    if args.size < 1:
+        parser.error("--size must be at least 1")
+    if args.ticks < 0 or args.output_every < 0 or args.report_every < 0 or args.tiles < 0 or args.checkpoint_every < 0:
+        parser.error("--ticks, --output-every, --report-every, --tiles and --checkpoint-every can not be negative")
+    if args.archive_every < 1 or args.archive_decimate < 1:
+        parser.error("--archive-every and --archive-decimate must be at least 1")
+    if args.metrics_every < 1:
+        parser.error("--metrics-every must be at least 1")
+    if args.frames_every < 1 or args.frames_processes < 1:
+        parser.error("--frames-every and --frames-processes must be at least 1")
+    if args.checkpoint_every and args.checkpoint is None:
+        parser.error("--checkpoint-every needs a --checkpoint file")
+    if args.max_dt_scale < 1:
+        parser.error("--max-dt-scale must be at least 1")
+    if args.threads < 1:
+        parser.error("--threads must be at least 1")
+    if bool(args.station or args.station_latlon) != (args.stations_dir is not None):
+        parser.error("--station and --station-latlon need a --stations-dir, and --stations-dir needs a station")
+    if args.tiles and args.boundary == "polar":
+        parser.error("--tiles can not be used with the polar boundary")
+    return args
+
+def main(argv=None):
+    """Runs a simulation from the command line and returns the exit code
+
+    Args:
+        argv (list of str, optional): Command line arguments, defaults to sys.argv[1:]
+    """
+
+    args = parse_args(argv)
+
+    # Only imported when asked for, so plain runs (and sweep workers) start quickly
+    if args.tiles:
+        from ClWxSim.sim.ParallelController import ParallelController
+    if args.frames is not None:
+        from ClWxSim.ui.export import FrameExporter
+
+    if args.restore is not None:
+        # The restored Controller keeps its saved state, eg its tick number and begin_pgf_tick
+        if args.tiles:
+            sim = ParallelController.restore(args.restore, tiles=args.tiles, backend=args.backend, profile=args.profile)
+        else:
+            sim = Controller.restore(args.restore, backend=args.backend, profile=args.profile, threads=args.threads)
+        wld = sim.world
+        args.size = wld.wld_grid_size
+    else:
+        wld = World(world_name=args.name, wld_grid_size=args.size, starting_pressure=args.starting_pressure, angular_vel=args.angular_vel, boundary=args.boundary)
+        if args.tiles:
+            sim = ParallelController(wld, tiles=args.tiles, backend=args.backend, profile=args.profile)
+        else:
+            sim = Controller(wld, backend=args.backend, profile=args.profile, threads=args.threads)
+        sim.begin_pgf_tick = args.begin_pgf_tick
+    sim.adaptive_dt = args.adaptive_dt or sim.adaptive_dt
+    if args.restore is None or args.max_dt_scale != Controller.max_dt_scale:
+        sim.max_dt_scale = args.max_dt_scale
+    exporter = None
+    if args.frames is not None:
+        try:
+            exporter = FrameExporter(args.frames, every=args.frames_every, processes=args.frames_processes, fps=args.frames_fps)
+        except (RuntimeError, ValueError) as e:
+            sim.close()
+            print("Error preparing --frames: [{}]".format(e), file=sys.stderr)
+            return 1
+        sim.observers.append(exporter)
+    if args.metrics is not None or args.metrics_port is not None:
+        metrics = sim.monitor(args.metrics, every=args.metrics_every, port=args.metrics_port)
+        if metrics.server is not None:
+            print("Serving metrics at http://127.0.0.1:{}/".format(metrics.server.server_address[1]))
+    if args.stations_dir is not None:
+        stations = sim.probe(path=args.stations_dir)
+        try:
+            for name, x, y in args.station:
+                stations.add(name, x, y)
+            for name, lat, lon in args.station_latlon:
+                stations.add(name, lat=lat, lon=lon)
+        except ValueError as e:
+            sim.close()
+            print("Error adding stations: [{}]".format(e), file=sys.stderr)
+            return 1
+    if args.checkpoint_every:
+        sim.auto_checkpoint(args.checkpoint, args.checkpoint_every)
+    if args.archive is not None:
+        sim.record(args.archive, every=args.archive_every, fields=OUTPUT_FIELDS, decimate=args.archive_decimate,
+                   dtype=np.float64 if args.archive_float64 else np.float32, compression="zlib" if args.archive_compress else None)
+
+    try:
+        if args.restore is None:
+            if args.sources == "test":
+                add_test_sources(wld)
+            elif args.sources != "none":
+                add_file_sources(wld, args.sources)
+
+        stats = run(sim, args.ticks, args.output_dir, args.output_every, args.report_every)
+        if args.checkpoint is not None:
+            sim.close()
+            sim.save_checkpoint(args.checkpoint.format(tick=sim.tickNum))
+    except Exception as e:
+        print("Error during tick {}: [{}]".format(sim.tickNum, e), file=sys.stderr)
+        return 1
+    finally:
+        sim.close()
+
+    print("Ran {} ticks of a {}x{} grid ({}): {:.1f} ticks/s, {:.3f} ms/tick".format(
+        stats["ticks"], args.size, args.size, "{} tiles".format(sim.tiles) if args.tiles else "{} backend".format(sim.backend),
+        stats["ticks_per_s"], stats["ms_per_tick"]))
+    print("Simulated {:.1f} s: {:.1f} simulated s per wall s".format(stats["sim_time"], stats["sim_rate"]))
+    if stats["outputs"]:
+        print("Wrote {} outputs to {} in {:.3f} s".format(len(stats["outputs"]), args.output_dir, stats["output_time"]))
+    if exporter is not None:
+        print("Exported {} frames to {}".format(exporter.exported, args.frames))
+        if exporter.error is not None:
+            print("Error exporting frames: [{}]".format(exporter.error), file=sys.stderr)
+    if args.stations_dir is not None:
+        print("Wrote {} samples of {} stations to {}".format(stations.written, len(stations.names), args.stations_dir))
+    if args.checkpoint is not None:
+        print("Saved a checkpoint of tick {} to {}".format(sim.tickNum, args.checkpoint.format(tick=sim.tickNum)))
+    if args.profile:
+        print_profile(sim.profiler.report())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
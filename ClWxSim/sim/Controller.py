@@ -1,10 +1,17 @@
+import time
+
 import numpy as np
 
 from ClWxSim.utils.logging import Logger
+from ClWxSim.data import archive, checkpoint, stations
 
-import ClWxSim.sim.pressure as p
-import ClWxSim.sim.wind as w
+import ClWxSim.sim.Pressure as p
+import ClWxSim.sim.Wind as w
 import ClWxSim.sim.fluid_solver as solver
+from ClWxSim.sim.metrics import Metrics
+import ClWxSim.sim.profiler as profiler
+import ClWxSim.sim.timestep as timestep
+from ClWxSim.sim.strips import StripPool
 
 class Controller:
     """Sets up and runs weather simulations on a specified World object"""
@@ -13,47 +20,238 @@ class Controller:
     tickNum = 0
     begin_pgf_tick = 20
 
-    def __init__(self, world):
+    adaptive_dt = False     # If true, each tick's steps are chosen from the wind speed, see plan_tick
+    max_dt_scale = 10.      # Longest adaptive tick, as a multiple of World.dt
+    sim_time = 0.           # Simulated seconds run, one per member for Ensembles with a dt per member
+    wall_time = 0.          # Wall clock seconds spent ticking
+    last_steps = 0          # Number of steps the last tick was split into
+    last_dt = 0.            # Length of each of the last tick's steps
+
+    # Modifiers for this Controller's ticks, None to use the module wide Wind.PGF_modifier, Wind.coriolis_modifier and Pressure.wind_modifier
+    pgf_modifier = None
+    coriolis_modifier = None
+    wind_modifier = None
+
+    checkpointer = None     # Saves checkpoints every few ticks if set (it is also one of the observers), see auto_checkpoint
+
+    def __init__(self, world, backend="numpy", profile=False, threads=1, adaptive_dt=False):
         """Instatiaties a Controller object
 
         Args:
-            world (World object): The world used to simulate weather
+            world (World or Ensemble object): The world (or ensemble of worlds) used to simulate weather
+            backend (str, optional): fluid_solver kernel backend, "numpy" or "numba" (falls back to "numpy" if Numba is not installed), defaults to "numpy"
+            profile (bool, optional): If true, time every tick from the start, see Controller.profiler, defaults to False
+            threads (int, optional): Number of threads to split the NumPy kernels between, by strips of rows, see Controller.threads, defaults to 1
+            adaptive_dt (bool, optional): If true, choose each tick's length and steps from the wind speed, see plan_tick, defaults to False (every tick is one step of World.dt)
         """
 
         self.world = world
+        self.adaptive_dt = adaptive_dt
+        self.observers = []     # Objects whose after_tick(controller) is called after every tick, eg a Checkpointer or an ArchiveWriter
+        self.profiler = profiler.Profiler(enabled=profile)   # Set profiler.enabled to turn timing on or off at any time, read it with profiler.report()
         self.logger = Logger(log_ID="sim_controller")
+        self.pool = StripPool(threads)
+
+        self.backend = solver.resolve_backend(backend)
+        if self.backend != backend:
+            self.logger.warning("{} backend is not available, using {} backend", backend, self.backend)
+
+
+    @property
+    def threads(self):
+        """Number of threads the solver kernels are split between, set it to change the number of threads used by later ticks"""
+        return self.pool.threads
+
+    @threads.setter
+    def threads(self, threads):
+        pool = StripPool(threads)
+        self.pool.close()
+        self.pool = pool
+
+    @property
+    def sim_rate(self):
+        """Simulated seconds run per wall clock second spent ticking"""
+        return self.sim_time / self.wall_time if self.wall_time else 0.
+
+    def reset_clock(self):
+        """Sets the tick number, simulated time and wall time back to 0, eg after World.clear_data"""
+        self.tickNum = 0
+        self.sim_time = 0.
+        self.wall_time = 0.
+
+    def close(self):
+        """Stops the Controller's threads (finishing any checkpoint being written), later ticks run on the calling thread alone"""
+        for observer in self.observers:
+            if hasattr(observer, "close"):
+                observer.close()
+        self.observers = []
+        self.checkpointer = None
+        self.pool.close()
+
+    def save_checkpoint(self, path):
+        """Saves the World and this Controller's state (tick number, simulated time, ...) to a checkpoint file, see ClWxSim.data.checkpoint"""
+        checkpoint.save(path, self.world, self)
+
+    @classmethod
+    def restore(cls, path, mmap=True, **kwargs):
+        """returns a new Controller, and its World, carrying on from a checkpoint file
+
+        Args:
+            path (str): Location of the checkpoint file
+            mmap (bool, optional): If true the World's arrays are mapped (copy on write) from the file instead of read, defaults to True
+            kwargs: Passed on to the Controller, the backend defaults to the one saved in the checkpoint
+        """
+
+        world = checkpoint.restore_world(path, mmap)
+        header = checkpoint.read_header(path)
+        if header["controller"] is not None:
+            kwargs.setdefault("backend", header["controller"]["backend"])
+        sim = cls(world, **kwargs)
+        checkpoint.restore_state(sim, header)
+        return sim
+
+    def auto_checkpoint(self, path, every):
+        """Saves a checkpoint every few ticks, written on a background thread so ticks do not wait for the disk
+
+        Args:
+            path (str): Location of the checkpoint file, may hold "{tick}" to keep a file per checkpoint, see checkpoint.Checkpointer
+            every (int): Save a checkpoint every this many ticks, 0 to stop saving checkpoints
+        """
+
+        if self.checkpointer is not None:
+            self.checkpointer.close()
+            self.observers.remove(self.checkpointer)
+        self.checkpointer = checkpoint.Checkpointer(path, every) if every else None
+        if self.checkpointer is not None:
+            self.observers.append(self.checkpointer)
+
+    def record(self, path, every=1, **kwargs):
+        """Streams World fields to an archive folder every few ticks, see ClWxSim.data.archive, and returns the ArchiveWriter
+
+        The archive is closed when the Controller is, or remove the writer from observers and close it to stop sooner.
+
+        Args:
+            path (str): Folder to write the archive to
+            every (int, optional): Archive a frame every this many ticks, defaults to 1
+            kwargs: Passed on to the ArchiveWriter, eg fields, decimate, dtype and compression
+        """
 
+        writer = archive.ArchiveWriter(path, every=every, **kwargs)
+        self.observers.append(writer)
+        return writer
+
+    def monitor(self, path=None, every=100, port=None, window=200):
+        """Records live throughput and memory figures, see ClWxSim.sim.metrics, and returns the Metrics
+
+        Args:
+            path (str, optional): JSON lines file to append a report to every few ticks, defaults to None
+            every (int, optional): Append a report to path every this many ticks, defaults to 100
+            port (int, optional): Serve the latest report as JSON over HTTP on this port of 127.0.0.1 (0 for any free port), defaults to None
+            window (int, optional): Number of recent ticks the figures are worked out over, defaults to 200
+        """
+
+        metrics = Metrics(window=window, path=path, every=every)
+        if port is not None:
+            metrics.serve(port)
+        self.observers.append(metrics)
+        return metrics
+
+    def probe(self, cells=None, fields=stations.DEFAULT_FIELDS, capacity=1024, path=None, **kwargs):
+        """Records World fields at a set of cells after every tick, see ClWxSim.data.stations, and returns the Stations
+
+        More stations can be added with Stations.add until the next tick. They are closed (flushing any samples to path) when the Controller is.
+
+        Args:
+            cells (dict, optional): Station names, each mapped to the (x, y) of its cell, defaults to None (add them with Stations.add)
+            fields (tuple of str, optional): World arrays to record, defaults to stations.DEFAULT_FIELDS
+            capacity (int, optional): Number of samples the ring buffers hold, defaults to 1024
+            path (str, optional): Folder to write samples to in bulk, defaults to None (old samples are overwritten)
+            kwargs: Passed on to the Stations, eg dtype
+        """
+
+        probes = stations.Stations(self.world, fields=fields, capacity=capacity, path=path, **kwargs)
+        for name, (x, y) in (cells or {}).items():
+            probes.add(name, x, y)
+        self.observers.append(probes)
+        return probes
+
+    def modifiers(self):
+        """returns the (PGF, Coriolis, wind) modifiers used by this Controller's ticks, see Controller.pgf_modifier"""
+        return (w.PGF_modifier if self.pgf_modifier is None else self.pgf_modifier,
+                w.coriolis_modifier if self.coriolis_modifier is None else self.coriolis_modifier,
+                p.wind_modifier if self.wind_modifier is None else self.wind_modifier)
+
+    def plan_tick(self):
+        """returns (steps, dt), the number of steps the next tick is split into and the length of each
+
+        Without adaptive_dt a tick is one step of World.dt. With it, a tick is one step of up to max_dt_scale
+        times World.dt while that is stable, or is World.dt split into as many steps as it takes to be stable,
+        see ClWxSim.sim.timestep.
+        """
+
+        if not self.adaptive_dt:
+            return 1, self.world.dt
+
+        with profiler.phase("timestep"):
+            N = self.world.wld_grid_size
+            stable = timestep.stable_dt(N, self.world.air_vel_u, self.world.air_vel_v, self.world.diff, self.world.visc, speed_scale=max(1., abs(self.modifiers()[2])))
+            return timestep.plan_steps(self.world.dt, stable, self.max_dt_scale)
 
     def tick(self):
         if self.running:
             self.tickNum += 1
 
-            self.world.air_pressure_grad_u, self.world.air_pressure_grad_v = self.world.calcPressureGrad(self.world.air_pressure)
+            profiling = self.profiler.enabled
+            if profiling:
+                self.profiler.begin_tick()
+            start = time.perf_counter()
+            try:
+                steps, dt = self.plan_tick()
+                for step in range(steps):
+                    self._tick(dt, first_step=step == 0)
+                    self.sim_time = self.sim_time + dt
+                self.last_steps, self.last_dt = steps, dt
+                for observer in self.observers:
+                    observer.after_tick(self)
+            finally:
+                self.wall_time += time.perf_counter() - start
+                if profiling:
+                    self.profiler.end_tick()
+        else:
+            self.logger.warning("Controller is not running, have you set Controller.running to True?")
 
-            # Calculate Wind Effects
-            # Only apply Pressure Gradient Force after pressure has settled, once we have reached begin_pgf_tick. Only remove old PGF after first PGF has been applied
-            if self.tickNum > self.begin_pgf_tick:
-                w.tick(self.world.wld_grid_size, self.world.air_vel_u, self.world.air_vel_v, self.world.air_vel_u_prev, self.world.air_vel_v_prev, self.world.visc, self.world.dt, self.world.air_pressure_grad_u, self.world.air_pressure_grad_v, self.world.air_pressure_grad_u_prev, self.world.air_pressure_grad_v_prev, self.world.angular_vel, self.world)
-            elif self.tickNum == self.begin_pgf_tick:
-                w.tick(self.world.wld_grid_size, self.world.air_vel_u, self.world.air_vel_v, self.world.air_vel_u_prev, self.world.air_vel_v_prev, self.world.visc, self.world.dt, self.world.air_pressure_grad_u, self.world.air_pressure_grad_v, self.world.air_pressure_grad_u_prev, self.world.air_pressure_grad_v_prev, self.world.angular_vel, self.world, remove_pgf=False)
-            else:
-                w.tick(self.world.wld_grid_size, self.world.air_vel_u, self.world.air_vel_v, self.world.air_vel_u_prev, self.world.air_vel_v_prev, self.world.visc, self.world.dt, self.world.air_pressure_grad_u, self.world.air_pressure_grad_v, self.world.air_pressure_grad_u_prev, self.world.air_pressure_grad_v_prev, self.world.angular_vel, self.world, apply_pgf=False, remove_pgf=False)
+    def _tick(self, dt, first_step=True):
+        """Runs the calculations for one step of a tick, each phase is timed if the profiler is enabled
 
-            # Calculate Pressure Effects
-            p.tick(self.world.wld_grid_size,  self.world.air_pressure,  self.world.air_pressure_prev, self.world.air_vel_u, self.world.air_vel_v,  self.world.diff,  self.world.dt)
+        Args:
+            dt (float, or array): Length of the step, may be one per member for Ensembles
+            first_step (bool, optional): False for the later steps of a tick split into several, defaults to True
+        """
+
+        with profiler.phase("pressure_grad"):
+            self.world.calcPressureGrad(self.world.air_pressure, self.world.air_pressure_grad_u, self.world.air_pressure_grad_v)
+
+        # Calculate Wind Effects
+        # Only apply Pressure Gradient Force after pressure has settled, once we have reached begin_pgf_tick. Only remove old PGF after first PGF has been applied
+        if self.tickNum > self.begin_pgf_tick or (self.tickNum == self.begin_pgf_tick and not first_step):
+            w.tick(self.world.wld_grid_size, self.world.air_vel_u, self.world.air_vel_v, self.world.air_vel_u_prev, self.world.air_vel_v_prev, self.world.visc, dt, self.world.air_pressure_grad_u, self.world.air_pressure_grad_v, self.world.air_pressure_grad_u_prev, self.world.air_pressure_grad_v_prev, self.world.angular_vel, self.world, bnd=self.world.boundary, backend=self.backend, pool=self.pool, pgf_mod=self.pgf_modifier, coriolis_mod=self.coriolis_modifier)
+        elif self.tickNum == self.begin_pgf_tick:
+            w.tick(self.world.wld_grid_size, self.world.air_vel_u, self.world.air_vel_v, self.world.air_vel_u_prev, self.world.air_vel_v_prev, self.world.visc, dt, self.world.air_pressure_grad_u, self.world.air_pressure_grad_v, self.world.air_pressure_grad_u_prev, self.world.air_pressure_grad_v_prev, self.world.angular_vel, self.world, remove_pgf=False, bnd=self.world.boundary, backend=self.backend, pool=self.pool, pgf_mod=self.pgf_modifier, coriolis_mod=self.coriolis_modifier)
+        else:
+            w.tick(self.world.wld_grid_size, self.world.air_vel_u, self.world.air_vel_v, self.world.air_vel_u_prev, self.world.air_vel_v_prev, self.world.visc, dt, self.world.air_pressure_grad_u, self.world.air_pressure_grad_v, self.world.air_pressure_grad_u_prev, self.world.air_pressure_grad_v_prev, self.world.angular_vel, self.world, apply_pgf=False, remove_pgf=False, bnd=self.world.boundary, backend=self.backend, pool=self.pool, pgf_mod=self.pgf_modifier, coriolis_mod=self.coriolis_modifier)
+
+        # Calculate Pressure Effects
+        p.tick(self.world.wld_grid_size,  self.world.air_pressure,  self.world.air_pressure_prev, self.world.air_vel_u, self.world.air_vel_v,  self.world.diff,  dt, bnd=self.world.boundary, backend=self.backend, ws=self.world.workspace, pool=self.pool, wind_mod=self.wind_modifier)
 
-            # Store previous pressure gradient
-            self.world.air_pressure_grad_u_prev[0:self.world.grid_size+1, 0:self.world.grid_size+1], self.world.air_pressure_grad_v_prev[0:self.world.grid_size+1, 0:self.world.grid_size+1] = self.world.air_pressure_grad_u[0:self.world.grid_size+1, 0:self.world.grid_size+1], self.world.air_pressure_grad_v[0:self.world.grid_size+1, 0:self.world.grid_size+1]
+        # Store previous pressure gradient
+        with profiler.phase("grad_history"):
+            np.copyto(self.world.air_pressure_grad_u_prev, self.world.air_pressure_grad_u)
+            np.copyto(self.world.air_pressure_grad_v_prev, self.world.air_pressure_grad_v)
 
-            # Round all values to avoid decimal overflow
+        # Round all values to avoid decimal overflow, in place so no new arrays are made
+        with profiler.phase("rounding"):
             try:
-                self.world.air_vel_u = self.world.air_vel_u.round(decimals=10)
-                self.world.air_vel_v = self.world.air_vel_v.round(decimals=10)
-                self.world.air_vel_u_prev = self.world.air_vel_u_prev.round(decimals=10)
-                self.world.air_vel_v_prev = self.world.air_vel_v_prev.round(decimals=10)
-                self.world.air_pressure = self.world.air_pressure.round(decimals=10)
-                self.world.air_pressure_prev = self.world.air_pressure_prev.round(decimals=10)
+                for arr in (self.world.air_vel_u, self.world.air_vel_v, self.world.air_vel_u_prev, self.world.air_vel_v_prev, self.world.air_pressure, self.world.air_pressure_prev):
+                    np.round(arr, decimals=10, out=arr)
             except Exception as e:
-                self.logger.log("ERROR while rounding arrays during tick {}: [{}]".format(self.tickNum, e))
-        else:
-            self.logger.log("WARNING: Controller is not running, have you set Controller.running to True?")
+                self.logger.error("Error while rounding arrays during tick {}: [{}]", self.tickNum, e)
@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import threading
+import traceback
+import weakref
+from multiprocessing import shared_memory
+
+import ClWxSim.sim.profiler as profiler
+import ClWxSim.sim.tiles as tiling
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.sim.workspace import Workspace
+
+class ParallelController(Controller):
+    """Controller that splits every tick between worker processes, one per strip of rows (see ClWxSim.sim.tiles)
+
+    The World's arrays are moved into a shared memory block that every worker maps, so the World (and anything
+    drawing it) keeps reading and writing them as usual between ticks. Results exactly match a Controller run
+    with fluid_solver.diffuse_solver = "lin_solve", whatever the number of tiles.
+
+    Call close once finished, which gives the World back private copies of its arrays and stops the workers.
+    The tiles always use the NumPy kernels, whatever the backend.
+    """
+
+    def __init__(self, world, tiles=None, backend="numpy", profile=False):
+        """Instatiaties a ParallelController object and starts its workers
+
+        Args:
+            world (World object): The world used to simulate weather, its boundary policy must support the spectral solver
+            tiles (int, optional): Number of strips of rows (and worker processes) to split the grid into, defaults to the number of CPUs
+            backend (str, optional): Kept for compatibility with Controller, the tiles always use NumPy
+            profile (bool, optional): If true, time every tick from the start, see Controller.profiler, defaults to False
+        """
+
+        super().__init__(world, backend=backend, profile=profile)
+        tiling.check_supported(world)
+
+        self.N = world.wld_grid_size
+        if tiles is None:
+            tiles = os.cpu_count() or 1
+        self.tiles = max(1, min(int(tiles), self.N))
+
+        self._shm = _SharedBlock(create=True, size=tiling.shared_nbytes(self.N))
+        self._arrays = tiling.shared_arrays(self._shm.buf, self.N)
+        self._share_world()
+
+        ctx = multiprocessing.get_context()
+        self._barrier = ctx.Barrier(self.tiles)
+        self._conns = []
+        self._workers = []
+        for tile in range(self.tiles):
+            conn, child_conn = ctx.Pipe()
+            worker = ctx.Process(target=_worker, args=(self._shm.name, self.N, tile, self.tiles, self._barrier, child_conn),
+                                 name="ClWxSim tile {}".format(tile), daemon=True)
+            worker.start()
+            child_conn.close()
+            self._conns.append(conn)
+            self._workers.append(worker)
+
+        self._finalizer = weakref.finalize(self, _shutdown, self._conns, self._workers, self._shm)
+
+    def _share_world(self):
+        """Copies any World array that is not already in shared memory into it, and points the World at the shared array"""
+
+        if self.world.wld_grid_size != self.N:
+            raise ValueError("World grid size changed from {} to {}, make a new ParallelController".format(self.N, self.world.wld_grid_size))
+
+        for name in tiling.FIELDS:
+            shared = self._arrays[name]
+            arr = getattr(self.world, name)
+            if arr is not shared:
+                shared[:] = arr
+                setattr(self.world, name, shared)
+
+    def _tick(self, dt, first_step=True):
+        """Runs one step of a tick on the workers, each tile's phases are not timed separately"""
+
+        # World.clear_data replaces the World's arrays
+        self._share_world()
+
+        pgf_modifier, coriolis_modifier, wind_modifier = self.modifiers()
+        params = {
+            "dt": dt,
+            "visc": self.world.visc,
+            "diff": self.world.diff,
+            "angular_vel": self.world.angular_vel,
+            "bnd": self.world.boundary,
+            "apply_pgf": self.tickNum >= self.begin_pgf_tick,
+            "pgf_modifier": pgf_modifier,
+            "coriolis_modifier": coriolis_modifier,
+            "wind_modifier": wind_modifier,
+        }
+
+        with profiler.phase("parallel_tick"):
+            for conn in self._conns:
+                conn.send(params)
+            errors = [conn.recv() for conn in self._conns]
+
+        errors = [e for e in errors if e is not None]
+        if errors:
+            # Tiles that were left waiting on a failed tile only report the broken barrier
+            self._barrier.reset()
+            errors.sort(key=lambda e: e[0] == "BrokenBarrierError")
+            raise RuntimeError("Tile worker failed during tick {}: {}".format(self.tickNum, errors[0][1]))
+
+    def close(self):
+        """Stops the workers and gives the World private copies of its arrays, the Controller can not tick afterwards"""
+
+        if not self._finalizer.alive:
+            return
+
+        for name in tiling.FIELDS:
+            if getattr(self.world, name) is self._arrays[name]:
+                setattr(self.world, name, self._arrays[name].copy())
+        self._arrays = None
+        self._finalizer()
+        super().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class _SharedBlock(shared_memory.SharedMemory):
+    """SharedMemory block that stays mapped for as long as any array made from its buf does
+
+    NumPy arrays made from a buffer do not stop it being closed, so SharedMemory.close (which is also
+    called when it is garbage collected) would leave any array still in use pointing at unmapped memory.
+    Instead the block is never closed, the mapping is freed once the last array using it is gone.
+    """
+
+    def __del__(self):
+        pass
+
+def _worker(shm_name, N, tile, count, barrier, conn):
+    """Runs one tile of every tick it is sent, until it is sent None"""
+
+    arrays = tiling.shared_arrays(_SharedBlock(name=shm_name).buf, N)
+    ws = Workspace(N)
+    while True:
+        params = conn.recv()
+        if params is None:
+            break
+        try:
+            tiling.tick(N, arrays, params, tile, count, barrier.wait, ws)
+            conn.send(None)
+        except threading.BrokenBarrierError:
+            conn.send(("BrokenBarrierError", "tile {} was left waiting".format(tile)))
+        except Exception as e:
+            barrier.abort()
+            conn.send((type(e).__name__, "tile {}: {}\n{}".format(tile, e, traceback.format_exc())))
+
+def _shutdown(conns, workers, shm):
+    """Stops the workers and frees the shared memory block"""
+
+    for conn in conns:
+        try:
+            conn.send(None)
+        except OSError:
+            pass
+    for worker in workers:
+        worker.join(timeout=5)
+        if worker.is_alive():
+            worker.terminate()
+    for conn in conns:
+        conn.close()
+
+    # The name is removed now, the memory itself is freed once every array using it is gone
+    shm.unlink()
@@ -1,10 +1,11 @@
 """Contains functions for pressure map calculations"""
 
 import ClWxSim.sim.fluid_solver as solver
+from ClWxSim.sim.profiler import phase
 
 wind_modifier = 1.
 
-def tick(N, x, x0, u, v, diff, dt):
+def tick(N, x, x0, u, v, diff, dt, bnd=None, backend=None, ws=None, pool=None, wind_mod=None):
     """Calculates the advection and diffusion of the pressure array over a single tick
 
     Args:
@@ -13,18 +14,24 @@ def tick(N, x, x0, u, v, diff, dt):
         x0 (array of size N+2): The previous value of d
         u (array of size N+2): The x component velocity vector array
         v (array of size N+2): The y component velocity vector array
-        diff (float > 0): Rate of diffusion
-        dt (float): Length of time of each tick
+        diff (float > 0, or array): Rate of diffusion, may be one per member for batched arrays
+        dt (float, or array): Length of time of each tick, may be one per member for batched arrays
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
+        backend (str, optional): fluid_solver kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Scratch arrays for the solver, if not given temporary arrays are made
+        pool (StripPool, optional): Threads to split the fluid_solver kernels between, see ClWxSim.sim.strips
+        wind_mod (float, optional): Scale of the wind the pressure is advected by, defaults to Pressure.wind_modifier
     """
 
+    if wind_mod is None:
+        wind_mod = wind_modifier
+
     x0, x = x, x0  # swap
-    solver.diffuse(N, 0, x, x0, diff, dt)
+    with phase("pressure_diffuse"):
+        solver.diffuse(N, 0, x, x0, diff, dt, bnd=bnd, backend=backend, ws=ws, pool=pool)
     x0, x = x, x0  # swap
 
-    u[1:N+1, 1:N+1] = u[1:N+1, 1:N+1] * wind_modifier
-    v[1:N+1, 1:N+1] = v[1:N+1, 1:N+1] * wind_modifier
-
-    solver.advect(N, 0, x, x0, u, v, dt)
-
-    u[1:N+1, 1:N+1] = u[1:N+1, 1:N+1] / wind_modifier
-    v[1:N+1, 1:N+1] = v[1:N+1, 1:N+1] / wind_modifier
+    # Advecting by [u v] * wind_mod for dt is the same as advecting by [u v] for dt * wind_mod,
+    # so the wind arrays do not need to be scaled and restored
+    with phase("pressure_advect"):
+        solver.advect(N, 0, x, x0, u, v, dt * wind_mod, bnd=bnd, backend=backend, ws=ws, pool=pool)
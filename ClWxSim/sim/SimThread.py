@@ -0,0 +1,228 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from ClWxSim.utils.logging import Logger
+
+# World arrays copied into every Snapshot
+SNAPSHOT_FIELDS = ("air_pressure", "air_vel_u", "air_vel_v", "air_pressure_grad_u", "air_pressure_grad_v", "dbg_coriolis_u", "dbg_coriolis_v")
+
+class Snapshot:
+    """Copies of a World's arrays as they were at the end of one tick, each array is an attribute named as in the World
+
+    Attributes:
+        tick (int or None): The tick the copies were taken after, None until the first copy
+        time (float): time.perf_counter() when the copies were taken
+        fields (tuple of str): Names of the copied arrays
+    """
+
+    def __init__(self, fields):
+        """Creates a new, empty, Snapshot
+
+        Args:
+            fields (tuple of str): Names of the World arrays to copy
+        """
+        self.tick = None
+        self.time = 0.
+        self.fields = tuple(fields)
+
+    def copy_from(self, wld, tick):
+        """Copies the World's arrays into this Snapshot, reusing the Snapshot's arrays if they are the right shape
+
+        Args:
+            wld (World): The World to copy
+            tick (int): The tick the World has just finished
+        """
+        for name in self.fields:
+            src = getattr(wld, name)
+            dst = getattr(self, name, None)
+            if dst is None or dst.shape != src.shape:
+                setattr(self, name, src.copy())
+            else:
+                dst[...] = src
+        self.tick = tick
+        self.time = time.perf_counter()
+
+    def copy(self):
+        """returns an independent copy of this Snapshot"""
+        snap = Snapshot(self.fields)
+        snap.tick = self.tick
+        snap.time = self.time
+        for name in self.fields:
+            setattr(snap, name, getattr(self, name).copy())
+        return snap
+
+class SimThread:
+    """Runs a Controller's ticks on a background thread, as fast as they can be computed
+
+    Every published tick is copied into the back buffer of a pair of Snapshots. The pair is swapped once no reader
+    holds the front one, so readers (eg the GUI, at its own frame rate) always see one whole tick. Ticks finished
+    while a reader holds the front Snapshot, or less than min_interval after the last one published, are not published.
+
+    Every capture_every'th tick is also put, as its own Snapshot, on the captures queue. Ticking waits while the queue is
+    full, so no capture is ever dropped (except those of ticks run by step, which never waits).
+
+    Anything else that changes the World (eg adding a source) should hold lock while it does so.
+
+    Attributes:
+        sim (Controller): The Controller being run
+        lock (threading.RLock): Held while a tick is run, and while the World is copied
+        captures (queue.Queue): Snapshots of every capture_every'th tick, see capture_every
+        capture_every (int): Tick interval between captures, 0 for no captures
+        min_interval (float): Shortest time between published Snapshots, in seconds
+        error (Exception or None): The error raised by the last tick, if it failed. The thread pauses when a tick fails
+    """
+
+    def __init__(self, sim, fields=SNAPSHOT_FIELDS, capture_every=0, capture_queue_size=4, min_interval=1 / 60):
+        """Creates a new SimThread, call start to begin ticking
+
+        Args:
+            sim (Controller): The Controller to run
+            fields (tuple of str, optional): World arrays to copy into each Snapshot, defaults to SNAPSHOT_FIELDS
+            capture_every (int, optional): Put a Snapshot of every capture_every'th tick on captures, defaults to 0 (none)
+            capture_queue_size (int, optional): Captures waiting to be taken off the queue before ticking waits, defaults to 4
+            min_interval (float, optional): Shortest time between published Snapshots, in seconds, defaults to 1/60
+        """
+
+        self.sim = sim
+        self.fields = tuple(fields)
+        self.capture_every = capture_every
+        self.captures = queue.Queue(maxsize=capture_queue_size)
+        self.min_interval = min_interval
+        self.error = None
+        self.lock = threading.RLock()
+        self.logger = Logger(log_ID="sim_thread")
+
+        self._front = Snapshot(self.fields)
+        self._back = Snapshot(self.fields)
+        self._front_lock = threading.Lock()
+
+        self._resume = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    @property
+    def running(self):
+        """returns True if ticks are being run, False if paused or stopped"""
+        return self._resume.is_set()
+
+    def start(self):
+        """Starts (or resumes) ticking on the background thread"""
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ClWxSim sim", daemon=True)
+            self._thread.start()
+        self.error = None
+        self._resume.set()
+
+    def pause(self):
+        """Stops ticking once the current tick is finished, and publishes the last tick whatever min_interval is"""
+
+        self._resume.clear()
+        with self.lock:
+            self.sim.running = False
+            self._publish(self.sim.tickNum, wait=True)
+
+    def stop(self):
+        """Stops ticking and ends the background thread, the SimThread can not be started again"""
+
+        self._stopping = True
+        self._resume.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._resume.clear()
+        self.sim.running = False
+
+    def step(self):
+        """Runs a single tick on the calling thread, only while paused, and publishes it"""
+
+        if self.running:
+            raise RuntimeError("SimThread can only step while paused")
+        with self.lock:
+            self.sim.running = True
+            try:
+                self.sim.tick()
+            finally:
+                self.sim.running = False
+            self._publish(self.sim.tickNum, wait=True)
+            snap = self._capture(self.sim.tickNum)
+        self._put_capture(snap, wait=False)
+
+    @contextmanager
+    def snapshot(self):
+        """Context manager giving the latest published Snapshot (None if nothing has been published), which is not changed until the block ends"""
+        with self._front_lock:
+            yield self._front if self._front.tick is not None else None
+
+    def _run(self):
+        """Runs ticks until stopped"""
+
+        last_publish = 0.
+        while True:
+            self._resume.wait()
+            if self._stopping:
+                return
+
+            with self.lock:
+                # Paused while waiting for the lock
+                if not self._resume.is_set():
+                    continue
+                self.sim.running = True
+                try:
+                    self.sim.tick()
+                except Exception as e:
+                    self.logger.error("Error during tick {}: [{}]", self.sim.tickNum, e)
+                    # Set before pausing, so anyone seeing the thread paused also sees the error
+                    self.error = e
+                    self._resume.clear()
+                    self.sim.running = False
+                    self._publish(self.sim.tickNum, wait=True)
+                    continue
+
+                tick = self.sim.tickNum
+                now = time.perf_counter()
+                if now - last_publish >= self.min_interval and self._publish(tick, wait=False):
+                    last_publish = now
+                snap = self._capture(tick)
+
+            # Outside the lock, so the World can still be changed while waiting for space
+            self._put_capture(snap, wait=True)
+
+    def _publish(self, tick, wait):
+        """Copies the World into the back Snapshot and swaps it to the front, returns False if a reader held the front (and wait is False)"""
+
+        if self._front.tick == tick and tick is not None:
+            return True
+
+        self._back.copy_from(self.sim.world, tick)
+        if not self._front_lock.acquire(blocking=wait):
+            return False
+        try:
+            self._front, self._back = self._back, self._front
+        finally:
+            self._front_lock.release()
+        return True
+
+    def _capture(self, tick):
+        """returns a new Snapshot of the World if this tick is to be captured, else None. Call while holding lock"""
+
+        if not self.capture_every or tick % self.capture_every != 0:
+            return None
+        snap = Snapshot(self.fields)
+        snap.copy_from(self.sim.world, tick)
+        return snap
+
+    def _put_capture(self, snap, wait):
+        """Puts snap on captures, waiting for space if wait is True (until stopped), else dropping it if captures is full"""
+
+        if snap is None:
+            return
+        while not self._stopping:
+            try:
+                self.captures.put(snap, timeout=0.1 if wait else 0)
+                return
+            except queue.Full:
+                if not wait:
+                    self.logger.warning("Captures queue is full, dropped tick {}", snap.tick)
+                    return
@@ -1,6 +1,7 @@
 """Contains functions for wind map calculations"""
 
 import ClWxSim.sim.fluid_solver as solver
+from ClWxSim.sim.profiler import phase
 
 import numpy as np
 import math
@@ -8,7 +9,7 @@ import math
 PGF_modifier = 1.0
 coriolis_modifier = 1.0
 
-def tick(N, u, v, u0, v0, visc, dt, x_grad_u, x_grad_v, x_grad_u_prev, x_grad_v_prev, w, wld_ref, apply_pgf=True, remove_pgf=True):
+def tick(N, u, v, u0, v0, visc, dt, x_grad_u, x_grad_v, x_grad_u_prev, x_grad_v_prev, w, wld_ref, apply_pgf=True, remove_pgf=True, bnd=None, backend=None, pool=None, pgf_mod=None, coriolis_mod=None):
     """Calculates the advection, diffusion, coriolis effect and pressure gradient force affects on the wind velocity arrays over a single tick
 
     Args:
@@ -17,15 +18,20 @@ def tick(N, u, v, u0, v0, visc, dt, x_grad_u, x_grad_v, x_grad_u_prev, x_grad_v_
         v (array of size N+2): The y component velocity vector array
         u0 (array of size N+2): The previous value of u
         v0 (array of size N+2): The previous value of v
-        visc (float > 0): Rate of diffusion of vectors
-        dt (float): Length of time of each tick
+        visc (float > 0, or array): Rate of diffusion of vectors, may be one per member for batched arrays
+        dt (float, or array): Length of time of each tick, may be one per member for batched arrays
         x_grad_u (array of size N+2): The x component pressure gradient array
         x_grad_v (array of size N+2): The y component pressure gradient array
         x_grad_v_prev (array of size N+2): The previous value of x_grad_u
         x_grad_u_prev (array of size N+2): The previous value of x_grad_v
-        w (float): Planet's angular velocity
+        w (float, or array): Planet's angular velocity, may be one per member for batched arrays
         apply_pgf (bool, optional): If false, will not add new Pressure Gradient Force (only false until pressure has smoothed)
         remove_pgf (bool, optional) If false, will not remove old Pressure Gradient Force (only false for first tick PGF is applied)
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
+        backend (str, optional): fluid_solver kernel backend to use, defaults to "numpy"
+        pool (StripPool, optional): Threads to split the fluid_solver kernels between, see ClWxSim.sim.strips
+        pgf_mod (float, optional): Scale of the Pressure Gradient Force, defaults to Wind.PGF_modifier
+        coriolis_mod (float, optional): Scale of the Coriolis effect, defaults to Wind.coriolis_modifier
     """
     #  Pressure Gradient Force: Remove old gradient
 
@@ -35,28 +41,43 @@ def tick(N, u, v, u0, v0, visc, dt, x_grad_u, x_grad_v, x_grad_u_prev, x_grad_v_
 
     #  Pressure Gradient Force: Apply new gradient
 
+    ws = wld_ref.workspace
+    if pgf_mod is None:
+        pgf_mod = PGF_modifier
+    if coriolis_mod is None:
+        coriolis_mod = coriolis_modifier
+
     if apply_pgf:
-        u[0:N+2, 0:N+2] += x_grad_u[0:N+2, 0:N+2] * PGF_modifier * dt
-        v[0:N+2, 0:N+2] += x_grad_v[0:N+2, 0:N+2] * PGF_modifier * dt
+        with phase("wind_pgf"):
+            pgf = ws.array("pgf", u.shape)
+            np.multiply(x_grad_u[..., 0:N+2, 0:N+2], pgf_mod * dt, out=pgf)
+            u[..., 0:N+2, 0:N+2] += pgf
+            np.multiply(x_grad_v[..., 0:N+2, 0:N+2], pgf_mod * dt, out=pgf)
+            v[..., 0:N+2, 0:N+2] += pgf
 
     # Advection and Diffusion: As per the paper "Real-Time Fluid Dynamics for Games" by Jos Stam
 
     u0, u = u, u0  # swap
     v0, v = v, v0  # swap
 
-    solver.diffuse(N, 1, u, u0, visc, dt)
-    solver.diffuse(N, 2, v, v0, visc, dt)
+    with phase("wind_diffuse"):
+        solver.diffuse(N, 1, u, u0, visc, dt, bnd=bnd, backend=backend, ws=ws, pool=pool)
+        solver.diffuse(N, 2, v, v0, visc, dt, bnd=bnd, backend=backend, ws=ws, pool=pool)
 
-    #solver.project(N, u, v, u0, v0)
+    with phase("wind_project"):
+        solver.project(N, u, v, u0, v0, bnd=bnd, backend=backend, ws=ws, pool=pool)
 
     u0, u = u, u0  # swap
     v0, v = v, v0  # swap
 
-    solver.advect(N, 1, u, u0, u0, v0, dt)
-    solver.advect(N, 2, v, v0, u0, v0, dt)
+    with phase("wind_advect"):
+        solver.advect(N, 1, u, u0, u0, v0, dt, bnd=bnd, backend=backend, ws=ws, pool=pool)
+        solver.advect(N, 2, v, v0, u0, v0, dt, bnd=bnd, backend=backend, ws=ws, pool=pool)
 
-    #solver.project(N, u, v, u0, v0)
+    with phase("wind_project"):
+        solver.project(N, u, v, u0, v0, bnd=bnd, backend=backend, ws=ws, pool=pool)
 
     # Coriolis Effect: Caused by planet's rotation
 
-    solver.coriolis(N, u, v, dt, w, coriolis_modifier, wld_ref)
+    with phase("coriolis"):
+        solver.coriolis(N, u, v, dt, w, coriolis_mod, wld_ref, bnd=bnd, backend=backend, ws=ws, pool=pool)
@@ -0,0 +1,136 @@
+"""Contains the boundary condition policies used by fluid_solver to fill in the boundary cells of each array
+
+Axis 0 of every array runs from the south pole (row 0) to the north pole (row N+1), axis 1 runs along lines of latitude.
+Arrays may also have leading batch axes (eg an Ensemble's (K, N+2, N+2) fields), every member is treated the same way.
+"""
+
+import numpy as np
+
+class WallBoundary:
+    """Reflective walls on all four edges of the grid, boundary cells copy their adjacent central cell
+
+    Attributes:
+        name (str): Name used to select this policy, see get_boundary
+        periodic (bool): True if axis 1 (longitude) wraps around
+        spectral_axes (tuple or None): Transforms ("dct" or "fft") along axes 0 and 1 that diagonalise the b = 0 system, None if there are none (see ClWxSim.sim.spectral)
+    """
+
+    name = "walls"
+    periodic = False
+    spectral_axes = ("dct", "dct")
+
+    def apply(self, N, b, x):
+        """Sets boundary cell values to their adjacent central cell
+
+        Args:
+            N (int): Size of array excluding boundary cells
+            b (int): Defines whether to make the boundary values negative (0 = none, 1 = only left and right, 2 = only top and bottom)
+            x (array of size N+2): The array to set the boundary cell values of
+        """
+        # If b=1 Left and Right walls are negative (cancels out adjacent central cell velocity)
+        # If b=2 Top and Bottom walls are negative (cancels out adjacent central cell velocity)
+        self._walls_axis0(N, b, x, 1, N + 1)
+
+        if b == 2:
+            np.negative(x[..., 1:N + 1, 1], out=x[..., 1:N + 1, 0])           # Bottom wall
+            np.negative(x[..., 1:N + 1, N], out=x[..., 1:N + 1, N + 1])       # Top wall
+        else:
+            x[..., 1:N + 1, 0] = x[..., 1:N + 1, 1]
+            x[..., 1:N + 1, N + 1] = x[..., 1:N + 1, N]
+
+        # Average corners from adjacent boundary cells
+        x[..., 0, 0] = 0.5 * (x[..., 1, 0] + x[..., 0, 1])
+        x[..., 0, N + 1] = 0.5 * (x[..., 1, N + 1] + x[..., 0, N])
+        x[..., N + 1, 0] = 0.5 * (x[..., N, 0] + x[..., N + 1, 1])
+        x[..., N + 1, N + 1] = 0.5 * (x[..., N, N + 1] + x[..., N + 1, N])
+
+    def singular(self, b):
+        """returns True if a pure Laplacian system with these boundaries only has a solution up to a constant"""
+        return b == 0
+
+    def _walls_axis0(self, N, b, x, start, stop):
+        """Reflective walls at rows 0 and N+1 (the poles), for columns start to stop"""
+        if b == 1:
+            np.negative(x[..., 1, start:stop], out=x[..., 0, start:stop])             # Left wall
+            np.negative(x[..., N, start:stop], out=x[..., N + 1, start:stop])         # Right wall
+        else:
+            x[..., 0, start:stop] = x[..., 1, start:stop]
+            x[..., N + 1, start:stop] = x[..., N, start:stop]
+
+class PeriodicBoundary(WallBoundary):
+    """Axis 1 (longitude) wraps around the planet, with reflective walls at the poles"""
+
+    name = "periodic"
+    periodic = True
+    spectral_axes = ("dct", "fft")
+
+    def apply(self, N, b, x):
+        """Wraps the longitude boundary cells round to the opposite edge and sets the pole walls
+
+        Args:
+            N (int): Size of array excluding boundary cells
+            b (int): Defines whether to make the boundary values negative (0 = none, 1 = only left and right, 2 = only top and bottom)
+            x (array of size N+2): The array to set the boundary cell values of
+        """
+        x[..., 1:N + 1, 0] = x[..., 1:N + 1, N]
+        x[..., 1:N + 1, N + 1] = x[..., 1:N + 1, 1]
+
+        # Walls go across the full width so the corners follow the wrapped cells
+        self._walls_axis0(N, b, x, 0, N + 2)
+
+    def singular(self, b):
+        """returns True if a pure Laplacian system with these boundaries only has a solution up to a constant"""
+        return b != 1
+
+class PolarBoundary(PeriodicBoundary):
+    """Axis 1 (longitude) wraps around the planet and flow crosses the poles
+
+    The boundary cell beyond a pole takes the value of the cell half way round the planet on the other side of that pole.
+    Both velocity components point the opposite way once they have crossed a pole, so are negated.
+    This is exact when N is even.
+    """
+
+    name = "polar"
+    spectral_axes = None    # Crossing the poles couples each row to the one half way round, so no simple transform applies
+
+    def apply(self, N, b, x):
+        """Fills the pole boundary cells from across the pole and wraps the longitude boundary cells
+
+        Args:
+            N (int): Size of array excluding boundary cells
+            b (int): Defines whether the array is a velocity component (0 = scalar, 1 or 2 = velocity)
+            x (array of size N+2): The array to set the boundary cell values of
+        """
+        half = N // 2
+        if b == 0:
+            x[..., 0, 1:N + 1] = np.roll(x[..., 1, 1:N + 1], -half, axis=-1)
+            x[..., N + 1, 1:N + 1] = np.roll(x[..., N, 1:N + 1], -half, axis=-1)
+        else:
+            x[..., 0, 1:N + 1] = -np.roll(x[..., 1, 1:N + 1], -half, axis=-1)
+            x[..., N + 1, 1:N + 1] = -np.roll(x[..., N, 1:N + 1], -half, axis=-1)
+
+        x[..., 0:N + 2, 0] = x[..., 0:N + 2, N]
+        x[..., 0:N + 2, N + 1] = x[..., 0:N + 2, 1]
+
+    def singular(self, b):
+        """returns True if a pure Laplacian system with these boundaries only has a solution up to a constant"""
+        return b == 0
+
+BOUNDARIES = {cls.name: cls for cls in (WallBoundary, PeriodicBoundary, PolarBoundary)}
+
+walls = WallBoundary()  # Default policy, used whenever no policy is given
+
+def get_boundary(boundary):
+    """returns a boundary policy
+
+    Args:
+        boundary (str or policy object): Name of a policy in BOUNDARIES, or a policy object which is returned as is
+    """
+    if boundary is None:
+        return walls
+    if isinstance(boundary, str):
+        try:
+            return BOUNDARIES[boundary]()
+        except KeyError:
+            raise ValueError("Unknown boundary policy '{}', expected one of {}".format(boundary, sorted(BOUNDARIES)))
+    return boundary
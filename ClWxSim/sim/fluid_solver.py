@@ -1,9 +1,97 @@
-"""Contains functions for calculating 2D weather effects, including advection, diffuse and the coriolis effect"""
+"""Contains functions for calculating 2D weather effects, including advection, diffuse and the coriolis effect
+
+Every kernel can run on one of two backends:
+    "numpy": Whole array NumPy expressions, always available
+    "numba": Compiled loop nests from ClWxSim.sim.jit_kernels, used only if Numba can be imported
+The backend is chosen per call with the backend argument, falling back to "numpy" if "numba" is unavailable.
+Numba (a slow import) is only imported the first time the "numba" backend is asked for.
+
+The main kernels are timed when a Profiler is active, see ClWxSim.sim.profiler.
+
+Kernels also take an optional Workspace (see ClWxSim.sim.workspace) to hold their scratch arrays.
+If one is given the NumPy kernels write every intermediate result into its arrays, so do not allocate any large arrays.
+
+Kernels that spend most of their time on the central cells (lin_solve, smooth, advect and coriolis) also take an
+optional StripPool (see ClWxSim.sim.strips), which splits the NumPy kernels into strips of rows run by several
+threads at once. The boundary cells are set once every strip is done. Results are the same as without a pool.
+
+Arrays may have leading batch axes, eg the (K, N+2, N+2) fields of an Ensemble, in which case every member is
+stepped in the same pass. Scalar parameters (dt, diff, a, c, ...) may then be arrays that broadcast against the
+fields, such as one value per member with shape (K, 1, 1). The compiled kernels only handle single 2D fields,
+so batched fields always use the NumPy kernels.
+"""
+
+from collections import OrderedDict
 
-import math
 import numpy as np
 
-def add_source(N, x, s, dt):
+from ClWxSim.sim.boundary import walls
+from ClWxSim.sim.workspace import Workspace
+from ClWxSim.sim.strips import StripPool
+import ClWxSim.sim.spectral as spectral
+from ClWxSim.sim.profiler import timed
+
+BACKENDS = ("numpy", "numba")
+PROJECT_SOLVERS = ("spectral", "multigrid")
+DIFFUSE_SOLVERS = ("jacobi", "multigrid", "lin_solve")
+
+project_solver = "spectral"   # Poisson solver used by project, see PROJECT_SOLVERS
+diffuse_solver = "jacobi"     # Solver used by diffuse, see DIFFUSE_SOLVERS
+
+lin_solve_sweeps = 20   # Jacobi sweeps run by lin_solve
+
+diffuse_tol = 1e-8      # Residual (relative to the right hand side) at which diffuse stops, each diffusion is only one step of the operator split
+jacobi_max_sweeps = 100 # Most sweeps jacobi_solve will run
+jacobi_max_rate = 0.6   # diffuse only uses jacobi_solve while 4a/c, the part of the error each sweep keeps, is at most this
+
+mg_tol = 1e-10          # Residual (relative to the right hand side) at which multigrid_solve stops
+mg_max_cycles = 30      # Maximum number of V-cycles multigrid_solve will run
+mg_smooth_sweeps = 2    # Red-black Gauss-Seidel sweeps before and after each coarse grid correction
+mg_direct_size = 16     # Grids are halved until they are this size or smaller, then solved directly
+mg_direct_max = 32      # Coarsest grids that can not be halved that far (eg N is odd) are still solved directly up to this size, relaxed if larger
+mg_cache_bytes = 64 * 2 ** 20   # Most memory the cached coarsest level inverses may take, enough for every system of an Ensemble's tick
+
+_mg_coarse_inverses = OrderedDict()  # Cached coarsest level inverse matrices, keyed by (N, b, a, c, boundary policy name), least recently used first
+
+_no_pool = StripPool()    # Runs every kernel whole on the calling thread
+
+jit = None                # ClWxSim.sim.jit_kernels once it has been imported, see _jit_available
+
+def _jit_available():
+    """returns True if the compiled kernels can be used, importing them (and Numba) the first time it is called"""
+    global jit
+    if jit is None:
+        import ClWxSim.sim.jit_kernels as jit_kernels
+        jit = jit_kernels
+    return jit.available
+
+def resolve_backend(backend):
+    """returns the backend that will actually be used for the requested backend name
+
+    Args:
+        backend (str or None): "numpy", "numba" or None (same as "numpy")
+    """
+    if backend is None:
+        return "numpy"
+    if backend not in BACKENDS:
+        raise ValueError("Unknown solver backend '{}', expected one of {}".format(backend, BACKENDS))
+    if backend == "numba" and not _jit_available():
+        return "numpy"
+    return backend
+
+def _use_jit(backend, x):
+    """returns True if the compiled kernels should be used for the array x"""
+    return backend == "numba" and _jit_available() and x.ndim == 2
+
+def _jit_mode(backend, bnd, x):
+    """returns the compiled kernels' boundary mode, or None if the NumPy kernels should be used"""
+    if not _use_jit(backend, x):
+        return None
+    # Custom boundary policies can only be applied from Python
+    return jit.BOUNDARY_MODES.get(bnd.name)
+
+@timed("add_source")
+def add_source(N, x, s, dt, ws=None):
     """Adds s to x, taking into account dt
 
     Args:
@@ -11,43 +99,38 @@ def add_source(N, x, s, dt):
         x (array of size N+2): Main array
         s (array of size N+2): Secondary array to be added to x
         dt (float): Length of time of each tick
+        ws (Workspace, optional): Scratch arrays to use, if not given temporary arrays are made
     """
     size = (N + 2)
-    x[0:size, 0:size] += dt * s[0:size, 0:size]
+    if ws is None:
+        x[..., 0:size, 0:size] += dt * s[..., 0:size, 0:size]
+        return
+
+    t = ws.array("add_source", x.shape)
+    np.multiply(s[..., 0:size, 0:size], dt, out=t)
+    x[..., 0:size, 0:size] += t
 
-def set_bnd(N, b, x):
-    """Sets boundary cell values to their adjacent central cell
+def set_bnd(N, b, x, bnd=None, backend=None):
+    """Sets boundary cell values using a boundary policy (see ClWxSim.sim.boundary)
 
     Args:
         N (int): Size of array excluding boundary cells
         b (int): Defines whether to make the boundary values negative (0 = none, 1 = only left and right, 2 = only top and bottom)
         x (array of size N+2): The array to set the boundary cell values of
+        bnd (boundary policy, optional): Policy to apply, defaults to reflective walls on every edge
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
     """
-    # Sets boundary wall cell values to the adjacent central cell
-    # If b=1 Left and Right walls are negative (cancels out adjacent central cell velocity?)
-    # If b=2 Top and Bottom walls are negative (cancels out adjacent central cell velocity?)
-    for i in range(1, N + 1):
-        if b == 1:
-            x[0, i] = -x[1, i]      # Left wall
-            x[N + 1, i] = -x[N, i]  # Right wall
-        else:
-            x[0, i] = x[1, i]       # Left wall
-            x[N + 1, i] = x[N, i]   # Right wall
+    if bnd is None:
+        bnd = walls
 
-        if b == 2:
-            x[i, 0] = -x[i, 1]      # Bottom wall
-            x[i, N + 1] = -x[i, N]  # Top wall
-        else:
-            x[i, 0] = x[i, 1]       # Bottom wall
-            x[i, N + 1] = x[i, N]   # Top wall
-
-    # Average corners from adjacent boundary cells
-    x[0, 0] = 0.5 * (x[1, 0] + x[0, 1])
-    x[0, N + 1] = 0.5 * (x[1, N + 1] + x[0, N])
-    x[N + 1, 0] = 0.5 * (x[N, 0] + x[N + 1, 1])
-    x[N + 1, N + 1] = 0.5 * (x[N, N + 1] + x[N + 1, N])
+    mode = _jit_mode(backend, bnd, x)
+    if mode is not None:
+        jit.set_bnd(N, b, x, mode)
+    else:
+        bnd.apply(N, b, x)
 
-def lin_solve(N, b, x, x0, a, c):
+@timed("lin_solve")
+def lin_solve(N, b, x, x0, a, c, bnd=None, backend=None, ws=None, pool=None, sweeps=None):
     """Gauss-Seidel linear equation solver
 
     Args:
@@ -57,17 +140,466 @@ def lin_solve(N, b, x, x0, a, c):
         x0 (array of size N+2): The previous value of x
         a (float): Linear solver parameter
         c (float): Linear solver parameter
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Scratch arrays to use, if not given temporary arrays are made
+        pool (StripPool, optional): Threads to split the sweeps between, by strips of rows
+        sweeps (int, optional): Number of sweeps to run, defaults to lin_solve_sweeps
     """
+    if bnd is None:
+        bnd = walls
+    if sweeps is None:
+        sweeps = lin_solve_sweeps
+
+    mode = _jit_mode(backend, bnd, x)
+    if mode is not None:
+        jit.lin_solve(N, b, x, x0, a, c, mode, sweeps)
+        return
+
+    if ws is None:
+        ws = Workspace(N)
+
+    if pool is not None and pool.active(N):
+        _lin_solve_strips(N, b, x, x0, a, c, bnd, ws, pool, sweeps)
+        return
+
+    t = ws.array("lin_solve", x.shape[:-2] + (N, N))
+
+    for k in range(0, sweeps):
+        # x0 + a * (sum of neighbours), all read before any cell is updated
+        np.add(x[..., 0:N, 1:N + 1], x[..., 2:N + 2, 1:N + 1], out=t)
+        t += x[..., 1:N + 1, 0:N]
+        t += x[..., 1:N + 1, 2:N + 2]
+        t *= a
+        t += x0[..., 1:N + 1, 1:N + 1]
+        t /= c
+        x[..., 1:N + 1, 1:N + 1] = t
+        set_bnd(N, b, x, bnd)
+
+def _lin_solve_strips(N, b, x, x0, a, c, bnd, ws, pool, sweeps):
+    """lin_solve split into strips of rows, each sweep reads one array and writes the other so no strip
+    overwrites rows another strip is still reading"""
+
+    arrays = [x, ws.array("lin_solve_swap", x.shape)]
+
+    for k in range(0, sweeps):
+        pool.run(lambda start, stop: jacobi_rows(N, arrays[0], arrays[1], x0, a, c, start, stop, ws.strip(start)), 1, N + 1)
+        set_bnd(N, b, arrays[1], bnd)
+        arrays.reverse()
+
+    if arrays[0] is not x:
+        x[:] = arrays[0]
+
+def jacobi_rows(N, x, out, x0, a, c, start, stop, ws):
+    """Writes one Jacobi sweep of lin_solve's system for rows start to stop of x into the same rows of out
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        x (array of size N+2): The current solution, with its boundary cells set, read from rows start-1 to stop+1
+        out (array of size N+2): The array to write the central cells of rows start to stop to, must not be x
+        x0 (array of size N+2): The right hand side of the system
+        a (float): Linear solver parameter
+        c (float): Linear solver parameter
+        start (int): First row to sweep, at least 1
+        stop (int): Row after the last row to sweep, at most N+1
+        ws (Workspace): Scratch arrays to use
+    """
+
+    t = ws.array("lin_solve", x.shape[:-2] + (stop - start, N))
+    np.add(x[..., start - 1:stop - 1, 1:N + 1], x[..., start + 1:stop + 1, 1:N + 1], out=t)
+    t += x[..., start:stop, 0:N]
+    t += x[..., start:stop, 2:N + 2]
+    t *= a
+    t += x0[..., start:stop, 1:N + 1]
+    t /= c
+    out[..., start:stop, 1:N + 1] = t
+
+@timed("jacobi_solve")
+def jacobi_solve(N, b, x, x0, a, c, tol=None, max_sweeps=None, bnd=None, backend=None, ws=None, pool=None):
+    """Jacobi solver for the lin_solve system that stops once the residual, relative to x0, is below tol
+
+    Each sweep keeps at most 4a/c of the error, so once the first residual is known the sweeps needed to reach tol
+    are worked out from it, and the residual is only measured again to check. For the diagonally dominant systems
+    of diffuse (small a) this takes a few sweeps, where multigrid would spend most of its time on coarse levels.
+    For batched arrays every member is swept until the worst member's residual is below tol.
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        b (int): Defines whether to make the boundary values negative (0 = none, 1 = only left and right, 2 = only top and bottom)
+        x (array of size N+2): The array to solve for, the current contents are the first guess
+        x0 (array of size N+2): The right hand side of the system
+        a (float): Linear solver parameter
+        c (float): Linear solver parameter
+        tol (float, optional): Relative residual to stop at, defaults to mg_tol
+        max_sweeps (int, optional): Maximum number of sweeps, defaults to jacobi_max_sweeps
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Scratch arrays to use, if not given temporary arrays are made
+        pool (StripPool, optional): Threads to split the sweeps between, by strips of rows
+
+    Returns:
+        (int, float): The number of sweeps used and the final relative residual (the largest of any member)
+    """
+
+    if tol is None:
+        tol = mg_tol
+    if max_sweeps is None:
+        max_sweeps = jacobi_max_sweeps
+    if bnd is None:
+        bnd = walls
+    if ws is None:
+        ws = Workspace(N)
+
+    rate = float(np.max(4 * np.abs(a) / np.abs(c)))
+    r = ws.array("jacobi_residual", x.shape)
+    rhs_norm = np.sqrt(np.einsum("...ij,...ij->...", x0[..., 1:N + 1, 1:N + 1], x0[..., 1:N + 1, 1:N + 1]))
+    rhs_norm = np.where(rhs_norm == 0, 1., rhs_norm)
+
+    set_bnd(N, b, x, bnd, backend)
+    res = np.max(_mg_residual_norm(N, x, x0, a, c, r, False, backend, ws) / rhs_norm)
+
+    sweeps = 0
+    while res > tol and sweeps < max_sweeps:
+        if rate == 0:
+            needed = 1
+        elif rate < 1:
+            needed = max(1, int(np.ceil(np.log(tol / res) / np.log(rate))))
+        else:
+            needed = max_sweeps
+        needed = min(needed, max_sweeps - sweeps)
+
+        lin_solve(N, b, x, x0, a, c, bnd, backend, ws, pool, sweeps=needed)
+        sweeps += needed
+        res = np.max(_mg_residual_norm(N, x, x0, a, c, r, False, backend, ws) / rhs_norm)
+
+    return sweeps, float(res)
+
+def smooth(N, b, x, x0, a, c, sweeps=1, bnd=None, backend=None, ws=None, pool=None):
+    """Red-black Gauss-Seidel relaxation of the same system lin_solve solves
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        b (int): Defines whether to make the boundary values negative (0 = none, 1 = only left and right, 2 = only top and bottom)
+        x (array of size N+2): The array to solve for, updated in place
+        x0 (array of size N+2): The right hand side of the system
+        a (float): Linear solver parameter
+        c (float): Linear solver parameter
+        sweeps (int, optional): Number of red and black sweep pairs to run, defaults to 1
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Scratch arrays to use, if not given temporary arrays are made
+        pool (StripPool, optional): Threads to split each colour's sweep between, by strips of rows
+    """
+    if bnd is None:
+        bnd = walls
+
+    mode = _jit_mode(backend, bnd, x)
+    if mode is not None:
+        jit.smooth(N, b, x, x0, a, c, sweeps, mode)
+        return
+
+    if ws is None:
+        ws = Workspace(N)
+    if pool is None:
+        pool = _no_pool
+
+    for k in range(sweeps):
+        # Red cells have (i + j) even, black cells have (i + j) odd
+        # Cells of one colour only read cells of the other, so a colour's rows can be updated in any order
+        for colour in (((1, 1), (2, 2)), ((1, 2), (2, 1))):
+            def sweep(start, stop):
+                strip_ws = ws if start == 1 else ws.strip(start)
+                for si, sj in colour:
+                    i0 = start + (si - start) % 2   # First row of the strip with this parity
+                    if i0 >= stop:
+                        continue
+                    I, J = slice(i0, stop, 2), slice(sj, N + 1, 2)
+                    t = strip_ws.array("smooth", x.shape[:-2] + ((stop - i0 + 1) // 2, (N + 2 - sj) // 2))
+                    np.add(x[..., i0 - 1:stop - 1:2, J], x[..., i0 + 1:stop + 1:2, J], out=t)
+                    t += x[..., I, sj - 1:N:2]
+                    t += x[..., I, sj + 1:N + 2:2]
+                    t *= a
+                    t += x0[..., I, J]
+                    t /= c
+                    x[..., I, J] = t
+
+            pool.run(sweep, 1, N + 1)
+            set_bnd(N, b, x, bnd)
+
+def residual(N, x, x0, a, c, r, backend=None, ws=None):
+    """Calculates the residual x0 - (c*x - a*(sum of neighbours)) of the lin_solve system
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        x (array of size N+2): The current solution, with its boundary cells already set
+        x0 (array of size N+2): The right hand side of the system
+        a (float): Linear solver parameter
+        c (float): Linear solver parameter
+        r (array of size N+2): Array to store the residual in, boundary cells are set to 0
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Scratch arrays to use, if not given temporary arrays are made
+    """
+
+    if _use_jit(backend, x):
+        jit.residual(N, x, x0, a, c, r)
+        return
+
+    if ws is None:
+        ws = Workspace(N)
+    t = ws.array("residual", x.shape[:-2] + (N, N))
+
+    np.add(x[..., 0:N, 1:N + 1], x[..., 2:N + 2, 1:N + 1], out=t)
+    t += x[..., 1:N + 1, 0:N]
+    t += x[..., 1:N + 1, 2:N + 2]
+    t *= a
+
+    ri = r[..., 1:N + 1, 1:N + 1]
+    np.multiply(x[..., 1:N + 1, 1:N + 1], c, out=ri)
+    ri -= t
+    np.subtract(x0[..., 1:N + 1, 1:N + 1], ri, out=ri)
+    r[..., 0, :] = r[..., N + 1, :] = r[..., :, 0] = r[..., :, N + 1] = 0
+
+@timed("multigrid_solve")
+def multigrid_solve(N, b, x, x0, a, c, tol=None, max_cycles=None, bnd=None, backend=None, ws=None, pool=None):
+    """Geometric multigrid (V-cycle) solver for the system lin_solve relaxes, ie c*x - a*(sum of neighbours) = x0
+
+    Cycles are run until the residual, relative to x0, is below tol or max_cycles is reached.
+    For batched arrays every member is cycled until the worst member's residual is below tol.
+    The current contents of x are used as the first guess.
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        b (int): Defines whether to make the boundary values negative (0 = none, 1 = only left and right, 2 = only top and bottom)
+        x (array of size N+2): The array to solve for
+        x0 (array of size N+2): The right hand side of the system
+        a (float): Linear solver parameter
+        c (float): Linear solver parameter
+        tol (float, optional): Relative residual to stop at, defaults to mg_tol
+        max_cycles (int, optional): Maximum number of V-cycles, defaults to mg_max_cycles
+        bnd (boundary policy, optional): Policy used to set boundary cells on every level, defaults to reflective walls
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Holds the coarse grids and scratch arrays, if not given they are made for this call
+        pool (StripPool, optional): Threads to split the smoothing sweeps between, by strips of rows
+
+    Returns:
+        (int, float): The number of V-cycles used and the final relative residual (the largest of any member)
+    """
+
+    if tol is None:
+        tol = mg_tol
+    if max_cycles is None:
+        max_cycles = mg_max_cycles
+    if bnd is None:
+        bnd = walls
+    if ws is None:
+        ws = Workspace(N)
+
+    levels = _mg_levels(N, a, c, x.shape[:-2], ws)
+
+    # With no c*x term and copied boundaries (eg the pressure solve in project), x is only defined up to a constant
+    singular = _mg_singular(b, a, c, bnd)
+    if singular:
+        # Only the zero mean part of x0 can be matched, so solve for that (the least squares solution, as the direct solve gives).
+        # The finest level's rhs array is otherwise unused, so holds it
+        rhs = levels[0][5]
+        rhs[...] = x0
+        rhs[..., 1:N + 1, 1:N + 1] -= rhs[..., 1:N + 1, 1:N + 1].mean(axis=(-2, -1), keepdims=True)
+        x0 = rhs
+
+    set_bnd(N, b, x, bnd, backend)
+    r = levels[0][3]
+    res = _mg_residual_norm(N, x, x0, a, c, r, singular, backend, ws)
+
+    rhs_norm = np.sqrt(np.einsum("...ij,...ij->...", x0[..., 1:N + 1, 1:N + 1], x0[..., 1:N + 1, 1:N + 1]))
+    rhs_norm = np.where(rhs_norm == 0, 1., rhs_norm)
+    res = np.max(res / rhs_norm)
+
+    cycles = 0
+    while res > tol and cycles < max_cycles:
+        _v_cycle(levels, 0, b, x, x0, singular, bnd, backend, ws, pool)
+        cycles += 1
+
+        res = np.max(_mg_residual_norm(N, x, x0, a, c, r, singular, backend, ws) / rhs_norm)
+
+    return cycles, float(res)
+
+def _mg_residual_norm(N, x, x0, a, c, r, singular, backend, ws):
+    """Stores the residual in r and returns its 2-norm (one per member), ignoring any constant part if the system is singular"""
+
+    residual(N, x, x0, a, c, r, backend, ws)
+
+    # Boundary cells of r are zero, so sums over the whole of each member only see the central cells
+    if singular:
+        r[..., 1:N + 1, 1:N + 1] -= r.sum(axis=(-2, -1), keepdims=True) / (N * N)
+    return np.sqrt(np.einsum("...ij,...ij->...", r, r))
+
+def _mg_singular(b, a, c, bnd):
+    """returns True if the lin_solve system has no c*x term and boundaries that leave it without a unique solution"""
+    return bnd.singular(b) and bool(np.all(np.abs(c - 4 * a) <= 1e-12 * np.abs(c)))
+
+def _mg_levels(N, a, c, batch, ws):
+    """returns the multigrid hierarchy as a list of (N, a, c, residual array, correction array, rhs array), finest first"""
+    levels = []
+    while True:
+        shape = batch + (N + 2, N + 2)
+        levels.append((N, a, c, ws.array("mg_residual", shape), ws.array("mg_correction", shape), ws.array("mg_rhs", shape)))
+
+        if N <= mg_direct_size or N % 2 != 0:
+            return levels
 
-    for k in range(0, 20):
-        x[1:N + 1, 1:N + 1] = (x0[1:N + 1, 1:N + 1] + a *
-                               (x[0:N, 1:N + 1] +
-                                x[2:N + 2, 1:N + 1] +
-                                x[1:N + 1, 0:N] +
-                                x[1:N + 1, 2:N + 2])) / c
-        set_bnd(N, b, x)
+        # Halving the grid quadruples the cell area, so the neighbour coupling drops by 4 while the c*x term is kept
+        N, a, c = N // 2, a / 4, c - 3 * a
 
-def diffuse(N, b, x, x0, diff, dt):
+def _v_cycle(levels, k, b, x, x0, singular, bnd, backend, ws, pool):
+    """Runs one V-cycle from level k of the hierarchy on the system for x"""
+
+    N, a, c, r = levels[k][0:4]
+
+    if k == len(levels) - 1:
+        _coarsest_solve(N, b, x, x0, a, c, singular, bnd, backend, ws, pool)
+        return
+
+    smooth(N, b, x, x0, a, c, mg_smooth_sweeps, bnd, backend, ws, pool)
+
+    # Restrict the residual onto the coarse grid by averaging each 2x2 block
+    residual(N, x, x0, a, c, r, backend, ws)
+    Nc, ec, rc = levels[k + 1][0], levels[k + 1][4], levels[k + 1][5]
+    _restrict(N, r, rc, backend)
+    if singular:
+        rc[..., 1:Nc + 1, 1:Nc + 1] -= rc.sum(axis=(-2, -1), keepdims=True) / (Nc * Nc)
+
+    # Solve for the coarse correction
+    ec[:] = 0
+    _v_cycle(levels, k + 1, b, ec, rc, singular, bnd, backend, ws, pool)
+    set_bnd(Nc, b, ec, bnd, backend)
+
+    _prolong(N, ec, x, backend, ws)
+    set_bnd(N, b, x, bnd, backend)
+
+    smooth(N, b, x, x0, a, c, mg_smooth_sweeps, bnd, backend, ws, pool)
+
+def _restrict(N, r, rc, backend):
+    """Averages each 2x2 block of the fine grid r onto the coarse grid rc (whose boundary cells stay zero)"""
+
+    if _use_jit(backend, r):
+        jit.restrict(N, r, rc)
+        return
+
+    Nc = N // 2
+    rci = rc[..., 1:Nc + 1, 1:Nc + 1]
+    np.add(r[..., 1:N + 1:2, 1:N + 1:2], r[..., 2:N + 1:2, 1:N + 1:2], out=rci)
+    rci += r[..., 1:N + 1:2, 2:N + 1:2]
+    rci += r[..., 2:N + 1:2, 2:N + 1:2]
+    rci *= 0.25
+
+def _prolong(N, ec, x, backend, ws):
+    """Adds the bilinear interpolation of the coarse correction ec onto x (3/4 own coarse cell, 1/4 neighbour in each direction)"""
+
+    if _use_jit(backend, x):
+        jit.prolong(N, ec, x)
+        return
+
+    Nc = N // 2
+    own = slice(1, Nc + 1)
+    t = ws.array("prolong", x.shape[:-2] + (Nc, Nc))
+    t2 = ws.array("prolong_sum", x.shape[:-2] + (Nc, Nc))
+    for si, ni in ((1, slice(0, Nc)), (2, slice(2, Nc + 2))):
+        for sj, nj in ((1, slice(0, Nc)), (2, slice(2, Nc + 2))):
+            np.multiply(ec[..., own, own], 0.5625, out=t2)
+            np.add(ec[..., ni, own], ec[..., own, nj], out=t)
+            t *= 0.1875
+            t2 += t
+            np.multiply(ec[..., ni, nj], 0.0625, out=t)
+            t2 += t
+            x[..., si:N + 1:2, sj:N + 1:2] += t2
+
+def _coarsest_solve(N, b, x, x0, a, c, singular, bnd, backend, ws, pool):
+    """Solves the coarsest level, directly if it is small enough or by relaxation otherwise"""
+
+    batch = x.shape[:-2]
+    per_member = np.ndim(a) != 0 or np.ndim(c) != 0
+
+    inv = None
+    if N <= mg_direct_max:
+        if per_member:
+            # Members with their own a and c (eg per member diffusion rates) each have their own system
+            member_a = np.broadcast_to(a, batch + (1, 1))[..., 0, 0]
+            member_c = np.broadcast_to(c, batch + (1, 1))[..., 0, 0]
+            inv = _coarse_inverse(N, b, member_a, member_c, singular, bnd)
+        else:
+            inv = _coarse_inverse(N, b, a, c, singular, bnd)
+    if inv is None:
+        # Grid could not be halved down to a size small enough to solve directly (eg N is odd),
+        # or the members' inverses would not fit in the cache, fall back to plain relaxation
+        smooth(N, b, x, x0, a, c, 4 * N, bnd, backend, ws, pool)
+        return
+
+    rhs = ws.array("coarse_rhs", batch + (N * N,))
+    sol = ws.array("coarse_solution", batch + (N * N,))
+    rhs.reshape(batch + (N, N))[:] = x0[..., 1:N + 1, 1:N + 1]
+
+    if per_member:
+        # One stacked inverse per member, applied to every member at once
+        np.matmul(inv, rhs[..., None], out=sol[..., None])
+    elif batch:
+        # Every member shares the system, so solve them all at once
+        np.matmul(rhs, inv.T, out=sol)
+    else:
+        np.matmul(inv, rhs, out=sol)
+
+    x[..., 1:N + 1, 1:N + 1] = sol.reshape(batch + (N, N))
+    set_bnd(N, b, x, bnd, backend)
+
+def _coarse_inverse(N, b, a, c, singular, bnd):
+    """returns the (cached) inverse of the coarsest level system matrix
+
+    For scalar a and c this is one (N*N, N*N) matrix. For arrays of a and c, one per member, it is a stack of the members'
+    inverses, shape a.shape + (N*N, N*N), found in one batched inversion, or None if the stack would not fit in the cache.
+    """
+
+    per_member = np.ndim(a) != 0
+    key = (N, b, tuple(a.ravel()), tuple(c.ravel()), bnd.name) if per_member else (N, b, a, c, bnd.name)
+    # Popped and put back, so the most recently used inverses are at the end
+    inv = _mg_coarse_inverses.pop(key, None)
+    if inv is None:
+        if per_member and a.size * (N * N) ** 2 * 8 > mg_cache_bytes:
+            return None
+
+        S = _neighbour_matrix(N, b, bnd)
+        if per_member:
+            mat = -a[..., None, None] * S
+            mat[..., np.arange(N * N), np.arange(N * N)] += c[..., None]
+        else:
+            mat = -a * S
+            mat[np.diag_indices(N * N)] += c
+
+        # The pseudo inverse gives the zero mean solution when the system is singular
+        inv = np.linalg.pinv(mat) if singular else np.linalg.inv(mat)
+    _mg_coarse_inverses[key] = inv
+
+    cached = sum(value.nbytes for value in _mg_coarse_inverses.values())
+    while cached > mg_cache_bytes and len(_mg_coarse_inverses) > 1:
+        cached -= _mg_coarse_inverses.popitem(last=False)[1].nbytes
+    return inv
+
+def _neighbour_matrix(N, b, bnd):
+    """returns the (N*N, N*N) matrix taking the central cells of a grid to the sum of each one's neighbours
+
+    Boundary cells follow set_bnd, so are folded into the matrix. The lin_solve system matrix is then c*I - a*S.
+    Every unit grid is set up at once, as a batch, rather than one cell at a time.
+    """
+
+    n = N * N
+    k = np.arange(n)
+    e = np.zeros((n, N + 2, N + 2))
+    e[k, 1 + k // N, 1 + k % N] = 1
+    set_bnd(N, b, e, bnd)
+    sums = e[:, 0:N, 1:N + 1] + e[:, 2:N + 2, 1:N + 1] + e[:, 1:N + 1, 0:N] + e[:, 1:N + 1, 2:N + 2]
+    # Row k of sums is column k of the matrix, the response to unit grid k
+    return sums.reshape(n, n).T
+
+@timed("diffuse")
+def diffuse(N, b, x, x0, diff, dt, bnd=None, backend=None, ws=None, solver=None, pool=None):
     """Calculates the changes to array x after diffusion
 
     Args:
@@ -75,16 +607,167 @@ def diffuse(N, b, x, x0, diff, dt):
         b (int): Defines whether to make the boundary values negative (0 = none, 1 = only left and right, 2 = only top and bottom)
         x (array of size N+2): The array to diffuse
         x0 (array of size N+2): The previous value of x
-        diff (float > 0): Rate of diffusion
-        dt (float): Length of time of each tick
+        diff (float > 0, or array): Rate of diffusion, may be one rate per member for batched arrays
+        dt (float, or array): Length of time of each tick, may be one length per member for batched arrays
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Scratch arrays to use, if not given temporary arrays are made
+        solver (str, optional): "jacobi", "multigrid" or "lin_solve" (a fixed number of Jacobi sweeps), defaults to diffuse_solver.
+            "jacobi" uses jacobi_solve while every member's 4a/c is at most jacobi_max_rate, and multigrid otherwise
+        pool (StripPool, optional): Threads to split the sweeps between, by strips of rows
+
+    Returns:
+        (int, float): The number of Jacobi sweeps or multigrid V-cycles used and the final relative residual, None for lin_solve
     """
 
+    if solver is None:
+        solver = diffuse_solver
+    if solver not in DIFFUSE_SOLVERS:
+        raise ValueError("Unknown diffusion solver '{}', expected one of {}".format(solver, DIFFUSE_SOLVERS))
+
     a = dt * diff * N * N
-    lin_solve(N, b, x, x0, a, 1 + 4 * a)
+    if solver == "lin_solve":
+        lin_solve(N, b, x, x0, a, 1 + 4 * a, bnd=bnd, backend=backend, ws=ws, pool=pool)
+        return None
+    if solver == "jacobi" and np.max(4 * a / (1 + 4 * a)) <= jacobi_max_rate:
+        return jacobi_solve(N, b, x, x0, a, 1 + 4 * a, tol=diffuse_tol, bnd=bnd, backend=backend, ws=ws, pool=pool)
+    return multigrid_solve(N, b, x, x0, a, 1 + 4 * a, tol=diffuse_tol, bnd=bnd, backend=backend, ws=ws, pool=pool)
 
-def advect(N, b, d, d0, u, v, dt):
+@timed("advect")
+def advect(N, b, d, d0, u, v, dt, reference=False, bnd=None, backend=None, ws=None, pool=None):
     """Calculates the changes to array d after advection due to the vector arrays [u v]
 
+    The back-trace, clamping and bilinear interpolation are done for the whole grid at once.
+    Set reference to True to use the original cell by cell loop instead, which gives the same result.
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        b (int): Defines whether to make the boundary values negative (0 = none, 1 = only left and right, 2 = only top and bottom)
+        d (array of size N+2): The density array, which will be advected by [u v]
+        d0 (array of size N+2): The previous value of d
+        u (array of size N+2): The x component velocity vector array
+        v (array of size N+2): The y component velocity vector array
+        dt (float, or array): Length of time of each tick, may be one length per member for batched arrays
+        reference (bool, optional): If true, use the slow per cell loop (advect_reference)
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Scratch arrays to use, if not given temporary arrays are made
+        pool (StripPool, optional): Threads to split the rows between
+    """
+
+    if bnd is None:
+        bnd = walls
+
+    if reference:
+        advect_reference(N, b, d, d0, u, v, dt, bnd)
+        return
+
+    mode = _jit_mode(backend, bnd, d)
+    if mode is not None:
+        jit.advect(N, b, d, d0, u, v, dt, bnd.periodic, mode)
+        return
+
+    if ws is None:
+        ws = Workspace(N)
+    if pool is not None and pool.active(N):
+        pool.run(lambda start, stop: advect_rows(N, d, d0, u, v, dt, start, stop, bnd.periodic, ws.strip(start)), 1, N + 1)
+    else:
+        advect_rows(N, d, d0, u, v, dt, 1, N + 1, bnd.periodic, ws)
+    set_bnd(N, b, d, bnd)
+
+def advect_rows(N, d, d0, u, v, dt, start, stop, periodic, ws):
+    """Advects the central cells of rows start to stop of d (see advect), without setting any boundary cells
+
+    Each cell is traced back from its own velocity and read from anywhere in d0, so a strip of rows can be
+    advected on its own as long as all of d0 is up to date.
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        d (array of size N+2): The density array, which will be advected by [u v]
+        d0 (array of size N+2): The previous value of d
+        u (array of size N+2): The x component velocity vector array
+        v (array of size N+2): The y component velocity vector array
+        dt (float, or array): Length of time of each tick, may be one length per member for batched arrays
+        start (int): First row to advect, at least 1
+        stop (int): Row after the last row to advect, at most N+1
+        periodic (bool): True if axis 1 (longitude) wraps around
+        ws (Workspace): Scratch arrays to use
+    """
+
+    batch = d.shape[:-2]
+    shape = batch + (stop - start, N)
+    rows = slice(start, stop)
+    dt0 = dt * N
+
+    # Trace each cell back along the velocity field, clamped to the centre of the boundary cells
+    # If longitude wraps, y is instead wrapped round into the same range, the boundary cells hold the wrapped values
+    idx = ws.constant(("advect_idx", N), lambda: np.arange(1, N + 1, dtype=float))
+    x = ws.array("advect_x", shape)
+    y = ws.array("advect_y", shape)
+    np.multiply(u[..., rows, 1:N + 1], dt0, out=x)
+    np.subtract(idx[start - 1:stop - 1, np.newaxis], x, out=x)
+    np.multiply(v[..., rows, 1:N + 1], dt0, out=y)
+    np.subtract(idx[np.newaxis, :], y, out=y)
+    np.clip(x, 0.5, N + 0.5, out=x)
+    if periodic:
+        y -= 0.5
+        np.mod(y, N, out=y)
+        y += 0.5
+    else:
+        np.clip(y, 0.5, N + 0.5, out=y)
+
+    # Traced positions are always >= 0.5, so truncation is the same as floor
+    i0 = ws.array("advect_i0", shape, int)
+    j0 = ws.array("advect_j0", shape, int)
+    np.copyto(i0, x, casting="unsafe")
+    np.copyto(j0, y, casting="unsafe")
+
+    # Interpolation weights, x and y are reused for s1 and t1
+    s0 = ws.array("advect_s0", shape)
+    t0 = ws.array("advect_t0", shape)
+    s1 = np.subtract(x, i0, out=x)
+    np.subtract(1, s1, out=s0)
+    t1 = np.subtract(y, j0, out=y)
+    np.subtract(1, t1, out=t0)
+
+    # Gather the four surrounding cells through flat indices into d0, [i0 j0], [i0 j1], [i1 j0] then [i1 j1]
+    # The indices are always in range, mode="clip" only stops take from buffering its output
+    flat = ws.array("advect_flat", shape, int)
+    np.multiply(i0, N + 2, out=flat)
+    flat += j0
+    if batch:
+        # Offset each member's indices to the start of that member in the flattened d0
+        offsets = ws.constant(("advect_offsets", batch, N), lambda: np.arange(0, d0.size, (N + 2) ** 2).reshape(batch + (1, 1)))
+        flat += offsets
+    d0_flat = d0.reshape(-1)
+
+    g0 = ws.array("advect_g0", shape)
+    g1 = ws.array("advect_g1", shape)
+    g2 = ws.array("advect_g2", shape)
+
+    np.take(d0_flat, flat, out=g0, mode="clip")
+    flat += 1
+    np.take(d0_flat, flat, out=g1, mode="clip")
+    g0 *= t0
+    g1 *= t1
+    g0 += g1
+    g0 *= s0
+
+    flat += N + 1
+    np.take(d0_flat, flat, out=g1, mode="clip")
+    flat += 1
+    np.take(d0_flat, flat, out=g2, mode="clip")
+    g1 *= t0
+    g2 *= t1
+    g1 += g2
+    g1 *= s1
+
+    g0 += g1
+    d[..., rows, 1:N + 1] = g0
+
+def advect_reference(N, b, d, d0, u, v, dt, bnd=None):
+    """Cell by cell version of advect, kept as a reference to check the vectorised version against
+
     Args:
         N (int): Size of array excluding boundary cells
         b (int): Defines whether to make the boundary values negative (0 = none, 1 = only left and right, 2 = only top and bottom)
@@ -93,8 +776,12 @@ def advect(N, b, d, d0, u, v, dt):
         u (array of size N+2): The x component velocity vector array
         v (array of size N+2): The y component velocity vector array
         dt (float): Length of time of each tick
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
     """
 
+    if bnd is None:
+        bnd = walls
+
     dt0 = dt * N
     for i in range(1, N + 1):
         for j in range(1, N + 1):
@@ -106,6 +793,8 @@ def advect(N, b, d, d0, u, v, dt):
                 x = N + 0.5
             i0 = int(x)
             i1 = i0 + 1
+            if bnd.periodic:
+                y = (y - 0.5) % N + 0.5
             if y < 0.5:
                 y = 0.5
             if y > N + 0.5:
@@ -119,43 +808,147 @@ def advect(N, b, d, d0, u, v, dt):
             t0 = 1 - t1
 
             d[i, j] = (s0 * (t0 * d0[i0, j0] + t1 * d0[i0, j1]) + s1 * (t0 * d0[i1, j0] + t1 * d0[i1, j1]))
-    set_bnd(N, b, d)
+    set_bnd(N, b, d, bnd)
 
 
-def project(N, u, v, p, div):
-    """project."""
+@timed("project")
+def project(N, u, v, p, div, bnd=None, backend=None, ws=None, solver=None, pool=None):
+    """Removes the divergent part of the velocity field [u v], leaving a mass conserving field
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        u (array of size N+2): The x component velocity vector array
+        v (array of size N+2): The y component velocity vector array
+        p (array of size N+2): Scratch array, left holding the pressure like field that was removed
+        div (array of size N+2): Scratch array, left holding the divergence of the original field
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Scratch arrays to use, if not given temporary arrays are made
+        solver (str, optional): Poisson solver, "spectral" or "multigrid", defaults to project_solver.
+            The spectral solver is only used if the boundary policy supports it, multigrid is used otherwise
+        pool (StripPool, optional): Threads to split the multigrid smoothing sweeps between, by strips of rows
+
+    Returns:
+        (int, float): The number of multigrid V-cycles used and the final relative residual, (0, 0.) for the exact spectral solve
+    """
+
+    if bnd is None:
+        bnd = walls
+    if solver is None:
+        solver = project_solver
+    if solver not in PROJECT_SOLVERS:
+        raise ValueError("Unknown projection solver '{}', expected one of {}".format(solver, PROJECT_SOLVERS))
+    if ws is None:
+        ws = Workspace(N)
 
     h = 1.0 / N
-    div[1:N + 1, 1:N + 1] = (-0.5 * h *
-                             (u[2:N + 2, 1:N + 1] - u[0:N, 1:N + 1] +
-                              v[1:N + 1, 2:N + 2] - v[1:N + 1, 0:N]))
-    p[1:N + 1, 1:N + 1] = 0
-    set_bnd(N, 0, div)
-    set_bnd(N, 0, p)
-    lin_solve(N, 0, p, div, 1, 4)
-    u[1:N + 1, 1:N + 1] -= 0.5 * (p[2:N + 2, 1:N + 1] - p[0:N, 1:N + 1]) / h
-    v[1:N + 1, 1:N + 1] -= 0.5 * (p[1:N + 1, 2:N + 2] - p[1:N + 1, 0:N]) / h
-    set_bnd(N, 1, u)
-    set_bnd(N, 2, v)
-
-def coriolis(N, u, v, dt, w, mod, wld):
-    """calclates wind acceleration due to the coriolis effect"""
-    u_add = np.zeros((N+2, N+2))
-    v_add = np.zeros((N+2, N+2))
-
-    for i in range(N+1):
-        for j in range(N+1):
-            u_add[i,j] = v[i, j] * 2 * w * math.sin(math.radians(calc_lat(N, i))) * mod
-            v_add[i,j] = -u[i, j] * 2 * w * math.sin(math.radians(calc_lat(N, i))) * mod
-
-    wld.dbg_coriolis_u[0:N+2,0:N+2] = u_add[0:N+2,0:N+2]
-    wld.dbg_coriolis_v[0:N+2,0:N+2] = v_add[0:N+2,0:N+2]
-
-    add_source(N, u, u_add, dt)
-    add_source(N, v, v_add, dt)
-
-    set_bnd(N, 1, u)
-    set_bnd(N, 2, v)
+    t = ws.array("project", u.shape[:-2] + (N, N))
+
+    divi = div[..., 1:N + 1, 1:N + 1]
+    np.subtract(u[..., 2:N + 2, 1:N + 1], u[..., 0:N, 1:N + 1], out=divi)
+    np.subtract(v[..., 1:N + 1, 2:N + 2], v[..., 1:N + 1, 0:N], out=t)
+    divi += t
+    divi *= -0.5 * h
+    p[..., 1:N + 1, 1:N + 1] = 0
+    set_bnd(N, 0, div, bnd, backend)
+    set_bnd(N, 0, p, bnd, backend)
+
+    if solver == "spectral" and spectral.supported(bnd, 0):
+        spectral.solve(N, p, div, 1, 4, bnd, ws)
+        stats = (0, 0.)
+    else:
+        stats = multigrid_solve(N, 0, p, div, 1, 4, bnd=bnd, backend=backend, ws=ws, pool=pool)
+
+    np.subtract(p[..., 2:N + 2, 1:N + 1], p[..., 0:N, 1:N + 1], out=t)
+    t *= 0.5 / h
+    u[..., 1:N + 1, 1:N + 1] -= t
+    np.subtract(p[..., 1:N + 1, 2:N + 2], p[..., 1:N + 1, 0:N], out=t)
+    t *= 0.5 / h
+    v[..., 1:N + 1, 1:N + 1] -= t
+    set_bnd(N, 1, u, bnd, backend)
+    set_bnd(N, 2, v, bnd, backend)
+
+    return stats
+
+@timed("coriolis")
+def coriolis(N, u, v, dt, w, mod, wld, bnd=None, backend=None, ws=None, pool=None):
+    """Calculates wind acceleration due to the coriolis effect
+
+    The acceleration is stored in wld.dbg_coriolis_u and wld.dbg_coriolis_v, then added to [u v].
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        u (array of size N+2): The x component velocity vector array
+        v (array of size N+2): The y component velocity vector array
+        dt (float): Length of time of each tick
+        w (float, or array): Planet's angular velocity, may be one per member for batched arrays (eg shape (K, 1, 1))
+        mod (float): Multiplier applied to the coriolis effect
+        wld (World): The World being simulated, provides the Geometry cache and debug arrays
+        bnd (boundary policy, optional): Policy used to set boundary cells, defaults to reflective walls
+        backend (str, optional): Kernel backend to use, defaults to "numpy"
+        ws (Workspace, optional): Scratch arrays to use, if not given temporary arrays are made
+        pool (StripPool, optional): Threads to split the rows between
+    """
+    if bnd is None:
+        bnd = walls
+    if ws is None:
+        ws = Workspace(N)
+
+    geo = wld.get_geometry()
+    if geo.matches(N, w):
+        f = geo.coriolis_f
+    else:
+        f = 2 * w * geo.sin_lat
+
+    # Both accelerations use the velocities from before either is applied
+    u_add = wld.dbg_coriolis_u
+    v_add = wld.dbg_coriolis_v
+
+    mode = _jit_mode(backend, bnd, u)
+    if mode is not None:
+        jit.coriolis(N, u, v, f, dt, mod, u_add, v_add, mode)
+        return
+
+    if pool is not None and pool.active(N + 2):
+        pool.run(lambda start, stop: coriolis_rows(u, v, f, dt, mod, u_add, v_add, start, stop, ws.strip(start)), 0, N + 2)
+    else:
+        np.multiply(v, f, out=u_add)
+        u_add *= mod
+        np.multiply(u, f, out=v_add)
+        v_add *= -mod
+
+        add_source(N, u, u_add, dt, ws)
+        add_source(N, v, v_add, dt, ws)
+
+    set_bnd(N, 1, u, bnd)
+    set_bnd(N, 2, v, bnd)
+
+def coriolis_rows(u, v, f, dt, mod, u_add, v_add, start, stop, ws):
+    """Adds the coriolis acceleration to rows start to stop of [u v], boundary rows and columns included, see coriolis
+
+    Args:
+        u (array of size N+2): The x component velocity vector array
+        v (array of size N+2): The y component velocity vector array
+        f (array): Coriolis parameter of each row, eg Geometry.coriolis_f
+        dt (float): Length of time of each tick
+        mod (float): Multiplier applied to the coriolis effect
+        u_add (array of size N+2): Rows start to stop are set to the u acceleration
+        v_add (array of size N+2): Rows start to stop are set to the v acceleration
+        start (int): First row to update
+        stop (int): Row after the last row to update
+        ws (Workspace): Scratch arrays to use
+    """
+
+    rows = np.s_[..., start:stop, :]
+    np.multiply(v[rows], f[rows], out=u_add[rows])
+    u_add[rows] *= mod
+    np.multiply(u[rows], f[rows], out=v_add[rows])
+    v_add[rows] *= -mod
+
+    t = ws.array("add_source", u[rows].shape)
+    for x, add in ((u, u_add), (v, v_add)):
+        np.multiply(add[rows], dt, out=t)
+        x[rows] += t
 
 def calc_lat(N, y):
     """returns the latitude (in deg) of a given y axis value, assumes map's latittude is linear and y=0 is the south pole"""
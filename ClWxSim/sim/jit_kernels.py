@@ -0,0 +1,173 @@
+"""Contains Numba compiled versions of the fluid_solver kernels
+
+Each kernel is a single loop nest working in place, so no temporary arrays are made.
+Numba is optional, if it can not be imported available is False and fluid_solver uses its NumPy versions instead.
+Kernels are compiled the first time they are called.
+"""
+
+try:
+    from numba import njit
+    available = True
+except ImportError:
+    available = False
+
+    def njit(*args, **kwargs):
+        """Stand in for numba.njit that leaves functions uncompiled"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+import numpy as np
+
+# Boundary policies the compiled kernels can apply, by policy name (see ClWxSim.sim.boundary)
+BOUNDARY_MODES = {"walls": 0, "periodic": 1, "polar": 2}
+
+@njit(cache=True)
+def set_bnd(N, b, x, mode):
+    """Sets boundary cell values, mode selects the policy (0 = walls, 1 = periodic, 2 = polar)"""
+
+    if mode == 2:
+        half = N // 2
+        s = 1.0 if b == 0 else -1.0
+        for j in range(1, N + 1):
+            k = (j - 1 + half) % N + 1
+            x[0, j] = s * x[1, k]
+            x[N + 1, j] = s * x[N, k]
+        for i in range(N + 2):
+            x[i, 0] = x[i, N]
+            x[i, N + 1] = x[i, 1]
+        return
+
+    s = -1.0 if b == 1 else 1.0
+    if mode == 1:
+        for i in range(1, N + 1):
+            x[i, 0] = x[i, N]
+            x[i, N + 1] = x[i, 1]
+        for j in range(N + 2):
+            x[0, j] = s * x[1, j]
+            x[N + 1, j] = s * x[N, j]
+        return
+
+    t = -1.0 if b == 2 else 1.0
+    for i in range(1, N + 1):
+        x[0, i] = s * x[1, i]
+        x[N + 1, i] = s * x[N, i]
+        x[i, 0] = t * x[i, 1]
+        x[i, N + 1] = t * x[i, N]
+
+    x[0, 0] = 0.5 * (x[1, 0] + x[0, 1])
+    x[0, N + 1] = 0.5 * (x[1, N + 1] + x[0, N])
+    x[N + 1, 0] = 0.5 * (x[N, 0] + x[N + 1, 1])
+    x[N + 1, N + 1] = 0.5 * (x[N, N + 1] + x[N + 1, N])
+
+@njit(cache=True)
+def lin_solve(N, b, x, x0, a, c, mode, sweeps):
+    """Runs sweeps Jacobi sweeps of c*x - a*(sum of neighbours) = x0, done in place
+
+    Only the previous row and cell are kept aside, which is enough to give the same result as a full Jacobi sweep.
+    """
+
+    prev = np.empty(N + 2)
+    for k in range(sweeps):
+        for j in range(N + 2):
+            prev[j] = x[0, j]
+        for i in range(1, N + 1):
+            left = x[i, 0]
+            for j in range(1, N + 1):
+                old = x[i, j]
+                x[i, j] = (x0[i, j] + a * (prev[j] + x[i + 1, j] + left + x[i, j + 1])) / c
+                prev[j] = old
+                left = old
+        set_bnd(N, b, x, mode)
+
+@njit(cache=True)
+def smooth(N, b, x, x0, a, c, sweeps, mode):
+    """Red-black Gauss-Seidel relaxation, see fluid_solver.smooth"""
+
+    for k in range(sweeps):
+        for parity in range(2):
+            for i in range(1, N + 1):
+                for j in range(1 + (i + 1 + parity) % 2, N + 1, 2):
+                    x[i, j] = (x0[i, j] + a * (x[i - 1, j] + x[i + 1, j] + x[i, j - 1] + x[i, j + 1])) / c
+            set_bnd(N, b, x, mode)
+
+@njit(cache=True)
+def residual(N, x, x0, a, c, r):
+    """Residual of the lin_solve system, see fluid_solver.residual"""
+
+    for i in range(1, N + 1):
+        for j in range(1, N + 1):
+            r[i, j] = x0[i, j] - (c * x[i, j] - a * (x[i - 1, j] + x[i + 1, j] + x[i, j - 1] + x[i, j + 1]))
+    for j in range(N + 2):
+        r[0, j] = 0.
+        r[N + 1, j] = 0.
+        r[j, 0] = 0.
+        r[j, N + 1] = 0.
+
+@njit(cache=True)
+def restrict(N, r, rc):
+    """Averages each 2x2 block of r onto the coarse grid rc"""
+
+    for I in range(1, N // 2 + 1):
+        for J in range(1, N // 2 + 1):
+            rc[I, J] = 0.25 * (r[2 * I - 1, 2 * J - 1] + r[2 * I, 2 * J - 1] + r[2 * I - 1, 2 * J] + r[2 * I, 2 * J])
+
+@njit(cache=True)
+def prolong(N, ec, x):
+    """Adds the bilinear interpolation of the coarse correction ec onto x"""
+
+    for i in range(1, N + 1):
+        I = (i + 1) // 2
+        ni = I - 1 if i % 2 == 1 else I + 1
+        for j in range(1, N + 1):
+            J = (j + 1) // 2
+            nj = J - 1 if j % 2 == 1 else J + 1
+            x[i, j] += 0.5625 * ec[I, J] + 0.1875 * (ec[ni, J] + ec[I, nj]) + 0.0625 * ec[ni, nj]
+
+@njit(cache=True)
+def advect(N, b, d, d0, u, v, dt, periodic, mode):
+    """Semi-Lagrangian advection, see fluid_solver.advect_reference"""
+
+    dt0 = dt * N
+    for i in range(1, N + 1):
+        for j in range(1, N + 1):
+            x = i - dt0 * u[i, j]
+            y = j - dt0 * v[i, j]
+            if x < 0.5:
+                x = 0.5
+            if x > N + 0.5:
+                x = N + 0.5
+            i0 = int(x)
+            i1 = i0 + 1
+            if periodic:
+                y = (y - 0.5) % N + 0.5
+            if y < 0.5:
+                y = 0.5
+            if y > N + 0.5:
+                y = N + 0.5
+            j0 = int(y)
+            j1 = j0 + 1
+
+            s1 = x - i0
+            s0 = 1 - s1
+            t1 = y - j0
+            t0 = 1 - t1
+
+            d[i, j] = (s0 * (t0 * d0[i0, j0] + t1 * d0[i0, j1]) + s1 * (t0 * d0[i1, j0] + t1 * d0[i1, j1]))
+    set_bnd(N, b, d, mode)
+
+@njit(cache=True)
+def coriolis(N, u, v, f, dt, mod, u_add, v_add, mode):
+    """Coriolis acceleration with per row parameter f, see fluid_solver.coriolis"""
+
+    for i in range(N + 2):
+        fi = f[i, 0]
+        for j in range(N + 2):
+            ua = v[i, j] * fi * mod
+            va = u[i, j] * fi * -mod
+            u_add[i, j] = ua
+            v_add[i, j] = va
+            u[i, j] += dt * ua
+            v[i, j] += dt * va
+    set_bnd(N, 1, u, mode)
+    set_bnd(N, 2, v, mode)
@@ -0,0 +1,183 @@
+"""Contains Metrics, live throughput and memory figures of a running Controller, and ways to watch them from outside
+
+A Metrics is one of a Controller's observers, after every tick it records the time and the Controller's clocks
+(a few floats, so it can be left on). report works out, over the last window ticks:
+    - ticks_per_s: ticks per wall clock second, including any time spent waiting between ticks
+    - ms_per_tick and ms_per_tick_p95: the mean and 95th percentile time spent running a tick
+    - sim_rate: simulated seconds per wall clock second
+    - rss_bytes: resident memory of this process (None if it can not be read)
+    - world_bytes: bytes held by the World's arrays, including the solver's scratch arrays
+
+Reports can be appended to a JSON lines file every few ticks, and served as JSON over HTTP by serve.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+def resident_memory():
+    """returns the resident memory of this process in bytes, or None if it can not be read"""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+def array_bytes(world):
+    """returns the bytes held by a World's (or Ensemble's) arrays and its Workspace, arrays sharing memory are counted once"""
+
+    seen = set()
+    total = 0
+    for value in vars(world).values():
+        if not isinstance(value, np.ndarray):
+            continue
+        base = value
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if id(base) not in seen:
+            seen.add(id(base))
+            total += base.nbytes
+    workspace = getattr(world, "workspace", None)
+    if workspace is not None:
+        total += workspace.nbytes()
+    return total
+
+def format_report(report):
+    """returns a report as one short line, eg for the GUI's info ribbon"""
+
+    if report["ticks_per_s"] is None:
+        return "Waiting for ticks"
+    text = "{:.1f} ticks/s, {:.1f} ms/tick (p95 {:.1f}), {:.3g} sim s/s".format(report["ticks_per_s"], report["ms_per_tick"], report["ms_per_tick_p95"], report["sim_rate"])
+    if report["rss_bytes"] is not None:
+        text += ", RSS {:.0f} MB".format(report["rss_bytes"] / 1e6)
+    return text + ", World {:.1f} MB".format(report["world_bytes"] / 1e6)
+
+class Metrics:
+    """Records a Controller's ticks and reports its throughput and memory use, see the module docstring
+
+    Attributes:
+        window (int): Number of recent ticks reports are worked out over
+        path (str or None): JSON lines file reports are appended to every few ticks
+        every (int): Tick interval between reports written to path
+    """
+
+    def __init__(self, window=200, path=None, every=100):
+        """Creates a new Metrics, add it to a Controller's observers to start recording
+
+        Args:
+            window (int, optional): Number of recent ticks reports are worked out over, defaults to 200
+            path (str, optional): JSON lines file to append a report to every few ticks, defaults to None
+            every (int, optional): Append a report to path every this many ticks, defaults to 100
+        """
+
+        if window < 1 or every < 1:
+            raise ValueError("window and every must be at least 1")
+
+        self.window = window
+        self.path = path
+        self.every = every
+        self.sim = None
+        self.server = None
+
+        # (perf_counter, Controller.wall_time, simulated time, tick number) after each tick
+        self._samples = deque(maxlen=window + 1)
+        self._lock = threading.Lock()
+        self._file = open(path, "a") if path is not None else None
+
+    def after_tick(self, sim):
+        """Records the Controller's clocks after a tick, and appends a report to path if one is due"""
+
+        self.sim = sim
+        with self._lock:
+            self._samples.append((time.perf_counter(), sim.wall_time, float(np.max(sim.sim_time)), sim.tickNum))
+        if self._file is not None and sim.tickNum % self.every == 0:
+            self._file.write(json.dumps(self.report()) + "\n")
+            self._file.flush()
+
+    def reset(self):
+        """Forgets the ticks recorded so far, eg after the sim is paused, so the pause does not count against the tick rate"""
+        with self._lock:
+            self._samples.clear()
+
+    def report(self):
+        """returns a dict of the figures in the module docstring, with the "tick" number and unix "time" it was made at
+
+        The tick figures are None until two ticks have been recorded.
+        """
+
+        with self._lock:
+            samples = list(self._samples)
+
+        # Ticks can be restarted from 0 (eg after World.clear_data), only count ticks since then
+        for k in range(len(samples) - 1, 0, -1):
+            if samples[k][3] <= samples[k - 1][3]:
+                samples = samples[k:]
+                break
+
+        report = {"time": time.time(), "tick": samples[-1][3] if samples else None,
+                  "ticks_per_s": None, "ms_per_tick": None, "ms_per_tick_p95": None, "sim_rate": None}
+        if len(samples) > 1:
+            clock, wall, sim_time, ticks = (np.array(column) for column in zip(*samples))
+            elapsed = clock[-1] - clock[0]
+            tick_ms = 1000 * np.diff(wall) / np.diff(ticks)
+            report["ms_per_tick"] = float(tick_ms.mean())
+            report["ms_per_tick_p95"] = float(np.percentile(tick_ms, 95))
+            if elapsed > 0:
+                report["ticks_per_s"] = float(ticks[-1] - ticks[0]) / elapsed
+                report["sim_rate"] = float(sim_time[-1] - sim_time[0]) / elapsed
+
+        report["rss_bytes"] = resident_memory()
+        report["world_bytes"] = array_bytes(self.sim.world) if self.sim is not None else 0
+        return report
+
+    def serve(self, port=0, host="127.0.0.1"):
+        """Serves the latest report as JSON to any GET request, on a background thread, and returns the port
+
+        Args:
+            port (int, optional): Port to listen on, defaults to 0 (any free port)
+            host (str, optional): Address to listen on, defaults to "127.0.0.1" (this machine only)
+        """
+
+        # Imported here, most runs never serve their metrics
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(metrics.report()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="ClWxSim metrics", daemon=True).start()
+        return self.server.server_address[1]
+
+    def close(self):
+        """Stops serving reports, and appends a last report to the JSON lines file before closing it"""
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self._file is not None:
+            if self.sim is not None and self.sim.tickNum % self.every != 0:
+                self._file.write(json.dumps(self.report()) + "\n")
+            self._file.close()
+            self._file = None
@@ -0,0 +1,156 @@
+"""Contains the Profiler, which records how long each phase of a tick and each fluid_solver kernel takes
+
+A Controller's Profiler is made active for the length of each tick while it is enabled. Code run during the tick
+reports its timings to the active Profiler through phase (for blocks of code) and timed (for whole functions).
+When no Profiler is active both cost a single lookup, so they can be left in place permanently.
+"""
+
+import functools
+import threading
+import time
+
+_state = threading.local()  # Holds the Profiler active in each thread, ticks are profiled in the thread that runs them
+
+class _PhaseTimer:
+    """Context manager adding the time spent in its block to a Profiler"""
+
+    __slots__ = ("profiler", "kind", "name", "start")
+
+    def __init__(self, profiler, kind, name):
+        self.profiler = profiler
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.kind, self.name, time.perf_counter() - self.start)
+        return False
+
+class _NullTimer:
+    """Context manager that does nothing, used when no Profiler is active"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_null_timer = _NullTimer()
+
+def active():
+    """returns the Profiler active in this thread, or None"""
+    return getattr(_state, "profiler", None)
+
+def phase(name):
+    """returns a context manager that records the time spent in its block as the phase name, if a Profiler is active
+
+    Args:
+        name (str): Name of the phase
+    """
+    prof = getattr(_state, "profiler", None)
+    if prof is None:
+        return _null_timer
+    return _PhaseTimer(prof, "phases", name)
+
+def timed(name):
+    """Decorator that records the time spent in each call of the function as the kernel name, if a Profiler is active
+
+    Args:
+        name (str): Name of the kernel
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            prof = getattr(_state, "profiler", None)
+            if prof is None:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                prof.add("kernels", name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+class Profiler:
+    """Cumulative and per tick wall times for each phase of a tick and each fluid_solver kernel
+
+    Kernel times include any kernels they call (eg diffuse includes its multigrid_solve), phases do not overlap.
+
+    Attributes:
+        enabled (bool): If false, ticks are not profiled
+        ticks (int): Number of ticks profiled since the last reset
+    """
+
+    def __init__(self, enabled=False):
+        """Creates a new Profiler
+
+        Args:
+            enabled (bool, optional): If true, start profiling straight away, defaults to False
+        """
+
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """Discards every timing recorded so far"""
+
+        self.ticks = 0
+        self.tick_total = 0.
+        self.tick_last = 0.
+        self._totals = {"phases": {}, "kernels": {}}
+        self._calls = {"phases": {}, "kernels": {}}
+        self._last = {"phases": {}, "kernels": {}}
+        self._tick_start = None
+
+    def begin_tick(self):
+        """Makes this Profiler active in the calling thread, so that the tick about to run is recorded"""
+
+        self._last["phases"].clear()
+        self._last["kernels"].clear()
+        _state.profiler = self
+        self._tick_start = time.perf_counter()
+
+    def end_tick(self):
+        """Records the length of the tick that has just run and stops this Profiler being active"""
+
+        self.tick_last = time.perf_counter() - self._tick_start
+        self.tick_total += self.tick_last
+        self.ticks += 1
+        self._tick_start = None
+        _state.profiler = None
+
+    def add(self, kind, name, seconds):
+        """Adds time to a phase or kernel
+
+        Args:
+            kind (str): "phases" or "kernels"
+            name (str): Name of the phase or kernel
+            seconds (float): Time spent
+        """
+
+        totals = self._totals[kind]
+        totals[name] = totals.get(name, 0.) + seconds
+        calls = self._calls[kind]
+        calls[name] = calls.get(name, 0) + 1
+        last = self._last[kind]
+        last[name] = last.get(name, 0.) + seconds
+
+    def report(self):
+        """returns every timing recorded as a dict, times are in seconds
+
+        The dict holds "ticks" (the number profiled), "tick" (the "total" and "last" length of a whole tick),
+        and "phases" and "kernels", which map each name to its "calls", "total" time and time in the "last" tick.
+        """
+
+        report = {"ticks": self.ticks, "tick": {"total": self.tick_total, "last": self.tick_last}}
+        for kind in ("phases", "kernels"):
+            report[kind] = {name: {"calls": self._calls[kind][name], "total": total, "last": self._last[kind].get(name, 0.)}
+                            for name, total in self._totals[kind].items()}
+        return report
@@ -0,0 +1,163 @@
+"""Contains a direct (spectral) solver for the b = 0 system lin_solve relaxes, ie c*x - a*(sum of neighbours) = x0
+
+Along an axis with copied boundary cells (reflective walls) the system is diagonalised by a DCT-II,
+along an axis that wraps round it is diagonalised by a DFT. Transforming x0, dividing by the system's
+eigenvalues and transforming back gives the exact solution in O(N^2 log N).
+
+The DCT is built from NumPy's FFT (Makhoul's reordering), so only NumPy is needed.
+All intermediate results are kept in Workspace arrays.
+"""
+
+import inspect
+
+import numpy as np
+
+from ClWxSim.sim.profiler import timed
+
+_fft_has_out = "out" in inspect.signature(np.fft.fft).parameters   # NumPy >= 2.0
+
+def supported(bnd, b):
+    """returns True if solve can be used for the system with this boundary policy and b"""
+    return b == 0 and getattr(bnd, "spectral_axes", None) is not None
+
+@timed("spectral_solve")
+def solve(N, x, x0, a, c, bnd, ws):
+    """Solves c*x - a*(sum of neighbours) = x0 for the central cells of x, whose boundary cells are then set by bnd
+
+    If the system is singular (eg the pressure solve in project) the zero mean solution is returned.
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        x (array of size N+2): The array to solve for
+        x0 (array of size N+2): The right hand side of the system
+        a (float): Linear solver parameter
+        c (float): Linear solver parameter
+        bnd (boundary policy): Policy with spectral_axes set, see supported
+        ws (Workspace): Holds the transformed arrays
+    """
+
+    r = ws.array("spectral_real", x.shape[:-2] + (N, N))
+    r[:] = x0[..., 1:N + 1, 1:N + 1]
+
+    # Transform along axis 0 (the poles are always walls), then solve along axis 1 one row at a time
+    transform_axis0(N, r, ws)
+    solve_axis1(N, r, inverse_eigenvalues(N, bnd, a, c, ws), bnd, ws)
+    transform_axis0(N, r, ws, inverse=True)
+
+    x[..., 1:N + 1, 1:N + 1] = r
+    bnd.apply(N, 0, x)
+
+def transform_axis0(N, r, ws, inverse=False):
+    """In place DCT (or its inverse) of the central cells r along axis 0
+
+    Every column is transformed on its own, so r may be any strip of the columns.
+
+    Args:
+        N (int): Size of the grid excluding boundary cells
+        r (array of N rows): Central cells to transform
+        ws (Workspace): Holds the transformed arrays
+        inverse (bool, optional): If true, apply the inverse transform
+    """
+    if inverse:
+        _idct(N, r, -2, ws)
+    else:
+        _dct(N, r, -2, ws)
+
+def solve_axis1(N, r, inv, bnd, ws):
+    """Transforms rows of r along axis 1, divides by the system's eigenvalues and transforms back, in place
+
+    Every row is solved on its own, so r may be any strip of the rows of an array already transformed along axis 0.
+
+    Args:
+        N (int): Size of the grid excluding boundary cells
+        r (array of N columns): Rows of central cells, transformed along axis 0
+        inv (array): The rows of inverse_eigenvalues matching the rows of r
+        bnd (boundary policy): Policy with spectral_axes set, see supported
+        ws (Workspace): Holds the transformed arrays
+    """
+
+    if bnd.spectral_axes[1] == "fft":
+        spec = ws.array("spectral_fourier", r.shape[:-1] + (N // 2 + 1,), complex)
+        _call_fft(np.fft.rfft, r, spec, axis=-1)
+        spec *= inv
+        _call_fft(np.fft.irfft, spec, r, n=N, axis=-1)
+    else:
+        _dct(N, r, -1, ws)
+        r *= inv
+        _idct(N, r, -1, ws)
+
+def inverse_eigenvalues(N, bnd, a, c, ws):
+    """returns the (cached) inverse eigenvalues of the system in transform space, one row per row of the grid
+
+    Args:
+        N (int): Size of the grid excluding boundary cells
+        bnd (boundary policy): Policy with spectral_axes set, see supported
+        a (float): Linear solver parameter
+        c (float): Linear solver parameter
+        ws (Workspace): Caches the eigenvalues
+    """
+    axis0, axis1 = bnd.spectral_axes
+    return ws.constant(("spectral_inverse_eigenvalues", N, axis0, axis1, a, c), lambda: _inverse_eigenvalues(N, axis0, axis1, a, c))
+
+def _inverse_eigenvalues(N, axis0, axis1, a, c):
+    """returns 1 / (eigenvalues of the system) in transform space, with 0 for any zero eigenvalue"""
+
+    # The neighbours along an axis contribute 2*cos(theta) for each transformed mode
+    theta0 = np.pi * np.arange(N) / N
+    if axis1 == "fft":
+        theta1 = 2 * np.pi * np.arange(N // 2 + 1) / N
+    else:
+        theta1 = np.pi * np.arange(N) / N
+    eig = c - a * (2 * np.cos(theta0)[:, np.newaxis] + 2 * np.cos(theta1)[np.newaxis, :])
+
+    zero = np.abs(eig) <= 1e-12 * abs(c)
+    eig[zero] = 1.
+    inv = 1 / eig
+    inv[zero] = 0.
+    return inv
+
+def _along(axis, s):
+    """returns an index applying the slice s along axis (-2 or -1)"""
+    return (Ellipsis, s) if axis == -1 else (Ellipsis, s, slice(None))
+
+def _twiddles(N, axis):
+    """returns exp(-i pi k / 2N) for each mode k, shaped to broadcast along axis"""
+    tw = np.exp(-0.5j * np.pi * np.arange(N) / N)
+    return tw if axis == -1 else tw[:, np.newaxis]
+
+def _call_fft(func, a, out, **kwargs):
+    """Calls a numpy.fft function, writing into out directly if this version of NumPy allows it"""
+    if _fft_has_out:
+        func(a, out=out, **kwargs)
+    else:
+        out[...] = func(a, **kwargs)
+
+def _dct(N, x, axis, ws):
+    """In place unnormalised DCT-II of the real array x along axis, X[k] = sum(x[n] * cos(pi * k * (2n + 1) / 2N))"""
+
+    h = (N + 1) // 2
+    v = ws.array("spectral_dct", x.shape, complex)
+
+    # Even samples in order, followed by the odd samples reversed
+    v[_along(axis, slice(0, h))] = x[_along(axis, slice(0, N, 2))]
+    v[_along(axis, slice(h, N))] = x[_along(axis, slice(1, N, 2))][_along(axis, slice(None, None, -1))]
+
+    _call_fft(np.fft.fft, v, v, axis=axis)
+    v *= ws.constant(("spectral_twiddles", N, axis), lambda: _twiddles(N, axis))
+    x[:] = v.real
+
+def _idct(N, X, axis, ws):
+    """In place inverse of _dct along axis"""
+
+    h = (N + 1) // 2
+    v = ws.array("spectral_dct", X.shape, complex)
+
+    # The transform of the reordered samples is conj(twiddle) * (X[k] - i X[N - k]), with X[N] = 0
+    v.real = X
+    v.imag[_along(axis, 0)] = 0
+    np.negative(X[_along(axis, slice(N - 1, 0, -1))], out=v.imag[_along(axis, slice(1, N))])
+    v *= ws.constant(("spectral_twiddles_conj", N, axis), lambda: np.conj(_twiddles(N, axis)))
+
+    _call_fft(np.fft.ifft, v, v, axis=axis)
+    X[_along(axis, slice(0, N, 2))] = v.real[_along(axis, slice(0, h))]
+    X[_along(axis, slice(1, N, 2))][_along(axis, slice(None, None, -1))] = v.real[_along(axis, slice(h, N))]
@@ -0,0 +1,76 @@
+"""Contains the StripPool, threads that run a kernel on horizontal strips of its arrays at the same time
+
+Most of a kernel's time is spent inside NumPy's ufuncs, which release the GIL, so strips of rows of a large
+array can be worked on by several threads at once. A kernel hands the pool a function of a strip's (start, stop)
+rows, the pool calls it once per strip and only returns once every strip is done. This is the barrier after which
+the kernel sets the boundary cells, knowing every central cell has been written.
+"""
+
+min_strip_rows = 32     # Grids are only split if every strip would get at least this many rows
+
+def split(n, count, start=0):
+    """returns count (start, stop) ranges that split the n items from start onwards as evenly as possible"""
+    edges = [start + (n * k) // count for k in range(count + 1)]
+    return list(zip(edges[:-1], edges[1:]))
+
+class StripPool:
+    """A pool of threads running kernels on strips of rows, see ClWxSim.sim.fluid_solver
+
+    The calling thread works on the first strip itself, so a pool of n threads only starts n-1 of its own.
+
+    Attributes:
+        threads (int): Number of strips (and threads, including the caller) each kernel is split into
+    """
+
+    def __init__(self, threads=1):
+        """Creates a new StripPool
+
+        Args:
+            threads (int, optional): Number of threads to split each kernel between, 1 to run every kernel whole on the calling thread, defaults to 1
+        """
+
+        if threads < 1:
+            raise ValueError("A StripPool needs at least 1 thread, not {}".format(threads))
+
+        self.threads = threads
+        self._executor = None
+        if threads > 1:
+            from concurrent.futures import ThreadPoolExecutor   # Imported here, single threaded runs never need it
+            self._executor = ThreadPoolExecutor(max_workers=threads - 1, thread_name_prefix="ClWxSim strip")
+
+    def active(self, rows):
+        """returns True if a kernel working on this many rows should be split into strips"""
+        return self._executor is not None and rows >= 2 * min_strip_rows
+
+    def run(self, func, start, stop):
+        """Calls func(strip start, strip stop) once for each strip of the rows start to stop, returning once every call has returned
+
+        Any exception raised by a strip is raised again here, once every strip has finished.
+
+        Args:
+            func (function): Works on the rows from strip start up to strip stop, must not write outside them
+            start (int): First row to split
+            stop (int): Row after the last row to split
+        """
+
+        if not self.active(stop - start):
+            func(start, stop)
+            return
+
+        strips = split(stop - start, min(self.threads, (stop - start) // min_strip_rows), start)
+        futures = [self._executor.submit(func, *strip) for strip in strips[1:]]
+        try:
+            func(*strips[0])
+        finally:
+            for future in futures:
+                future.exception()
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """Stops the pool's threads, kernels given the pool afterwards run whole on the calling thread"""
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.threads = 1
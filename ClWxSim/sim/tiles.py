@@ -0,0 +1,244 @@
+"""Contains a Controller tick split into strips of rows (tiles), so that one tick can be shared between several workers
+
+Every worker calls tick with the same arrays and its own tile number. A tile only writes its own central rows
+(the first and last tiles also take the pole boundary rows), reading the rows either side of it (its halo)
+straight from the neighbouring tiles. The workers' sync function, eg a Barrier's wait, is called wherever one
+tile reads what another has just written: between every lin_solve sweep, before each advect back-trace and
+between the stages of each projection. Boundary cells are set by tile 0 alone between two syncs.
+
+Each step does the same arithmetic as the single process kernels, cell for cell, with two choices of solver:
+    Diffusion uses lin_solve's Jacobi sweeps, which only read a tile's halo, rather than multigrid
+    Projection uses the spectral solver, with its transforms along axis 0 split into strips of columns
+so a tick with any number of tiles gives exactly the same result as a single process tick with
+fluid_solver.diffuse_solver = "lin_solve" and project_solver = "spectral".
+
+Only single 2D Worlds (not Ensembles) with a boundary policy the spectral solver supports can be split.
+"""
+
+import numpy as np
+
+from ClWxSim.data.Geometry import Geometry
+import ClWxSim.sim.fluid_solver as solver
+import ClWxSim.sim.spectral as spectral
+from ClWxSim.sim.strips import split
+
+# World arrays a tick reads or writes
+FIELDS = ("air_vel_u", "air_vel_v", "air_vel_u_prev", "air_vel_v_prev", "air_pressure", "air_pressure_prev",
+          "air_pressure_grad_u", "air_pressure_grad_v", "air_pressure_grad_u_prev", "air_pressure_grad_v_prev",
+          "dbg_coriolis_u", "dbg_coriolis_v")
+
+# Scratch arrays shared between tiles, the second array of each diffused field's Jacobi sweeps
+SCRATCH = ("jacobi_u", "jacobi_v", "jacobi_pressure")
+
+def check_supported(wld):
+    """Raises a ValueError if the World's tick can not be split into tiles
+
+    Args:
+        wld (World): The World to check
+    """
+    if len(wld.field_shape) != 2:
+        raise ValueError("Only single Worlds can be split into tiles, not batches of {}".format(wld.field_shape[:-2]))
+    if not spectral.supported(wld.boundary, 0):
+        raise ValueError("The '{}' boundary policy can not be split into tiles, its projection has no spectral solver".format(wld.boundary.name))
+
+def shared_nbytes(N):
+    """returns the number of bytes needed to hold every array made by shared_arrays"""
+    return 8 * ((len(FIELDS) + len(SCRATCH)) * (N + 2) ** 2 + N * N)
+
+def shared_arrays(buffer, N):
+    """returns a dict of the FIELDS and SCRATCH arrays, plus the "spectral" (N, N) array used by project, all in buffer
+
+    Args:
+        buffer (buffer): At least shared_nbytes(N) bytes, eg a SharedMemory block's buf
+        N (int): Size of the grid excluding boundary cells
+    """
+    arrays = {}
+    offset = 0
+    for name in FIELDS + SCRATCH + ("spectral",):
+        shape = (N, N) if name == "spectral" else (N + 2, N + 2)
+        arrays[name] = np.ndarray(shape, dtype=float, buffer=buffer, offset=offset)
+        offset += arrays[name].nbytes
+    return arrays
+
+def tick(N, f, params, tile, tiles, sync, ws):
+    """Runs this tile's part of one Controller tick, see Controller._tick
+
+    Args:
+        N (int): Size of the grid excluding boundary cells
+        f (dict): The arrays made by shared_arrays, the same arrays for every tile
+        params (dict): "dt", "visc", "diff", "angular_vel", "bnd" (boundary policy), "apply_pgf" (bool),
+            "pgf_modifier", "coriolis_modifier" and "wind_modifier"
+        tile (int): This tile's number, from 0 to tiles-1
+        tiles (int): Number of tiles the grid is split into, at most N
+        sync (function): Takes no arguments and returns once every tile has called it
+        ws (Workspace): This tile's own scratch arrays
+    """
+
+    lead = tile == 0
+    rows = split(N, tiles, 1)[tile]
+    cols = split(N, tiles)[tile]
+    span = (0 if tile == 0 else rows[0], N + 2 if tile == tiles - 1 else rows[1])
+    dt, bnd = params["dt"], params["bnd"]
+
+    u, v, u0, v0 = f["air_vel_u"], f["air_vel_v"], f["air_vel_u_prev"], f["air_vel_v_prev"]
+    p, p0 = f["air_pressure"], f["air_pressure_prev"]
+    s = slice(*span)
+
+    pressure_grad(N, p, f["air_pressure_grad_u"], f["air_pressure_grad_v"], span)
+
+    if params["apply_pgf"]:
+        pgf = ws.array("pgf", (span[1] - span[0], N + 2))
+        for vel, grad in ((u, f["air_pressure_grad_u"]), (v, f["air_pressure_grad_v"])):
+            np.multiply(grad[s], params["pgf_modifier"] * dt, out=pgf)
+            vel[s] += pgf
+
+    # The wind and pressure diffusions do not depend on each other, so they share their syncs
+    diffuse(N, ((1, u0, u, params["visc"], f["jacobi_u"]), (2, v0, v, params["visc"], f["jacobi_v"]),
+                (0, p0, p, params["diff"], f["jacobi_pressure"])), dt, rows, span, lead, sync, bnd, ws)
+
+    project(N, u0, v0, u, v, f["spectral"], rows, cols, lead, sync, bnd, ws)
+
+    solver.advect_rows(N, u, u0, u0, v0, dt, rows[0], rows[1], bnd.periodic, ws)
+    solver.advect_rows(N, v, v0, u0, v0, dt, rows[0], rows[1], bnd.periodic, ws)
+    sync()
+    if lead:
+        solver.set_bnd(N, 1, u, bnd)
+        solver.set_bnd(N, 2, v, bnd)
+    sync()
+
+    project(N, u, v, u0, v0, f["spectral"], rows, cols, lead, sync, bnd, ws)
+
+    coriolis(N, u, v, dt, params["angular_vel"], params["coriolis_modifier"], f["dbg_coriolis_u"], f["dbg_coriolis_v"], span, ws)
+
+    # Pressure is advected by this tile's own wind cells, which coriolis has just finished with
+    solver.advect_rows(N, p, p0, u, v, dt * params["wind_modifier"], rows[0], rows[1], bnd.periodic, ws)
+    sync()
+    if lead:
+        solver.set_bnd(N, 1, u, bnd)
+        solver.set_bnd(N, 2, v, bnd)
+        solver.set_bnd(N, 0, p, bnd)
+    sync()
+
+    np.copyto(f["air_pressure_grad_u_prev"][s], f["air_pressure_grad_u"][s])
+    np.copyto(f["air_pressure_grad_v_prev"][s], f["air_pressure_grad_v"][s])
+    for arr in (u, v, u0, v0, p, p0):
+        np.round(arr[s], decimals=10, out=arr[s])
+
+def pressure_grad(N, pressure, p_grad_u, p_grad_v, span):
+    """Calculates rows span[0] to span[1] of World.calcPressureGrad's u and v pressure gradients"""
+
+    start, stop = span
+    s = slice(start, stop)
+
+    np.subtract(pressure[s, :-2], pressure[s, 2:], out=p_grad_u[s, 1:-1])
+    p_grad_u[s, 1:-1] *= 0.5
+    np.subtract(pressure[s, 0], pressure[s, 1], out=p_grad_u[s, 0])
+    np.subtract(pressure[s, -2], pressure[s, -1], out=p_grad_u[s, -1])
+
+    i0, i1 = max(start, 1), min(stop, N + 1)
+    np.subtract(pressure[i0 - 1:i1 - 1], pressure[i0 + 1:i1 + 1], out=p_grad_v[i0:i1])
+    p_grad_v[i0:i1] *= 0.5
+    if start == 0:
+        np.subtract(pressure[0], pressure[1], out=p_grad_v[0])
+    if stop == N + 2:
+        np.subtract(pressure[N], pressure[N + 1], out=p_grad_v[N + 1])
+
+def diffuse(N, systems, dt, rows, span, lead, sync, bnd, ws):
+    """Diffuses several fields with lin_solve's Jacobi sweeps, see fluid_solver.diffuse
+
+    Each sweep reads one array and writes the other of a pair, so a tile never overwrites rows its neighbours
+    are still reading and only one sync is needed before the boundary cells are set.
+
+    Args:
+        N (int): Size of the grid excluding boundary cells
+        systems (sequence): (b, x, x0, diff, scratch) for each field, x is solved for and scratch is the second array of the pair
+        dt (float): Length of time of each tick
+        rows (tuple): This tile's central rows, (start, stop)
+        span (tuple): This tile's rows including any pole boundary row, (start, stop)
+        lead (bool): True for the tile that sets boundary cells
+        sync (function): Returns once every tile has called it
+        bnd (boundary policy): Policy used to set boundary cells
+        ws (Workspace): This tile's own scratch arrays
+    """
+
+    start, stop = rows
+    for k in range(solver.lin_solve_sweeps):
+        for b, x, x0, diff, scratch in systems:
+            a = dt * diff * N * N
+            src, dst = (x, scratch) if k % 2 == 0 else (scratch, x)
+            solver.jacobi_rows(N, src, dst, x0, a, 1 + 4 * a, start, stop, ws)
+        sync()
+        if lead:
+            for b, x, x0, diff, scratch in systems:
+                solver.set_bnd(N, b, scratch if k % 2 == 0 else x, bnd)
+        sync()
+
+    if solver.lin_solve_sweeps % 2 == 1:
+        # The last sweep was written to the scratch arrays
+        for b, x, x0, diff, scratch in systems:
+            x[span[0]:span[1]] = scratch[span[0]:span[1]]
+        sync()
+
+def project(N, u, v, p, div, r, rows, cols, lead, sync, bnd, ws):
+    """Removes the divergent part of [u v] with the spectral solver, see fluid_solver.project
+
+    The transforms along axis 0 are done on this tile's strip of columns, everything else on its rows.
+
+    Args:
+        N (int): Size of the grid excluding boundary cells
+        u (array of size N+2): The x component velocity vector array
+        v (array of size N+2): The y component velocity vector array
+        p (array of size N+2): Left holding the pressure like field that was removed
+        div (array of size N+2): Left holding the divergence of the original field
+        r (array of size N): Shared array the solver transforms in place
+        rows (tuple): This tile's central rows, (start, stop)
+        cols (tuple): This tile's strip of central columns, (start, stop) counted from 0
+        lead (bool): True for the tile that sets boundary cells
+        sync (function): Returns once every tile has called it
+        bnd (boundary policy): Policy used to set boundary cells, with spectral_axes set
+        ws (Workspace): This tile's own scratch arrays
+    """
+
+    start, stop = rows
+    strip = np.s_[:, cols[0]:cols[1]]
+    h = 1.0 / N
+    t = ws.array("project", (stop - start, N))
+
+    divi = div[start:stop, 1:N + 1]
+    np.subtract(u[start + 1:stop + 1, 1:N + 1], u[start - 1:stop - 1, 1:N + 1], out=divi)
+    np.subtract(v[start:stop, 2:N + 2], v[start:stop, 0:N], out=t)
+    divi += t
+    divi *= -0.5 * h
+    r[start - 1:stop - 1] = divi
+    sync()
+
+    if lead:
+        solver.set_bnd(N, 0, div, bnd)
+    spectral.transform_axis0(N, r[strip], ws)
+    sync()
+    spectral.solve_axis1(N, r[start - 1:stop - 1], spectral.inverse_eigenvalues(N, bnd, 1, 4, ws)[start - 1:stop - 1], bnd, ws)
+    sync()
+    spectral.transform_axis0(N, r[strip], ws, inverse=True)
+    p[1:N + 1, cols[0] + 1:cols[1] + 1] = r[strip]
+    sync()
+    if lead:
+        bnd.apply(N, 0, p)
+    sync()
+
+    np.subtract(p[start + 1:stop + 1, 1:N + 1], p[start - 1:stop - 1, 1:N + 1], out=t)
+    t *= 0.5 / h
+    u[start:stop, 1:N + 1] -= t
+    np.subtract(p[start:stop, 2:N + 2], p[start:stop, 0:N], out=t)
+    t *= 0.5 / h
+    v[start:stop, 1:N + 1] -= t
+    sync()
+    if lead:
+        solver.set_bnd(N, 1, u, bnd)
+        solver.set_bnd(N, 2, v, bnd)
+    sync()
+
+def coriolis(N, u, v, dt, w, mod, u_add, v_add, span, ws):
+    """Adds the coriolis acceleration to rows span[0] to span[1] of [u v], without setting any boundary cells, see fluid_solver.coriolis"""
+
+    geo = ws.constant(("tile_geometry", N, w), lambda: Geometry(N, w))
+    solver.coriolis_rows(u, v, geo.coriolis_f, dt, mod, u_add, v_add, span[0], span[1], ws)
@@ -0,0 +1,71 @@
+"""Contains functions for choosing a stable time step from the state of a World
+
+The semi-Lagrangian advection in fluid_solver never blows up, but once the wind carries anything more than a
+cell or so in one step it starts skipping cells, and the Jacobi/multigrid diffusion solves lose accuracy once
+dt * diff * N^2 grows large. A step is stable here if it keeps within both limits.
+"""
+
+import numpy as np
+
+cfl = 0.5                   # Most grid cells the wind may carry anything in one step
+diffusion_number = 0.25     # Largest dt * diffusion rate * N^2 of one step
+
+def max_speed(N, u, v):
+    """returns the largest absolute wind component inside the grid, one per member (as a (members, 1, 1) array) for batched arrays
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        u (array of size N+2): The x component velocity vector array
+        v (array of size N+2): The y component velocity vector array
+    """
+    inner = (..., slice(1, N + 1), slice(1, N + 1))
+    speed = np.maximum(np.abs(u[inner]).max(axis=(-2, -1), keepdims=True), np.abs(v[inner]).max(axis=(-2, -1), keepdims=True))
+    return float(speed[0, 0]) if speed.ndim == 2 else speed
+
+def stable_dt(N, u, v, diff, visc, speed_scale=1., cfl=cfl, diffusion_number=diffusion_number):
+    """returns the longest step the advection (CFL) and diffusion limits allow, one per member (as a (members, 1, 1) array) for batched arrays
+
+    Args:
+        N (int): Size of array excluding boundary cells
+        u (array of size N+2): The x component velocity vector array
+        v (array of size N+2): The y component velocity vector array
+        diff (float, or array): Rate of diffusion of pressure, may be one per member for batched arrays
+        visc (float, or array): Rate of diffusion of the wind, may be one per member for batched arrays
+        speed_scale (float, optional): Anything is advected by at most this many times the wind, defaults to 1
+        cfl (float, optional): Most grid cells anything may be advected in one step, defaults to timestep.cfl
+        diffusion_number (float, optional): Largest dt * diffusion rate * N^2 of one step, defaults to timestep.diffusion_number
+    """
+
+    # Advection moves by dt * N * speed cells, see fluid_solver.advect_rows
+    speed = np.asarray(max_speed(N, u, v) * speed_scale * N)
+    with np.errstate(divide="ignore"):
+        dt_advect = np.where(speed > 0, cfl / speed, np.inf)
+        rate = np.maximum(diff, visc) * N * N
+        dt_diffuse = np.where(rate > 0, diffusion_number / rate, np.inf)
+
+    dt = np.minimum(dt_advect, dt_diffuse)
+    return float(dt) if dt.ndim == 0 else np.broadcast_to(dt, np.shape(speed)).copy()
+
+def plan_steps(dt, stable, max_scale):
+    """returns (steps, step dt) covering one tick, the tick is dt long if that is not stable, or up to max_scale times longer if it is
+
+    Steps are always dt times or divided by a power of two. The solver caches work that depends on the step
+    length (eg the multigrid coarsest level inverses), so a few step lengths keep those caches small and warm.
+    Every member of a batch takes the same number of steps, each scaled by the same factor, so members with
+    different dts stay in step with each other.
+
+    Args:
+        dt (float, or array): Length of a tick, may be one per member for batched arrays
+        stable (float, or array): Longest stable step, see stable_dt
+        max_scale (float): Longest step as a multiple of dt, at least 1
+    """
+
+    scale = float(np.min(np.asarray(stable) / np.asarray(dt)))
+    if not scale > 0:
+        raise ValueError("No stable step for a tick of {}, is the wind finite?".format(dt))
+    if scale >= 1:
+        return 1, dt * 2 ** int(np.log2(min(scale, max_scale)))
+
+    # Sub-step, splitting the tick into the fewest (power of two) equal steps that are all stable
+    steps = 2 ** int(np.ceil(np.log2(1 / scale)))
+    return steps, dt / steps
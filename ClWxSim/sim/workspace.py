@@ -0,0 +1,71 @@
+"""Contains the Workspace, a cache of scratch arrays reused by the fluid_solver kernels from tick to tick"""
+
+import numpy as np
+
+class Workspace:
+    """Scratch arrays for one World, so that a steady state tick does not allocate any large arrays
+
+    Arrays are created the first time they are asked for and then handed back on every later request.
+    Contents are not kept between kernels, each kernel must fill the arrays it is given before reading them.
+
+    Attributes:
+        N (int): Size of the World's grid excluding boundary cells
+    """
+
+    def __init__(self, N):
+        """Creates a new, empty, Workspace
+
+        Args:
+            N (int): Size of the World's grid excluding boundary cells
+        """
+
+        self.N = N
+        self._arrays = {}
+        self._constants = {}
+        self._strips = {}
+
+    def array(self, name, shape, dtype=float):
+        """returns the scratch array with this name, shape and type, creating it (filled with zeros) on first use
+
+        Args:
+            name (str): Name of the array, kernels use their own names so they never share an array by accident
+            shape (tuple): Shape of the array
+            dtype (type, optional): Type of the array, defaults to float
+        """
+
+        key = (name, shape, dtype)
+        arr = self._arrays.get(key)
+        if arr is None:
+            arr = np.zeros(shape, dtype=dtype)
+            self._arrays[key] = arr
+        return arr
+
+    def constant(self, name, factory):
+        """returns a cached read only value, made by calling factory() the first time it is asked for
+
+        Args:
+            name (hashable): Name of the value, including anything it depends on (eg the grid size)
+            factory (function): Takes no arguments and returns the value
+        """
+
+        value = self._constants.get(name)
+        if value is None:
+            value = factory()
+            self._constants[name] = value
+        return value
+
+    def strip(self, start):
+        """returns the Workspace of the strip of rows beginning at start, so threads working on different strips never share an array
+
+        Args:
+            start (int): First row of the strip
+        """
+
+        ws = self._strips.get(start)
+        if ws is None:
+            ws = self._strips.setdefault(start, Workspace(self.N))
+        return ws
+
+    def nbytes(self):
+        """returns the total number of bytes held by the workspace's arrays, including those of its strips"""
+        return sum(arr.nbytes for arr in self._arrays.values()) + sum(ws.nbytes() for ws in self._strips.values())
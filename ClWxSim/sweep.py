@@ -0,0 +1,292 @@
+"""Parameter sweep runner, runs every combination of a grid of World and Controller parameters, each in its own process
+
+Usage:
+    python -m ClWxSim.sweep --param angular_vel=0.000072,0.0001 --param pgf_modifier=0.5,1,2 --size 64 --ticks 200 --output sweep.npz
+
+Each run is given its parameters directly (as World and Controller attributes, never by changing module
+globals), so any number of configurations can run side by side. A run that raises, or whose process dies,
+is recorded as failed and the rest of the sweep carries on.
+
+The results table is written as one .npz file: a column per parameter and per summary metric (one row per
+run, in grid order), "status" and "error" columns, and the final OUTPUT_FIELDS of every run stacked into
+(runs, N+2, N+2) arrays, NaN for runs that did not finish.
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import traceback
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from ClWxSim.data.World import World
+from ClWxSim.run import OUTPUT_FIELDS, add_file_sources, add_test_sources, run
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.sim.boundary import BOUNDARIES
+import ClWxSim.sim.fluid_solver as solver
+import ClWxSim.utils.logging as logs
+
+# Parameters that can be swept, and the type their values are read as
+PARAMETERS = {
+    "angular_vel": float,
+    "dt": float,
+    "diff": float,
+    "visc": float,
+    "pgf_modifier": float,
+    "coriolis_modifier": float,
+    "wind_modifier": float,
+    "begin_pgf_tick": int,
+}
+
+METRICS = ("ticks", "sim_time", "wall_time", "max_wind", "mean_wind", "pressure_min", "pressure_max", "pressure_std")
+
+def combinations(grid):
+    """returns a list of parameter dicts, one for every combination of the grid's values, in grid order
+
+    Args:
+        grid (dict): Maps each parameter name (see PARAMETERS) to a sequence of values to try
+    """
+
+    for name in grid:
+        if name not in PARAMETERS:
+            raise ValueError("Unknown sweep parameter '{}', expected one of {}".format(name, ", ".join(PARAMETERS)))
+
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def make_sim(params, size=72, boundary="walls", backend="numpy", sources="test", adaptive_dt=False):
+    """returns a Controller (and its World) set up with the given parameters, without touching any module globals
+
+    Args:
+        params (dict): Parameter values (see PARAMETERS), parameters not given keep their defaults
+        size (int, optional): Grid size excluding boundary cells, defaults to 72
+        boundary (str, optional): Boundary policy name, defaults to "walls"
+        backend (str, optional): fluid_solver backend, defaults to "numpy"
+        sources (str, optional): "test" for the standard test sources, "none", or a .npz file of sources, defaults to "test"
+        adaptive_dt (bool, optional): If true, choose each tick's length from the wind speed, see Controller.plan_tick, defaults to False
+    """
+
+    wld = World("sweep", wld_grid_size=size, angular_vel=params.get("angular_vel", World.angular_vel), boundary=boundary)
+    for name in ("dt", "diff", "visc"):
+        if name in params:
+            setattr(wld, name, params[name])
+
+    sim = Controller(wld, backend=backend, adaptive_dt=adaptive_dt)
+    for name in ("begin_pgf_tick", "pgf_modifier", "coriolis_modifier", "wind_modifier"):
+        if name in params:
+            setattr(sim, name, params[name])
+
+    if sources == "test":
+        add_test_sources(wld)
+    elif sources != "none":
+        add_file_sources(wld, sources)
+    return sim
+
+def run_one(params, ticks, **options):
+    """Runs one configuration and returns its result
+
+    Args:
+        params (dict): Parameter values, see PARAMETERS
+        ticks (int): Number of ticks to run
+        options: Passed on to make_sim
+
+    Returns:
+        dict: "params", "status" ("ok"), "error" (""), "metrics" (dict of METRICS) and "fields" (dict of the final OUTPUT_FIELDS)
+    """
+
+    sim = make_sim(params, **options)
+    try:
+        stats = run(sim, ticks)
+    finally:
+        sim.close()
+
+    wld = sim.world
+    N = wld.wld_grid_size
+    inner = (slice(1, N + 1), slice(1, N + 1))
+    speed = np.hypot(wld.air_vel_u[inner], wld.air_vel_v[inner])
+    metrics = {
+        "ticks": ticks,
+        "sim_time": float(sim.sim_time),
+        "wall_time": stats["tick_time"],
+        "max_wind": float(speed.max()),
+        "mean_wind": float(speed.mean()),
+        "pressure_min": float(wld.air_pressure[inner].min()),
+        "pressure_max": float(wld.air_pressure[inner].max()),
+        "pressure_std": float(wld.air_pressure[inner].std()),
+    }
+    return {"params": params, "status": "ok", "error": "", "metrics": metrics, "fields": {name: getattr(wld, name) for name in OUTPUT_FIELDS}}
+
+def failed(params, status, error):
+    """returns the result of a run that did not finish"""
+    return {"params": params, "status": status, "error": error, "metrics": {}, "fields": {}}
+
+def _worker(conn, runner, params, ticks, options):
+    """Runs one configuration in a worker process and sends its result back"""
+
+    try:
+        result = runner(params, ticks, **options)
+    except Exception:
+        result = failed(params, "error", traceback.format_exc())
+    conn.send(result)
+    conn.close()
+    # Worker processes exit without running atexit, so write out their log lines first
+    logs.shutdown()
+
+def sweep(runs, ticks, processes=None, on_result=None, runner=run_one, **options):
+    """Runs every configuration, each in its own worker process, at most processes at a time
+
+    Args:
+        runs (list of dict, or dict): Parameter dicts to run, or a grid to run every combination of (see combinations)
+        ticks (int): Number of ticks each run lasts
+        processes (int, optional): Most runs at once, defaults to os.cpu_count()
+        on_result (function, optional): Called with (index, result) as each run finishes, eg to save results as they come in
+        runner (function, optional): Called in each worker with (params, ticks, **options) to do the run, must be importable by the workers, defaults to run_one
+        options: Passed on to make_sim
+
+    Returns:
+        list of dict: The result of every run (see run_one), in the order given. Runs that raised have status "error",
+            runs whose process died have status "crashed", both with the reason in "error"
+    """
+
+    if isinstance(runs, dict):
+        runs = combinations(runs)
+    processes = processes or os.cpu_count() or 1
+    ctx = multiprocessing.get_context()
+
+    results = [None] * len(runs)
+    pending = list(enumerate(runs))[::-1]
+    active = {}     # conn: (index, process)
+
+    try:
+        while pending or active:
+            while pending and len(active) < processes:
+                index, params = pending.pop()
+                conn, child_conn = ctx.Pipe(duplex=False)
+                proc = ctx.Process(target=_worker, args=(child_conn, runner, params, ticks, options), name="ClWxSim sweep {}".format(index), daemon=True)
+                proc.start()
+                # Only the worker holds the sending end, so it reads as closed once the worker is gone
+                child_conn.close()
+                active[conn] = (index, proc)
+
+            for conn in wait(list(active)):
+                index, proc = active.pop(conn)
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    proc.join()
+                    result = failed(runs[index], "crashed", "Worker process exited with code {}".format(proc.exitcode))
+                conn.close()
+                proc.join()
+
+                results[index] = result
+                if on_result is not None:
+                    on_result(index, result)
+    finally:
+        for conn, (index, proc) in active.items():
+            proc.terminate()
+            conn.close()
+
+    return results
+
+def results_table(results):
+    """returns the results as a table of columns, one row per run, see the module docstring
+
+    Args:
+        results (list of dict or None): Results from sweep, None for runs that have not finished (status "not run")
+    """
+
+    finished = [r for r in results if r is not None]
+    names = [name for name in PARAMETERS if any(name in r["params"] for r in finished)]
+    shape = None
+    for r in finished:
+        if r["fields"]:
+            shape = r["fields"][OUTPUT_FIELDS[0]].shape
+            break
+
+    table = {}
+    for name in names:
+        table[name] = np.array([r["params"].get(name, np.nan) if r is not None else np.nan for r in results], dtype=float)
+    table["status"] = np.array([r["status"] if r is not None else "not run" for r in results])
+    table["error"] = np.array([r["error"] if r is not None else "" for r in results])
+    for name in METRICS:
+        table[name] = np.array([r["metrics"].get(name, np.nan) if r is not None else np.nan for r in results], dtype=float)
+    if shape is not None:
+        for name in OUTPUT_FIELDS:
+            table[name] = np.stack([r["fields"][name] if r is not None and r["fields"] else np.full(shape, np.nan) for r in results])
+    return table
+
+def save_results(path, results):
+    """Writes the results table (see results_table) to a .npz file"""
+    np.savez(path, **results_table(results))
+
+def parse_param(text):
+    """returns (name, list of values) from a "name=value,value,..." command line argument"""
+
+    name, sep, values = text.partition("=")
+    name = name.strip().replace("-", "_")
+    if not sep or name not in PARAMETERS:
+        raise argparse.ArgumentTypeError("expected name=value,value,... with name one of {}".format(", ".join(PARAMETERS)))
+    try:
+        return name, [PARAMETERS[name](v) for v in values.split(",")]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError("bad value for {}: {}".format(name, e))
+
+def parse_args(argv=None):
+    """returns the parsed command line arguments
+
+    Args:
+        argv (list of str, optional): Arguments to parse, defaults to sys.argv[1:]
+    """
+
+    parser = argparse.ArgumentParser(prog="python -m ClWxSim.sweep", description="Run every combination of a grid of ClWxSim parameters")
+    parser.add_argument("--param", type=parse_param, action="append", required=True, metavar="NAME=V1,V2,...", help="parameter to sweep and its values, repeat for each parameter ({})".format(", ".join(PARAMETERS)))
+    parser.add_argument("--size", type=int, default=72, help="grid size excluding boundary cells (default: %(default)s)")
+    parser.add_argument("--ticks", type=int, default=100, help="number of ticks in each run (default: %(default)s)")
+    parser.add_argument("--boundary", choices=sorted(BOUNDARIES), default="walls", help="boundary policy (default: %(default)s)")
+    parser.add_argument("--backend", choices=solver.BACKENDS, default="numpy", help="solver backend (default: %(default)s)")
+    parser.add_argument("--sources", default="test", help="initial sources, 'test' for the standard test sources, 'none', or a .npz file of arrays to add (default: %(default)s)")
+    parser.add_argument("--adaptive-dt", action="store_true", help="choose each tick's length from the wind speed")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="most runs at once (default: %(default)s)")
+    parser.add_argument("--output", default=None, help=".npz file to write the results table to, rewritten as each run finishes")
+
+    args = parser.parse_args(argv)
+    if args.size < 1 or args.processes < 1:
+        parser.error("--size and --processes must be at least 1")
+    if args.ticks < 0:
+        parser.error("--ticks can not be negative")
+    return args
+
+def main(argv=None):
+    """Runs a sweep from the command line and returns the exit code, 1 if any run failed
+
+    Args:
+        argv (list of str, optional): Command line arguments, defaults to sys.argv[1:]
+    """
+
+    args = parse_args(argv)
+    grid = dict(args.param)
+    runs = combinations(grid)
+    results = [None] * len(runs)
+
+    def on_result(index, result):
+        results[index] = result
+        params = " ".join("{}={}".format(name, value) for name, value in result["params"].items())
+        if result["status"] == "ok":
+            print("[{}/{}] {}: max wind {:.3g}, pressure {:.2f} to {:.2f}".format(index + 1, len(runs), params, result["metrics"]["max_wind"], result["metrics"]["pressure_min"], result["metrics"]["pressure_max"]))
+        else:
+            print("[{}/{}] {}: {} [{}]".format(index + 1, len(runs), params, result["status"], result["error"].strip().splitlines()[-1]), file=sys.stderr)
+        # Finished runs are kept even if a later run (or this process) fails
+        if args.output is not None:
+            save_results(args.output, results)
+
+    sweep(runs, args.ticks, processes=args.processes, on_result=on_result, size=args.size, boundary=args.boundary, backend=args.backend, sources=args.sources, adaptive_dt=args.adaptive_dt)
+
+    if args.output is not None:
+        print("Wrote {} runs to {}".format(len(runs), args.output))
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from ClWxSim.data.archive import Archive, ArchiveWriter
+from ClWxSim.run import main
+from ClWxSim.tests.controller_test import make_sim
+
+def record(path, ticks=7, **kwargs):
+    wld, sim = make_sim(N=10)
+    writer = sim.record(str(path), **kwargs)
+    frames = []
+    for k in range(ticks):
+        sim.tick()
+        if sim.tickNum % writer.every == 0:
+            frames.append((sim.tickNum, wld.air_pressure.copy(), wld.air_vel_u.copy()))
+    sim.close()
+    return frames
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_frames_read_back(tmp_path, compression):
+    frames = record(tmp_path, every=2, dtype=None, compression=compression, chunk_frames=2)
+    archive = Archive(str(tmp_path))
+
+    np.testing.assert_array_equal(archive.ticks, [t for t, p, u in frames])
+    assert archive["air_pressure"].shape == (3, 12, 12)
+    for k, (tick, pressure, u) in enumerate(frames):
+        np.testing.assert_array_equal(archive["air_pressure"][k], pressure)
+        np.testing.assert_array_equal(archive["air_vel_u"][k], u)
+
+    # Any time range and region, across chunk edges
+    np.testing.assert_array_equal(archive["air_pressure"][1:, 2:5, ::3], np.stack([p for t, p, u in frames[1:]])[:, 2:5, ::3])
+    np.testing.assert_array_equal(archive["air_vel_u"][archive.tick_slice(3, 7), 4], np.stack([u for t, p, u in frames[1:3]])[:, 4])
+    np.testing.assert_array_equal(archive["air_pressure"][-1], frames[-1][1])
+    if compression is None:
+        assert isinstance(archive["air_pressure"][0:2], np.memmap)
+
+def test_decimated_float32(tmp_path):
+    frames = record(tmp_path, decimate=3)
+    archive = Archive(str(tmp_path))
+    assert archive["air_pressure"].shape == (7, 4, 4)
+    assert archive.dtype == np.float32
+    np.testing.assert_array_equal(archive["air_pressure"][6], frames[6][1][::3, ::3].astype(np.float32))
+
+def test_unflushed_frames_are_not_read(tmp_path):
+    wld, sim = make_sim(N=8)
+    writer = ArchiveWriter(str(tmp_path), compression="zlib", chunk_frames=4)
+    for k in range(6):
+        writer.append(wld, k)
+    # Only the first chunk has been written, the writer has not been closed
+    writer._files["ticks"].flush()
+    writer._files["times"].flush()
+    assert len(Archive(str(tmp_path))) == 4
+    writer.close()
+    assert len(Archive(str(tmp_path))) == 6
+
+def test_main_archives(tmp_path):
+    path = tmp_path / "frames"
+    assert main(["--size", "8", "--ticks", "4", "--archive", str(path), "--archive-every", "2", "--archive-compress"]) == 0
+    archive = Archive(str(path))
+    np.testing.assert_array_equal(archive.ticks, [2, 4])
+    assert archive.meta["compression"] == "zlib"
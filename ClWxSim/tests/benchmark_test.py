@@ -0,0 +1,41 @@
+import json
+
+import ClWxSim.benchmark as benchmark
+
+def test_every_case_runs_and_reports():
+    results = benchmark.run_benchmarks(sizes=[8], min_time=0.001, repeats=2)
+
+    assert results["version"] == benchmark.FORMAT_VERSION
+    assert [r["case"] for r in results["results"]] == list(benchmark.CASES)
+    for r in results["results"]:
+        assert r["N"] == 8
+        assert 0 < r["best_ms"] <= r["median_ms"]
+        assert r["calls"] >= 2
+
+    # Results must survive a round trip through JSON to be used as a baseline
+    assert json.loads(json.dumps(results)) == results
+
+def test_compare_flags_regressions():
+    def result(case, N, ms):
+        return {"case": case, "N": N, "best_ms": ms, "median_ms": ms, "calls": 1}
+
+    baseline = {"results": [result("advect", 32, 1.), result("diffuse", 32, 1.), result("tick", 32, 1.)]}
+    current = {"results": [result("advect", 32, 1.5), result("diffuse", 32, 0.5), result("tick", 32, 1.1), result("tick", 64, 1.)]}
+
+    status = {(r["case"], r["N"]): r["status"] for r in benchmark.compare(current, baseline, threshold=0.2)}
+    assert status == {("advect", 32): "regression", ("diffuse", 32): "improvement", ("tick", 32): "ok", ("tick", 64): "new"}
+
+def test_main_exit_code(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    args = ["--sizes", "8", "--cases", "add_source", "--min-time", "0.001", "--repeats", "2"]
+
+    assert benchmark.main(args + ["--output", str(baseline)]) == 0
+
+    # Pretend the baseline was far faster, so the new run is a regression
+    data = json.loads(baseline.read_text())
+    data["results"][0]["best_ms"] /= 1000
+    baseline.write_text(json.dumps(data))
+
+    out = tmp_path / "out.json"
+    assert benchmark.main(args + ["--baseline", str(baseline), "--output", str(out)]) == 1
+    assert json.loads(out.read_text())["comparison"][0]["status"] == "regression"
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import ClWxSim.data.checkpoint as checkpoint
+from ClWxSim.data.Ensemble import Ensemble
+from ClWxSim.data.World import World
+from ClWxSim.run import main
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.tests.controller_test import make_sim
+
+def test_restored_run_matches_uninterrupted_run(tmp_path):
+    path = str(tmp_path / "world.ckpt")
+    expected, sim = make_sim(N=16, boundary="periodic")
+    sim.pgf_modifier = 0.5
+    for k in range(4):
+        sim.tick()
+    sim.save_checkpoint(path)
+    for k in range(4):
+        sim.tick()
+
+    restored = Controller.restore(path)
+    wld = restored.world
+    assert isinstance(wld.air_pressure, np.ndarray) and isinstance(wld.air_pressure.base, np.memmap)
+    assert restored.tickNum == 4 and restored.begin_pgf_tick == 2 and restored.pgf_modifier == 0.5
+    assert np.isclose(restored.sim_time, 4 * wld.dt)
+    assert wld.boundary.name == "periodic"
+
+    restored.running = True
+    for k in range(4):
+        restored.tick()
+    for name in checkpoint.FIELDS:
+        np.testing.assert_array_equal(getattr(wld, name), getattr(expected, name), err_msg=name)
+
+    # Arrays are mapped copy on write, ticking the restored World leaves the file as it was
+    header, arrays = checkpoint.load(path, mmap=False)
+    assert header["controller"]["tickNum"] == 4
+    assert not np.array_equal(arrays["air_vel_u"], wld.air_vel_u)
+
+def test_ensemble_round_trip(tmp_path):
+    path = str(tmp_path / "ensemble.ckpt")
+    ens = Ensemble("checkpoint_test Ensemble", 3, wld_grid_size=8, angular_vel=[1e-5, 2e-5, 3e-5], diff=[1e-5, 2e-5, 3e-5])
+    ens.air_pressure[1, 3, 3] += 4.
+    ens.save(path)
+
+    loaded = World.load(path, mmap=False)
+    assert isinstance(loaded, Ensemble) and loaded.members == 3
+    np.testing.assert_array_equal(loaded.air_pressure, ens.air_pressure)
+    np.testing.assert_array_equal(loaded.angular_vel, ens.angular_vel)
+    np.testing.assert_array_equal(loaded.diff, ens.diff)
+    assert loaded.visc == ens.visc
+
+def test_arrays_are_aligned_and_bad_files_rejected(tmp_path):
+    path = str(tmp_path / "world.ckpt")
+    World("checkpoint_test World", wld_grid_size=5).save(path)
+    header = checkpoint.read_header(path)
+    assert header["version"] == checkpoint.FORMAT_VERSION
+    assert all(entry["offset"] % checkpoint.ALIGN == 0 for entry in header["arrays"].values())
+
+    bad = tmp_path / "bad.ckpt"
+    bad.write_bytes(b"not a checkpoint at all")
+    with pytest.raises(ValueError):
+        checkpoint.read_header(str(bad))
+
+    newer = tmp_path / "newer.ckpt"
+    data = bytearray(open(path, "rb").read())
+    data[8:12] = (checkpoint.FORMAT_VERSION + 1).to_bytes(4, "little")
+    newer.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        checkpoint.load(str(newer))
+
+def test_auto_checkpoints_in_background(tmp_path):
+    wld, sim = make_sim(N=16)
+    sim.auto_checkpoint(str(tmp_path / "auto_{tick}.ckpt"), 3)
+    for k in range(7):
+        sim.tick()
+    sim.checkpointer.wait()
+    checkpointer = sim.checkpointer
+    sim.close()
+
+    assert checkpointer.written + checkpointer.skipped == 2 and checkpointer.error is None
+    assert checkpoint.read_header(str(tmp_path / "auto_3.ckpt"))["controller"]["tickNum"] == 3
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_main_checkpoint_and_restore(tmp_path, capsys):
+    path = str(tmp_path / "run.ckpt")
+    assert main(["--size", "12", "--ticks", "3", "--checkpoint", path, "--checkpoint-every", "2"]) == 0
+    assert main(["--ticks", "2", "--restore", path, "--checkpoint", path]) == 0
+    assert checkpoint.read_header(path)["controller"]["tickNum"] == 5
+    assert "Saved a checkpoint of tick 5" in capsys.readouterr().out
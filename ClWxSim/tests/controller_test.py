@@ -0,0 +1,52 @@
+import tracemalloc
+
+import numpy as np
+
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.data.World import World
+
+def make_sim(N=64, boundary="walls"):
+    wld = World("controller_test World", wld_grid_size=N, boundary=boundary)
+    wld.air_pressure[N//6:N//4, N//3:N//2] += 5.
+    wld.air_pressure[N//2:2*N//3, N//2:2*N//3] -= 5.
+    sim = Controller(wld)
+    sim.begin_pgf_tick = 2
+    sim.running = True
+    return wld, sim
+
+def test_steady_state_tick_does_not_allocate_arrays():
+    for boundary in ("walls", "periodic"):
+        wld, sim = make_sim(N=256, boundary=boundary)
+
+        # Warm up, the workspace and coarse grid caches are filled in the first ticks
+        for k in range(5):
+            sim.tick()
+
+        field_bytes = wld.air_pressure.nbytes
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for k in range(5):
+                sim.tick()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # numpy keeps a few fixed size (8192 element) iterator buffers for strided ufuncs, these do not
+        # grow with the grid, so at this size anything close to one field would be a real allocation
+        assert peak - before < field_bytes / 2, (boundary, peak - before, field_bytes)
+        assert current - before < field_bytes / 100
+
+def test_tick_keeps_world_arrays():
+    wld, sim = make_sim(N=16)
+    arrays = [wld.air_vel_u, wld.air_vel_v, wld.air_pressure, wld.air_pressure_grad_u, wld.dbg_coriolis_u]
+
+    for k in range(4):
+        sim.tick()
+
+    assert arrays[0] is wld.air_vel_u
+    assert arrays[1] is wld.air_vel_v
+    assert arrays[2] is wld.air_pressure
+    assert arrays[3] is wld.air_pressure_grad_u
+    assert arrays[4] is wld.dbg_coriolis_u
+    assert np.abs(wld.air_vel_u).max() > 0
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import ClWxSim.sim.fluid_solver as solver
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.data.World import World
+from ClWxSim.data.Ensemble import Ensemble
+
+def start(wld):
+    sim = Controller(wld)
+    sim.begin_pgf_tick = 2
+    sim.running = True
+    return sim
+
+def test_ensemble_matches_separate_worlds():
+    N, K = 48, 3
+    angular_vel = [.000072, .0002, .00005]
+    visc = [0.00001, 0.00003, 0.00001]
+
+    for boundary in ("walls", "periodic", "polar"):
+        ens = Ensemble("ensemble_test Ensemble", K, wld_grid_size=N, angular_vel=angular_vel, visc=visc, boundary=boundary)
+        ens_sim = start(ens)
+
+        worlds = []
+        for k in range(K):
+            wld = World("ensemble_test World", wld_grid_size=N, angular_vel=angular_vel[k], boundary=boundary)
+            wld.visc = visc[k]
+            worlds.append((wld, start(wld)))
+
+            # Members differ in their starting pressure perturbation too
+            wld.air_pressure[8 + k:16, 20:30] += 5.
+            ens.air_pressure[k, 8 + k:16, 20:30] += 5.
+
+        for t in range(8):
+            ens_sim.tick()
+            for wld, sim in worlds:
+                sim.tick()
+
+        for k, (wld, sim) in enumerate(worlds):
+            # Members share the multigrid stopping test, so agree with a lone World to within its tolerance
+            np.testing.assert_allclose(ens.air_pressure[k], wld.air_pressure, atol=1e-7)
+            np.testing.assert_allclose(ens.air_vel_u[k], wld.air_vel_u, atol=1e-7)
+            np.testing.assert_allclose(ens.air_vel_v[k], wld.air_vel_v, atol=1e-7)
+        assert np.abs(ens.air_vel_u).max() > 0
+
+def test_batched_diffuse_with_per_member_rates():
+    N, K = 40, 3
+    rng = np.random.default_rng(0)
+    x0 = rng.random((K, N+2, N+2))
+    diff = np.array([0.0001, 0.001, 0.01]).reshape(K, 1, 1)
+
+    x = np.zeros((K, N+2, N+2))
+    solver.diffuse(N, 0, x, x0, diff, 0.1)
+
+    for k in range(K):
+        xk = np.zeros((N+2, N+2))
+        solver.diffuse(N, 0, xk, x0[k], diff[k, 0, 0], 0.1)
+        np.testing.assert_allclose(x[k], xk, atol=1e-9)
+
+def test_member_param():
+    ens = Ensemble("ensemble_test Ensemble", 4, wld_grid_size=8)
+    assert ens.member_param(2) == 2.
+    assert ens.member_param([1, 2, 3, 4]).shape == (4, 1, 1)
+    assert ens.air_pressure.shape == (4, 10, 10)
+    with pytest.raises(ValueError):
+        ens.member_param([1, 2])
@@ -0,0 +1,83 @@
+import os
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from ClWxSim.data.World import World
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.sim.SimThread import Snapshot
+from ClWxSim.ui.export import FrameExporter, write_png
+
+def read_png(path):
+    """returns the RGB image in a PNG written by write_png"""
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, chunks = 8, {}
+    while pos < len(data):
+        length, = struct.unpack(">I", data[pos:pos + 4])
+        kind = data[pos + 4:pos + 8]
+        body = data[pos + 8:pos + 8 + length]
+        assert struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(kind + body)
+        chunks[kind] = body
+        pos += 12 + length
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    rows = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8).reshape(height, -1)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 3)
+
+def render_pressure(fields, tick, scale=1):
+    # Stands in for render_frame, which needs matplotlib
+    grey = np.clip(fields["air_pressure"] - 1000, 0, 255).astype(np.uint8) * scale
+    return np.repeat(grey[:, :, None], 3, axis=2)
+
+def render_failing(fields, tick):
+    if tick == 2:
+        raise ValueError("bad frame")
+    return render_pressure(fields, tick)
+
+def test_write_png_round_trip(tmp_path):
+    image = np.random.default_rng(0).integers(0, 256, (5, 7, 3), dtype=np.uint8)
+    write_png(str(tmp_path / "img.png"), image)
+    np.testing.assert_array_equal(read_png(str(tmp_path / "img.png")), image)
+
+def test_image_sequence_of_a_running_sim(tmp_path):
+    wld = World("export", wld_grid_size=8)
+    sim = Controller(wld)
+    sim.running = True
+    exporter = FrameExporter(str(tmp_path / "frames" / "export_{tick}.png"), every=2, processes=2, queue_size=1, render=render_pressure, scale=2)
+    sim.observers.append(exporter)
+
+    expected = {}
+    for k in range(6):
+        wld.air_pressure[...] = 1010 + k
+        sim.tick()
+        expected[sim.tickNum] = render_pressure({"air_pressure": wld.air_pressure}, sim.tickNum, scale=2)
+        # Never more than queue_size frames in flight
+        assert exporter.in_flight <= 1
+    sim.close()
+
+    assert exporter.exported == 3 and exporter.error is None
+    assert sorted(os.listdir(tmp_path / "frames")) == ["export_2.png", "export_4.png", "export_6.png"]
+    for tick in (2, 4, 6):
+        np.testing.assert_array_equal(read_png(str(tmp_path / "frames" / "export_{}.png".format(tick))), expected[tick])
+
+def test_a_failed_frame_is_recorded_and_the_rest_carry_on(tmp_path):
+    snap = Snapshot(("air_pressure", "air_vel_u", "air_vel_v"))
+    with FrameExporter(str(tmp_path / "{tick}.png"), render=render_failing) as exporter:
+        for tick in range(1, 4):
+            snap.copy_from(World("export", wld_grid_size=4), tick)
+            exporter.submit(snap, tick)
+        exporter.wait()
+        assert exporter.ready()
+    assert isinstance(exporter.error, ValueError)
+    assert exporter.exported == 2
+    assert sorted(os.listdir(tmp_path)) == ["1.png", "3.png"]
+
+def test_paths_are_checked(tmp_path):
+    with pytest.raises(ValueError):
+        FrameExporter(str(tmp_path / "frame.png"))
+    with pytest.raises(RuntimeError):
+        FrameExporter(str(tmp_path / "run.mp4"), ffmpeg="no-such-ffmpeg")
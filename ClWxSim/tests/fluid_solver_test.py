@@ -0,0 +1,236 @@
+import math
+
+import numpy as np
+
+import ClWxSim.sim.fluid_solver as solver
+import ClWxSim.sim.spectral as spectral
+from ClWxSim.sim.boundary import get_boundary
+from ClWxSim.sim.workspace import Workspace
+from ClWxSim.data.World import World
+
+def random_fields(N, seed=0, speed=1.):
+    rng = np.random.default_rng(seed)
+    d0 = rng.random((N+2, N+2))
+    u = (rng.random((N+2, N+2)) - 0.5) * speed
+    v = (rng.random((N+2, N+2)) - 0.5) * speed
+    return d0, u, v
+
+def test_advect_matches_reference():
+    N = 24
+    for b in (0, 1, 2):
+        # Fast enough winds to push many back-traces past the clamped edges
+        d0, u, v = random_fields(N, seed=b, speed=4.)
+
+        d_ref = np.zeros((N+2, N+2))
+        d_vec = np.zeros((N+2, N+2))
+
+        solver.advect(N, b, d_ref, d0, u, v, 0.1, reference=True)
+        solver.advect(N, b, d_vec, d0, u, v, 0.1)
+
+        np.testing.assert_array_equal(d_vec, d_ref)
+
+def test_advect_still_field():
+    N = 10
+    d0, u, v = random_fields(N)
+    u[:] = 0.
+    v[:] = 0.
+
+    d = np.zeros((N+2, N+2))
+    solver.advect(N, 0, d, d0, u, v, 0.1)
+
+    np.testing.assert_array_equal(d[1:N+1, 1:N+1], d0[1:N+1, 1:N+1])
+
+def test_multigrid_matches_converged_lin_solve():
+    N = 64
+    x0, _, _ = random_fields(N, seed=3)
+
+    a = 0.1 * 0.00001 * N * N
+    x_mg = np.zeros((N+2, N+2))
+    x_ls = np.zeros((N+2, N+2))
+
+    cycles, res = solver.multigrid_solve(N, 0, x_mg, x0, a, 1 + 4 * a)
+    solver.lin_solve(N, 0, x_ls, x0, a, 1 + 4 * a)
+
+    assert res <= solver.mg_tol
+    assert cycles <= solver.mg_max_cycles
+    np.testing.assert_allclose(x_mg, x_ls, atol=1e-12)
+
+def test_multigrid_poisson_converges():
+    N = 128
+    for b in (0, 1):
+        x0, _, _ = random_fields(N, seed=b)
+        if b == 0:
+            # The Neumann problem only has a solution when the right hand side sums to zero
+            x0[1:N+1, 1:N+1] -= x0[1:N+1, 1:N+1].mean()
+
+        x = np.zeros((N+2, N+2))
+        cycles, res = solver.multigrid_solve(N, b, x, x0, 1, 4, tol=1e-8)
+
+        r = np.zeros((N+2, N+2))
+        solver.residual(N, x, x0, 1, 4, r)
+
+        assert res <= 1e-8
+        assert cycles < 15
+        assert np.abs(r).max() <= 1e-6 * np.abs(x0).max()
+
+def test_multigrid_respects_cycle_cap():
+    N = 64
+    x0, _, _ = random_fields(N, seed=4)
+    x = np.zeros((N+2, N+2))
+
+    cycles, res = solver.multigrid_solve(N, 1, x, x0, 1, 4, tol=0., max_cycles=2)
+
+    assert cycles == 2
+    assert res > 0
+
+def test_jacobi_solve_stops_at_tolerance():
+    N = 128
+    x0, _, _ = random_fields(N, seed=6)
+    a = 0.1 * 0.00001 * N * N
+
+    x = np.zeros((N+2, N+2))
+    sweeps, res = solver.jacobi_solve(N, 0, x, x0, a, 1 + 4 * a)
+    assert res <= solver.mg_tol
+    # Small a keeps the system diagonally dominant, so far fewer sweeps than lin_solve's fixed count are needed
+    assert sweeps < solver.lin_solve_sweeps
+
+    x_mg = np.zeros((N+2, N+2))
+    solver.multigrid_solve(N, 0, x_mg, x0, a, 1 + 4 * a)
+    np.testing.assert_allclose(x, x_mg, atol=1e-9)
+
+    # Starting from the answer needs no sweeps at all
+    assert solver.jacobi_solve(N, 0, x, x0, a, 1 + 4 * a)[0] == 0
+
+def test_diffuse_only_uses_jacobi_while_diagonally_dominant(monkeypatch):
+    N = 32
+    x0, _, _ = random_fields(N, seed=7)
+    used = []
+    for name in ("jacobi_solve", "multigrid_solve"):
+        monkeypatch.setattr(solver, name, lambda *args, name=name, **kwargs: used.append(name) or (0, 0.))
+
+    solver.diffuse(N, 0, np.zeros((N+2, N+2)), x0, 0.00001, 0.1)
+    solver.diffuse(N, 0, np.zeros((N+2, N+2)), x0, 1., 0.1)
+    assert used == ["jacobi_solve", "multigrid_solve"]
+
+def test_coarse_inverse_cache_is_bounded(monkeypatch):
+    N = 8
+    x0, _, _ = random_fields(N, seed=5)
+    solver._mg_coarse_inverses.clear()
+    # Room for 4 of the (N*N, N*N) inverses
+    monkeypatch.setattr(solver, "mg_cache_bytes", 4 * (N * N) ** 2 * 8)
+
+    # A diffusion coefficient per Ensemble member or dt adds an inverse each
+    for k in range(8):
+        a = 0.01 * (k + 1)
+        solver.multigrid_solve(N, 0, np.zeros((N+2, N+2)), x0, a, 1 + 4 * a)
+    assert len(solver._mg_coarse_inverses) == 4
+
+    # Using an inverse keeps it, the least recently used is dropped instead
+    first = next(iter(solver._mg_coarse_inverses))
+    solver.multigrid_solve(N, 0, np.zeros((N+2, N+2)), x0, first[2], first[3])
+    solver.multigrid_solve(N, 0, np.zeros((N+2, N+2)), x0, 1., 5.)
+    assert first in solver._mg_coarse_inverses
+
+    # The newest inverse is kept even when it alone is over the budget
+    monkeypatch.setattr(solver, "mg_cache_bytes", 0)
+    solver.multigrid_solve(N, 0, np.zeros((N+2, N+2)), x0, 2., 9.)
+    assert list(solver._mg_coarse_inverses) == [(N, 0, 2., 9., "walls")]
+
+def test_per_member_coarse_solve_is_batched(monkeypatch):
+    N, K = 16, 6
+    rng = np.random.default_rng(3)
+    x0 = rng.random((K, N+2, N+2))
+    a = 0.5 * np.arange(1, K + 1).reshape(K, 1, 1)
+    solver._mg_coarse_inverses.clear()
+
+    built = []
+    neighbour_matrix = solver._neighbour_matrix
+    monkeypatch.setattr(solver, "_neighbour_matrix", lambda *args: built.append(args) or neighbour_matrix(*args))
+
+    # Every member's system is inverted at once, then reused by later solves
+    for tick in range(2):
+        x = np.zeros((K, N+2, N+2))
+        solver.multigrid_solve(N, 0, x, x0, a, 1 + 4 * a)
+        assert len(built) == 1 and len(solver._mg_coarse_inverses) == 1
+
+    for k in range(K):
+        xk = np.zeros((N+2, N+2))
+        solver.multigrid_solve(N, 0, xk, x0[k], a[k, 0, 0], 1 + 4 * a[k, 0, 0])
+        np.testing.assert_allclose(x[k], xk, atol=1e-12)
+
+    # Members whose inverses would not fit in the cache are relaxed instead
+    monkeypatch.setattr(solver, "mg_cache_bytes", 0)
+    x = np.zeros((K, N+2, N+2))
+    assert solver.multigrid_solve(N, 0, x, x0, 2 * a, 1 + 8 * a)[1] <= solver.mg_tol
+    assert len(built) == 1 + K
+
+def test_neighbour_matrix_matches_set_bnd():
+    N = 6
+    for boundary in ("walls", "periodic", "polar"):
+        bnd = get_boundary(boundary)
+        for b in (0, 1, 2):
+            S = solver._neighbour_matrix(N, b, bnd)
+            for k in range(N * N):
+                e = np.zeros((N+2, N+2))
+                e[1 + k // N, 1 + k % N] = 1
+                solver.set_bnd(N, b, e, bnd)
+                sums = e[0:N, 1:N+1] + e[2:N+2, 1:N+1] + e[1:N+1, 0:N] + e[1:N+1, 2:N+2]
+                np.testing.assert_array_equal(S[:, k], sums.ravel())
+
+def test_spectral_solve_is_exact():
+    for N in (16, 17):
+        for boundary in ("walls", "periodic"):
+            bnd = get_boundary(boundary)
+            for a, c in ((1, 4), (0.3, 2.5)):
+                x0, _, _ = random_fields(N, seed=N)
+                x0[1:N+1, 1:N+1] -= x0[1:N+1, 1:N+1].mean()
+
+                x = np.zeros((N+2, N+2))
+                spectral.solve(N, x, x0, a, c, bnd, Workspace(N))
+
+                r = np.zeros((N+2, N+2))
+                solver.residual(N, x, x0, a, c, r)
+                assert np.abs(r).max() <= 1e-12, (N, boundary, a, c)
+
+def test_project_solvers_agree():
+    N = 32
+    for boundary in ("walls", "periodic", "polar"):
+        bnd = get_boundary(boundary)
+        results = []
+        for method in solver.PROJECT_SOLVERS:
+            _, u, v = random_fields(N, seed=6)
+            p = np.zeros((N+2, N+2))
+            div = np.zeros((N+2, N+2))
+            solver.project(N, u, v, p, div, bnd=bnd, solver=method)
+            results.append((u, v))
+
+        np.testing.assert_allclose(results[0][0], results[1][0], atol=1e-8)
+        np.testing.assert_allclose(results[0][1], results[1][1], atol=1e-8)
+
+def test_coriolis_matches_per_cell_formula():
+    N = 20
+    wld = World("coriolis_test World", wld_grid_size=N)
+    _, u, v = random_fields(N, seed=5)
+    u0, v0 = u.copy(), v.copy()
+
+    solver.coriolis(N, u, v, 0.1, wld.angular_vel, 2., wld)
+
+    for i in range(N + 2):
+        for j in range(N + 2):
+            f = 2 * wld.angular_vel * math.sin(math.radians(solver.calc_lat(N, i))) * 2.
+            assert math.isclose(wld.dbg_coriolis_u[i, j], v0[i, j] * f, rel_tol=1e-12, abs_tol=1e-20)
+            assert math.isclose(wld.dbg_coriolis_v[i, j], -u0[i, j] * f, rel_tol=1e-12, abs_tol=1e-20)
+
+    expected_u = u0 + 0.1 * wld.dbg_coriolis_u
+    solver.set_bnd(N, 1, expected_u)
+    np.testing.assert_allclose(u, expected_u, rtol=1e-12)
+
+def test_geometry_rebuilt_when_world_changes():
+    wld = World("geometry_test World", wld_grid_size=10)
+    geo = wld.get_geometry()
+    assert wld.get_geometry() is geo
+
+    wld.angular_vel = 2 * wld.angular_vel
+    geo2 = wld.get_geometry()
+    assert geo2 is not geo
+    np.testing.assert_allclose(geo2.coriolis_f, 2 * geo.coriolis_f)
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+# Modules the headless core is used through, eg by run, sweep workers and scripts
+CORE_MODULES = ("ClWxSim.run", "ClWxSim.sweep", "ClWxSim.data.World", "ClWxSim.sim.Controller", "ClWxSim.sim.SimThread")
+
+# Slow or GUI only imports, which the core should only import once they are used
+LAZY_MODULES = ("numba", "matplotlib", "tkinter", "keyboard", "multiprocessing.shared_memory", "concurrent.futures")
+
+IMPORT_BUDGET_MS = 150  # Generous, the package's own modules take a few tens of ms to import
+
+def import_times(modules):
+    """returns {module: (self us, cumulative us)} for every module imported by importing modules in a new interpreter"""
+    code = "; ".join("import " + module for module in modules)
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+def test_core_does_not_import_slow_or_gui_modules():
+    times = import_times(CORE_MODULES + ("ClWxSim.ui.graphUI",))
+    assert [m for m in LAZY_MODULES if m in times] == []
+
+def test_core_imports_within_budget():
+    # Numpy's import (and whatever it imports) is not ours to speed up, so only the time spent outside it counts
+    times = import_times(CORE_MODULES)
+    numpy_us = sum(cumulative for name, (own, cumulative) in times.items() if name == "numpy")
+    ours_us = sum(own for name, (own, cumulative) in times.items()) - numpy_us
+    assert ours_us / 1000 < IMPORT_BUDGET_MS
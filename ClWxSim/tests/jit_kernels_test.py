@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+import ClWxSim.sim.fluid_solver as solver
+import ClWxSim.sim.jit_kernels as jit
+from ClWxSim.sim.boundary import get_boundary
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.data.World import World
+
+needs_numba = pytest.mark.skipif(not jit.available, reason="Numba is not installed")
+
+POLICIES = ("walls", "periodic", "polar")
+
+def random_fields(N, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.random((N+2, N+2)) - 0.5 for k in range(3)]
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        solver.resolve_backend("fortran")
+
+def test_numba_falls_back_when_missing(monkeypatch):
+    monkeypatch.setattr(jit, "available", False)
+    assert solver.resolve_backend("numba") == "numpy"
+
+    wld = World("jit_test World", wld_grid_size=8)
+    assert Controller(wld, backend="numba").backend == "numpy"
+
+@needs_numba
+def test_set_bnd_and_lin_solve_match_numpy():
+    N = 16
+    for name in POLICIES:
+        bnd = get_boundary(name)
+        for b in (0, 1, 2):
+            x, x0, _ = random_fields(N, seed=b)
+            x_jit = x.copy()
+
+            solver.lin_solve(N, b, x, x0, 0.3, 2.2, bnd=bnd)
+            solver.lin_solve(N, b, x_jit, x0, 0.3, 2.2, bnd=bnd, backend="numba")
+
+            np.testing.assert_allclose(x_jit, x, rtol=1e-13, atol=1e-15)
+
+@needs_numba
+def test_multigrid_matches_numpy():
+    N = 64
+    for name in POLICIES:
+        bnd = get_boundary(name)
+        _, x0, _ = random_fields(N, seed=7)
+        x = np.zeros((N+2, N+2))
+        x_jit = np.zeros((N+2, N+2))
+
+        stats = solver.multigrid_solve(N, 1, x, x0, 1, 4, bnd=bnd)
+        stats_jit = solver.multigrid_solve(N, 1, x_jit, x0, 1, 4, bnd=bnd, backend="numba")
+
+        assert stats[0] == stats_jit[0]
+        np.testing.assert_allclose(x_jit, x, rtol=1e-9, atol=1e-12)
+
+@needs_numba
+def test_advect_and_coriolis_match_numpy():
+    N = 20
+    for name in POLICIES:
+        bnd = get_boundary(name)
+        d0, u, v = random_fields(N, seed=3)
+        u *= 8
+        v *= 8
+
+        d = np.zeros((N+2, N+2))
+        d_jit = np.zeros((N+2, N+2))
+        solver.advect(N, 2, d, d0, u, v, 0.1, bnd=bnd)
+        solver.advect(N, 2, d_jit, d0, u, v, 0.1, bnd=bnd, backend="numba")
+        np.testing.assert_allclose(d_jit, d, rtol=1e-13, atol=1e-15)
+
+        wld = World("jit_test World", wld_grid_size=N)
+        wld_jit = World("jit_test World", wld_grid_size=N)
+        u_jit, v_jit = u.copy(), v.copy()
+        solver.coriolis(N, u, v, 0.1, wld.angular_vel, 1., wld, bnd=bnd)
+        solver.coriolis(N, u_jit, v_jit, 0.1, wld.angular_vel, 1., wld_jit, bnd=bnd, backend="numba")
+        np.testing.assert_allclose(u_jit, u, rtol=1e-13)
+        np.testing.assert_allclose(wld_jit.dbg_coriolis_v, wld.dbg_coriolis_v, rtol=1e-13)
+
+@needs_numba
+def test_controller_backends_agree():
+    worlds = []
+    for backend in ("numpy", "numba"):
+        wld = World("jit_test World", wld_grid_size=32, boundary="periodic")
+        wld.air_pressure[10:14, 10:14] += 5.
+        sim = Controller(wld, backend=backend)
+        assert sim.backend == backend
+        sim.begin_pgf_tick = 0
+        sim.running = True
+        for k in range(5):
+            sim.tick()
+        worlds.append(wld)
+
+    np.testing.assert_allclose(worlds[1].air_pressure, worlds[0].air_pressure, rtol=1e-12)
+    np.testing.assert_allclose(worlds[1].air_vel_u, worlds[0].air_vel_u, rtol=1e-9, atol=1e-15)
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import ClWxSim.utils.logging as logs
+from ClWxSim.utils.logging import Logger
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(logs, "log_dir", str(tmp_path))
+    monkeypatch.setattr(logs, "echo", False)
+    yield tmp_path
+    logs.shutdown()
+
+def read_logs(path, log_ID):
+    names = sorted(name for name in os.listdir(path) if name.startswith(log_ID))
+    return [open(os.path.join(path, name)).read() for name in names]
+
+def test_lines_are_written_once_flushed(log_dir):
+    logger = Logger(log_ID="test")
+    logger.log("tick {} of {}", 3, 10)
+    logger.error("failed: [{}]", "reason")
+    assert logger.flush() is None
+
+    text, = read_logs(log_dir, "test")
+    lines = text.splitlines()
+    assert lines[0].endswith("INFO >>> tick 3 of 10")
+    assert lines[1].endswith("ERROR >>> failed: [reason]")
+    assert os.path.dirname(logger.log_loc) == str(log_dir) and "\\" not in os.path.basename(logger.log_loc)
+
+def test_messages_below_the_level_are_never_formatted(log_dir):
+    class Unformattable:
+        def __format__(self, spec):
+            raise AssertionError("formatted a dropped message")
+
+    logger = Logger(log_ID="level", level=logs.WARNING)
+    logger.debug("{}", Unformattable())
+    logger.info("{}", Unformattable())
+    logger.warning("kept")
+    assert not logger.enabled(logs.INFO) and logger.enabled(logs.ERROR)
+    logs.flush()
+
+    text, = read_logs(log_dir, "level")
+    assert text.splitlines()[0].endswith("WARNING >>> kept")
+
+def test_files_rotate_past_max_size(log_dir):
+    logger = Logger(log_ID="rotate", maxSize=0.0005)    # 500 bytes
+    for k in range(40):
+        logger.log("line {:03d} of padding padding padding", k)
+    logs.flush()
+
+    files = read_logs(log_dir, "rotate")
+    assert len(files) > 1
+    assert all(len(text) <= 500 for text in files)
+    lines = [line for text in files for line in text.splitlines()]
+    assert sorted(int(line.split("line ")[1][:3]) for line in lines) == list(range(40))
+
+def test_shutdown_writes_everything_and_logging_restarts(log_dir):
+    logger = Logger(log_ID="restart")
+    logger.log("before")
+    logs.shutdown()
+    assert read_logs(log_dir, "restart")[0].endswith("before\n")
+
+    logger.log("after")
+    logs.flush()
+    assert read_logs(log_dir, "restart")[0].endswith("after\n")
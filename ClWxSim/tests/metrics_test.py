@@ -0,0 +1,69 @@
+import json
+import urllib.request
+
+import numpy as np
+
+from ClWxSim.data.World import World
+from ClWxSim.run import main
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.sim.metrics import Metrics, array_bytes, format_report
+
+def test_report_of_a_running_sim(tmp_path):
+    wld = World("metrics", wld_grid_size=16)
+    sim = Controller(wld)
+    metrics = sim.monitor(str(tmp_path / "metrics.jsonl"), every=4)
+    assert metrics.report()["ticks_per_s"] is None
+    assert format_report(metrics.report()) == "Waiting for ticks"
+
+    sim.running = True
+    for k in range(10):
+        sim.tick()
+    report = metrics.report()
+    assert report["tick"] == 10
+    assert report["ticks_per_s"] > 0 and report["sim_rate"] > 0
+    assert report["ms_per_tick"] > 0 and report["ms_per_tick_p95"] > 0
+    assert report["world_bytes"] >= 12 * wld.air_pressure.nbytes
+    assert "ticks/s" in format_report(report)
+    sim.close()
+
+    lines = [json.loads(line) for line in open(tmp_path / "metrics.jsonl")]
+    assert [line["tick"] for line in lines] == [4, 8, 10]
+
+def test_ticks_before_a_restart_are_not_counted():
+    sim = Controller(World("metrics", wld_grid_size=8))
+    metrics = Metrics()
+    sim.observers.append(metrics)
+    sim.running = True
+    for k in range(5):
+        sim.tick()
+    sim.reset_clock()
+    sim.tick()
+    assert metrics.report()["ticks_per_s"] is None
+    sim.tick()
+    assert metrics.report()["tick"] == 2 and metrics.report()["ticks_per_s"] > 0
+
+def test_array_bytes_counts_shared_memory_once():
+    wld = World("metrics", wld_grid_size=8)
+    before = array_bytes(wld)
+    wld.extra = wld.air_pressure[1:-1]
+    assert array_bytes(wld) == before
+    wld.extra = np.zeros(100)
+    assert array_bytes(wld) == before + 800
+
+def test_metrics_are_served_over_http():
+    sim = Controller(World("metrics", wld_grid_size=8))
+    metrics = sim.monitor(port=0)
+    sim.running = True
+    sim.tick()
+    sim.tick()
+    port = metrics.server.server_address[1]
+    with urllib.request.urlopen("http://127.0.0.1:{}/".format(port), timeout=10) as response:
+        report = json.loads(response.read())
+    assert report["tick"] == 2 and report["ticks_per_s"] > 0
+    sim.close()
+    assert metrics.server is None
+
+def test_main_writes_metrics(tmp_path, capsys):
+    path = tmp_path / "metrics.jsonl"
+    assert main(["--size", "8", "--ticks", "6", "--sources", "none", "--metrics", str(path), "--metrics-every", "3"]) == 0
+    assert [json.loads(line)["tick"] for line in open(path)] == [3, 6]
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import ClWxSim.sim.fluid_solver as solver
+import ClWxSim.sim.tiles as tiling
+from ClWxSim.data.World import World
+from ClWxSim.run import add_test_sources
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.sim.ParallelController import ParallelController
+
+def make_world(N, boundary):
+    wld = World("parallel_controller_test World", wld_grid_size=N, boundary=boundary)
+    add_test_sources(wld)
+    wld.air_pressure[N//6:N//4, N//3:N//2] += 5.
+    return wld
+
+def run(sim, ticks=6):
+    sim.begin_pgf_tick = 2
+    sim.running = True
+    for k in range(ticks):
+        sim.tick()
+
+def test_tiles_match_single_process_exactly(monkeypatch):
+    monkeypatch.setattr(solver, "diffuse_solver", "lin_solve")
+    N = 24
+
+    for boundary in ("walls", "periodic"):
+        expected = make_world(N, boundary)
+        run(Controller(expected))
+
+        for count in (1, 3):
+            wld = make_world(N, boundary)
+            with ParallelController(wld, tiles=count) as sim:
+                run(sim)
+                assert sim.tiles == count
+
+            assert np.abs(wld.air_vel_u).max() > 0
+            for name in tiling.FIELDS:
+                np.testing.assert_array_equal(getattr(wld, name), getattr(expected, name), err_msg="{} {} {}".format(boundary, count, name))
+
+def test_world_keeps_its_data_after_close():
+    wld = make_world(16, "walls")
+    sim = ParallelController(wld, tiles=2)
+    run(sim, ticks=2)
+
+    shared = wld.air_pressure
+    sim.close()
+    assert wld.air_pressure is not shared
+    np.testing.assert_array_equal(wld.air_pressure, shared)
+
+    # World.clear_data replaces the arrays, the next tick moves them into shared memory again
+    wld = make_world(16, "walls")
+    with ParallelController(wld, tiles=2) as sim:
+        run(sim, ticks=1)
+        wld.clear_data()
+        sim.tick()
+        assert np.allclose(wld.air_pressure, wld.starting_pressure)
+
+def test_unsupported_worlds_are_rejected():
+    with pytest.raises(ValueError):
+        ParallelController(World("parallel_controller_test World", wld_grid_size=8, boundary="polar"))
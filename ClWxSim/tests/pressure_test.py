@@ -1,37 +1,47 @@
-from ClWxSim.sim.Pressure import Pressure as p
-from  ClWxSim.data.World import World as wld
-from ClWxSim.utils.logging import Logger
+import numpy as np
+
+import ClWxSim.sim.Pressure as p
+from ClWxSim.data.World import World
 
 tick_length = 1/25
-logger = Logger(log_name="pressure_test")
 
-logger.log("Starting test, creating a test world...")
+def make_world(N=5):
+    wld = World("pressure_test World", wld_grid_size=N, starting_pressure=0.0)
+    wld.air_pressure[1, 1] = 1.0
+    wld.air_pressure[N, N] = 1.0
+    return wld
 
-test_wld = wld("pressure_test World", grid_size=5, starting_pressure=0.0)
+def tick(wld):
+    p.tick(wld.wld_grid_size, wld.air_pressure, wld.air_pressure_prev, wld.air_vel_u, wld.air_vel_v, wld.diff, tick_length, bnd=wld.boundary, ws=wld.workspace)
 
-test_wld.air_pressure[0,0] = 1.0
+def test_still_air_conserves_pressure():
+    N = 5
+    wld = make_world(N)
+    total = wld.air_pressure[1:N+1, 1:N+1].sum()
 
-test_wld.air_pressure[4,4] = 1.0
+    for k in range(50):
+        tick(wld)
 
-logger.log("Test world successfully created")
-logger.log("Test world pressure:\n{}\n".format(test_wld.air_pressure))
+    assert np.isclose(wld.air_pressure[1:N+1, 1:N+1].sum(), total)
+    assert wld.air_pressure[1:N+1, 1:N+1].min() >= 0
 
-logger.log("Creating a Pressure sim utils instance...")
+def test_pressure_diffuses_out_of_peaks():
+    N = 5
+    wld = make_world(N)
+    wld.diff = 0.01
 
-prs = p()
+    tick(wld)
 
-logger.log("Simulating pressure changes over one tick...")
+    assert wld.air_pressure[1, 1] < 1.0
+    assert wld.air_pressure[1, 2] > 0.0
+    np.testing.assert_allclose(wld.air_pressure[1:N+1, 1:N+1], wld.air_pressure[N:0:-1, N:0:-1])
 
-test_wld = prs.tick(test_wld, tick_length)
+def test_uniform_pressure_is_unchanged_by_wind():
+    N = 8
+    wld = World("pressure_test World", wld_grid_size=N)
+    wld.air_vel_u[:] = 0.3
+    wld.air_vel_v[:] = -0.2
 
-logger.log("Test world pressure successfully simulated over 1 tick")
-logger.log("Test world pressure:\n{}\n".format(test_wld.air_pressure))
-# logger.log("Simulating pressure changes over 50 ticks...")
-#
-# for i in range(50):
-#     test_wld = prs.tick(test_wld, tick_length)
-#
-# logger.log("Test world pressure successfully simulated over 50 ticks")
-# logger.log("Test world pressure:\n{}".format(test_wld.air_pressure))
+    tick(wld)
 
-logger.log("ALL TESTS SUCCESSFULL")
+    np.testing.assert_allclose(wld.air_pressure, wld.starting_pressure)
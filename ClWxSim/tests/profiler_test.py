@@ -0,0 +1,51 @@
+import pytest
+
+import ClWxSim.sim.profiler as profiler
+from ClWxSim.tests.controller_test import make_sim
+
+def test_disabled_profiler_records_nothing():
+    wld, sim = make_sim(N=16)
+    for k in range(3):
+        sim.tick()
+
+    report = sim.profiler.report()
+    assert report["ticks"] == 0
+    assert report["phases"] == {} and report["kernels"] == {}
+
+def test_enabled_profiler_records_phases_and_kernels():
+    wld, sim = make_sim(N=16)
+    sim.begin_pgf_tick = 1
+    sim.profiler.enabled = True
+    for k in range(3):
+        sim.tick()
+
+    report = sim.profiler.report()
+    assert report["ticks"] == 3
+    for name in ("pressure_grad", "wind_pgf", "wind_diffuse", "wind_project", "wind_advect", "coriolis",
+                 "pressure_diffuse", "pressure_advect", "grad_history", "rounding"):
+        assert report["phases"][name]["total"] > 0, name
+    assert report["phases"]["wind_diffuse"]["calls"] == 3
+    assert report["phases"]["wind_project"]["calls"] == 6
+    assert report["kernels"]["diffuse"]["calls"] == 9
+    assert report["kernels"]["advect"]["calls"] == 9
+
+    # Phases do not overlap, so together they can not take longer than the whole tick
+    assert sum(t["last"] for t in report["phases"].values()) <= report["tick"]["last"]
+    assert profiler.active() is None
+
+    # Turning the profiler off stops recording, but keeps what was recorded
+    sim.profiler.enabled = False
+    sim.tick()
+    assert sim.profiler.report()["ticks"] == 3
+
+    sim.profiler.reset()
+    assert sim.profiler.report()["kernels"] == {}
+
+def test_profiler_released_after_failed_tick():
+    wld, sim = make_sim(N=16)
+    sim.profiler.enabled = True
+    wld.air_pressure = None
+
+    with pytest.raises(Exception):
+        sim.tick()
+    assert profiler.active() is None
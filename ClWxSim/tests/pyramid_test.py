@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from ClWxSim.data.World import World
+from ClWxSim.ui.pyramid import ViewPyramid, axes_level, centres, level_for, pool
+
+def test_pool_averages_blocks_including_smaller_edge_blocks():
+    arr = np.arange(7 * 5, dtype=float).reshape(7, 5)
+    pooled = pool(arr, 3)
+    assert pooled.shape == (3, 2)
+    for r in range(3):
+        for c in range(2):
+            assert pooled[r, c] == arr[3 * r:3 * r + 3, 3 * c:3 * c + 3].mean()
+    assert pool(arr, 1) is arr
+
+def test_levels_are_worked_out_only_when_asked_for():
+    wld = World("pyramid", wld_grid_size=62)
+    rng = np.random.default_rng(0)
+    wld.air_vel_u = rng.standard_normal(wld.air_vel_u.shape)
+    wld.air_vel_v = rng.standard_normal(wld.air_vel_v.shape)
+
+    pyramid = ViewPyramid(wld)
+    assert pyramid.get("air_vel_u") is wld.air_vel_u
+    U, V = pyramid.vectors("air_vel_u", "air_vel_v", 2)
+    assert set(pyramid._levels) == {("air_vel_u", 2), ("air_vel_v", 2)}
+
+    # Each arrow is the mean wind of its block, pooling a finer level again gives the same
+    np.testing.assert_allclose(U[3, 5], wld.air_vel_u[12:16, 20:24].mean())
+    np.testing.assert_allclose(V[3, 5], wld.air_vel_v[12:16, 20:24].mean())
+    assert pyramid.get("air_vel_u", 1).shape == (32, 32)
+    np.testing.assert_allclose(pyramid.get("air_vel_u", 3), pool(wld.air_vel_u, 8))
+
+    X, Y = pyramid.grid(2)
+    assert X.shape == U.shape and X[0, 5] == Y[5, 0] == 21.5
+
+    wld.air_vel_u = wld.air_vel_u + 1
+    pyramid.update(wld)
+    assert pyramid._levels == {}
+    np.testing.assert_allclose(pyramid.get("air_vel_u", 2), U + 1)
+
+def test_levels_match_the_view():
+    assert level_for(100, 400) == 0
+    assert level_for(1026, 400) == 1
+    assert level_for(1026, 32) == 5
+    assert level_for(1026, 32, at_most=True) == 6
+    assert list(centres(5, 2)) == [0.5, 2.5, 4.]
+
+    # Block centres sit in the middle of the blocks imshow draws over the extent
+    pyramid = ViewPyramid(SimpleNamespace(air_pressure=np.zeros((1026, 1026))))
+    assert pyramid.extent(1) == (-0.5, 1025.5, -0.5, 1025.5)
+    assert pyramid.coords(1)[0] == -0.5 + 1 and pyramid.coords(1)[-1] == 1025.5 - 1
+    assert pyramid.extent(2, origin="upper") == (-0.5, 1027.5, 1027.5, -0.5)
+    assert pyramid.coords(2)[0] == -0.5 + 2
+
+    # A 300 pixel wide graph, fully zoomed out and zoomed in on 200 cells
+    ax = SimpleNamespace(get_window_extent=lambda: SimpleNamespace(width=300.), get_xlim=lambda: (-0.5, 1025.5))
+    assert axes_level(ax, 1026) == 1
+    assert axes_level(ax, 1026, points=32, at_most=True) == 6
+    ax.get_xlim = lambda: (100., 300.)
+    assert axes_level(ax, 1026) == 0
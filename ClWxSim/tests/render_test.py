@@ -0,0 +1,57 @@
+import numpy as np
+
+from ClWxSim.ui.render import QUIVER_ZERO, ContourThrottle, contour_data, quiver_grid, quiver_uv, stride
+
+def test_quiver_matches_the_cell_by_cell_version():
+    rng = np.random.default_rng(0)
+    u = rng.standard_normal((10, 10))
+    v = rng.standard_normal((10, 10))
+    u[2, 3] = v[4, 5] = 0.
+
+    # What the data page used to draw, every cell with zeros swapped one at a time
+    expected_u, expected_v = u.copy(), v.copy()
+    for i in range(10):
+        for j in range(10):
+            if expected_u[i, j] == 0:
+                expected_u[i, j] = QUIVER_ZERO
+            if expected_v[i, j] == 0:
+                expected_v[i, j] = QUIVER_ZERO
+
+    U, V = quiver_uv(u, v)
+    np.testing.assert_array_equal(U, expected_u)
+    np.testing.assert_array_equal(V, expected_v)
+    assert u[2, 3] == 0.
+
+def test_arrows_are_subsampled_to_a_fixed_density():
+    assert stride(32, 32) == 1
+    assert stride(514, 32) == 17
+
+    step = stride(514, 32)
+    X, Y = quiver_grid(514, step)
+    U, V = quiver_uv(np.ones((514, 514)), np.ones((514, 514)), step)
+    assert X.shape == Y.shape == U.shape == V.shape
+    assert X.shape[0] <= 32
+    assert X[0, 1] - X[0, 0] == step and Y[1, 0] - Y[0, 0] == step
+    # Cell i is centred on i, where imshow draws it
+    assert X[0, 0] == Y[0, 0] == 0. and X[0, -1] == 510.
+
+    x, y, Z = contour_data(np.zeros((514, 514)), step)
+    assert Z.shape == (len(y), len(x))
+
+def test_contour_is_redrawn_only_after_a_big_enough_change():
+    throttle = ContourThrottle(threshold=0.25, min_frames=2, levels=16)
+    pressure = np.linspace(1000., 1016., 64).reshape(8, 8)   # 1 mbar between levels
+    assert throttle.due(pressure)
+    throttle.drawn(pressure)
+
+    small = pressure + 0.1
+    assert not throttle.due(small)
+    assert not throttle.due(small)      # Past min_frames but too small a change
+    big = pressure.copy()
+    big[3, 3] += 0.5
+    assert throttle.due(big)
+    throttle.drawn(big)
+
+    assert not throttle.due(big + 5.)   # Too soon after the last contour
+    assert throttle.due(big + 5.)
+    assert throttle.due(np.zeros((4, 4)))
@@ -0,0 +1,41 @@
+import subprocess
+import sys
+
+import numpy as np
+
+import ClWxSim.run as run
+
+def test_main_writes_outputs_on_schedule(tmp_path, capsys):
+    code = run.main(["--name", "run_test", "--size", "16", "--ticks", "10", "--output-dir", str(tmp_path), "--output-every", "4"])
+
+    assert code == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["run_test_10.npz", "run_test_4.npz", "run_test_8.npz"]
+    with np.load(tmp_path / "run_test_10.npz") as out:
+        assert int(out["tick"]) == 10
+        assert out["air_pressure"].shape == (18, 18)
+    assert "ticks/s" in capsys.readouterr().out
+
+def test_main_with_tiles(tmp_path, capsys):
+    code = run.main(["--name", "run_test", "--size", "16", "--ticks", "3", "--tiles", "2", "--output-dir", str(tmp_path)])
+
+    assert code == 0
+    with np.load(tmp_path / "run_test_3.npz") as out:
+        assert np.isfinite(out["air_vel_u"]).all()
+    assert "2 tiles" in capsys.readouterr().out
+
+def test_file_sources(tmp_path):
+    sources = tmp_path / "sources.npz"
+    added = np.zeros((10, 10))
+    added[4, 4] = 10.
+    np.savez(sources, air_pressure=added)
+
+    args = run.parse_args(["--size", "8", "--sources", str(sources)])
+    wld = run.World("run_test World", wld_grid_size=args.size)
+    run.add_file_sources(wld, args.sources)
+
+    assert wld.air_pressure[4, 4] == wld.starting_pressure + 10. * wld.dt
+
+def test_import_does_not_need_ui_modules():
+    code = "import sys, ClWxSim.run; print(sorted(m for m in ('tkinter', 'matplotlib', 'keyboard') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,106 @@
+import time
+
+import numpy as np
+import pytest
+
+from ClWxSim.sim.SimThread import SimThread
+from ClWxSim.tests.controller_test import make_sim
+
+def wait_for(condition, timeout=30.):
+    end = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < end, "timed out"
+        time.sleep(0.005)
+
+def test_snapshot_holds_the_last_tick_after_pause():
+    wld, sim = make_sim(N=16)
+    sim.running = False
+    runner = SimThread(sim, min_interval=0.)
+    with runner.snapshot() as snap:
+        assert snap is None
+
+    runner.start()
+    wait_for(lambda: sim.tickNum >= 5)
+    runner.pause()
+    assert not runner.running and not sim.running
+
+    with runner.snapshot() as snap:
+        assert snap.tick == sim.tickNum
+        for name in snap.fields:
+            np.testing.assert_array_equal(getattr(snap, name), getattr(wld, name))
+            assert getattr(snap, name) is not getattr(wld, name)
+
+    # Paused, so the World does not change
+    tick = sim.tickNum
+    time.sleep(0.05)
+    assert sim.tickNum == tick
+
+    runner.step()
+    with runner.snapshot() as snap:
+        assert snap.tick == tick + 1
+    runner.stop()
+
+def test_snapshot_is_not_swapped_while_held():
+    wld, sim = make_sim(N=16)
+    runner = SimThread(sim, min_interval=0.)
+    runner.start()
+    wait_for(lambda: sim.tickNum >= 2)
+
+    with runner.snapshot() as snap:
+        tick = snap.tick
+        pressure = snap.air_pressure.copy()
+        wait_for(lambda: sim.tickNum >= tick + 3)
+        assert snap.tick == tick
+        np.testing.assert_array_equal(snap.air_pressure, pressure)
+
+    wait_for(lambda: runner._front.tick > tick)
+    runner.stop()
+
+def test_every_capture_is_kept():
+    wld, sim = make_sim(N=16)
+    runner = SimThread(sim, capture_every=3, capture_queue_size=2)
+    runner.start()
+
+    ticks = []
+    while len(ticks) < 5:
+        snap = runner.captures.get(timeout=30.)
+        ticks.append(snap.tick)
+        # Ticking waits for the full queue, so it can't get far ahead of the captures taken off it
+        assert sim.tickNum < snap.tick + 3 * 4
+    runner.stop()
+
+    assert ticks == [3, 6, 9, 12, 15]
+
+def test_failed_tick_pauses_and_keeps_error():
+    wld, sim = make_sim(N=16)
+    runner = SimThread(sim)
+
+    def fail():
+        sim.tickNum += 1
+        raise RuntimeError("tick failed")
+
+    sim.tick = fail
+    runner.start()
+    wait_for(lambda: runner.error is not None)
+    assert not runner.running
+    assert str(runner.error) == "tick failed"
+    runner.stop()
+
+    with pytest.raises(RuntimeError):
+        runner.step()
+
+def test_error_is_set_once_paused_by_a_failed_tick():
+    wld, sim = make_sim(N=16)
+    runner = SimThread(sim)
+
+    def fail():
+        sim.tickNum += 1
+        raise RuntimeError("tick failed")
+
+    sim.tick = fail
+    # Holding the snapshot keeps the failed tick's publish waiting, the error must already be set by then
+    with runner.snapshot():
+        runner.start()
+        wait_for(lambda: not runner.running)
+        assert runner.error is not None
+    runner.stop()
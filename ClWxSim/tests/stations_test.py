@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from ClWxSim.data.Ensemble import Ensemble
+from ClWxSim.data.World import World
+from ClWxSim.data.stations import Stations, cell_at, read
+from ClWxSim.run import main
+from ClWxSim.sim.Controller import Controller
+
+def test_ring_buffers_hold_the_latest_samples():
+    wld = World("stations", wld_grid_size=16)
+    sim = Controller(wld)
+    stations = sim.probe({"a": (3, 5), "b": (10, 2)}, capacity=4)
+    assert stations.add("c", lat=0., lon=90.) == (12, 8)
+
+    expected = []
+    sim.running = True
+    for k in range(6):
+        sim.tick()
+        expected.append([wld.air_pressure[5, 3], wld.air_pressure[2, 10], wld.air_pressure[8, 12]])
+
+    assert stations.count == 6
+    np.testing.assert_array_equal(stations.ticks(), [3, 4, 5, 6])
+    np.testing.assert_array_equal(stations.series("air_pressure"), expected[2:])
+    np.testing.assert_array_equal(stations.series("air_vel_u", "b")[-1], wld.air_vel_u[2, 10])
+    assert stations.times()[-1] == sim.sim_time
+
+    with pytest.raises(RuntimeError):
+        stations.add("d", 1, 1)
+    sim.close()
+
+def test_stations_are_checked():
+    stations = Stations(World("stations", wld_grid_size=8))
+    with pytest.raises(ValueError):
+        stations.add("outside", 10, 1)
+    with pytest.raises(ValueError):
+        stations.add("half", x=1, lat=10.)
+    stations.add("a", 1, 1)
+    with pytest.raises(ValueError):
+        stations.add("a", 2, 2)
+    assert cell_at(8, -90., -180.) == (1, 1)
+    assert cell_at(8, 90., 180.) == (8, 8)
+
+def test_samples_are_written_in_bulk(tmp_path):
+    wld = World("stations", wld_grid_size=8)
+    stations = Stations(wld, fields=("air_pressure",), capacity=3, path=str(tmp_path / "stations"), dtype=np.float32)
+    stations.add("a", 2, 3)
+    stations.add("b", 4, 4)
+
+    for tick in range(1, 8):
+        wld.air_pressure[...] = tick
+        stations.sample(wld, tick, time=tick * 0.5)
+        # Samples are only written once the buffers are full
+        assert stations.written == 3 * ((tick - 1) // 3)
+    stations.close()
+
+    data = read(str(tmp_path / "stations"))
+    assert data["stations"] == ["a", "b"] and data["cells"] == [(2, 3), (4, 4)]
+    np.testing.assert_array_equal(data["tick"], np.arange(1, 8))
+    np.testing.assert_array_equal(data["time"], np.arange(1, 8) * 0.5)
+    assert data["air_pressure"].dtype == np.float32
+    np.testing.assert_array_equal(data["air_pressure"], np.repeat(np.arange(1, 8)[:, None], 2, axis=1))
+
+def test_ensemble_samples_keep_the_member_axis():
+    ens = Ensemble("stations", 3, wld_grid_size=8, starting_pressure=[1000., 1010., 1020.])
+    stations = Stations(ens, fields=("air_pressure",))
+    stations.add("a", 4, 4)
+    stations.sample(ens, 1)
+    np.testing.assert_array_equal(stations.series("air_pressure"), [[[1000.], [1010.], [1020.]]])
+
+def test_main_writes_stations(tmp_path, capsys):
+    path = tmp_path / "stations"
+    assert main(["--size", "8", "--ticks", "5", "--station", "a=2,3", "--station-latlon", "b=0,0", "--stations-dir", str(path)]) == 0
+    data = read(str(path))
+    assert data["cells"] == [(2, 3), (4, 4)]
+    np.testing.assert_array_equal(data["tick"], np.arange(1, 6))
+    assert data["air_vel_v"].shape == (5, 2)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+import ClWxSim.sim.fluid_solver as solver
+import ClWxSim.sim.strips as strips
+from ClWxSim.data.Ensemble import Ensemble
+from ClWxSim.data.World import World
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.sim.boundary import get_boundary
+from ClWxSim.sim.workspace import Workspace
+from ClWxSim.tests.controller_test import make_sim
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Split even small test grids, into uneven strips
+    monkeypatch.setattr(strips, "min_strip_rows", 3)
+    pool = strips.StripPool(threads=3)
+    yield pool
+    pool.close()
+
+def test_split_covers_every_row_once():
+    assert strips.split(10, 3, 1) == [(1, 4), (4, 7), (7, 11)]
+    assert strips.split(4, 4) == [(0, 1), (1, 2), (2, 3), (3, 4)]
+
+def test_pool_runs_every_strip_and_raises_errors(pool):
+    seen = []
+    pool.run(lambda start, stop: seen.append((start, stop)), 1, 21)
+    assert sorted(seen) == [(1, 7), (7, 14), (14, 21)]
+
+    def fail(start, stop):
+        if start > 1:
+            raise RuntimeError("strip {}".format(start))
+
+    with pytest.raises(RuntimeError):
+        pool.run(fail, 1, 21)
+
+def test_kernels_match_without_pool(pool):
+    N = 20
+    rng = np.random.default_rng(0)
+    for boundary in ("walls", "periodic", "polar"):
+        bnd = get_boundary(boundary)
+        for shape in ((N + 2, N + 2), (2, N + 2, N + 2)):
+            x0, u, v = rng.random(shape), rng.random(shape) - 0.5, rng.random(shape) - 0.5
+
+            results = []
+            for p in (None, pool):
+                ws = Workspace(N)
+                out = {}
+                out["lin_solve"] = np.zeros(shape)
+                solver.lin_solve(N, 1, out["lin_solve"], x0, 0.3, 2.2, bnd=bnd, ws=ws, pool=p)
+                out["smooth"] = np.zeros(shape)
+                solver.smooth(N, 2, out["smooth"], x0, 0.3, 2.2, sweeps=3, bnd=bnd, ws=ws, pool=p)
+                out["advect"] = np.zeros(shape)
+                solver.advect(N, 0, out["advect"], x0, u, v, 0.1, bnd=bnd, ws=ws, pool=p)
+
+                # Without a ws, as the kernels are called outside a Controller
+                wld = World("strips", wld_grid_size=N) if len(shape) == 2 else Ensemble("strips", shape[0], wld_grid_size=N)
+                out["coriolis_u"], out["coriolis_v"] = u.copy(), v.copy()
+                solver.coriolis(N, out["coriolis_u"], out["coriolis_v"], 0.1, wld.angular_vel, 3000., wld, bnd=bnd, pool=p)
+                results.append(out)
+
+            for name in results[0]:
+                np.testing.assert_array_equal(results[1][name], results[0][name], err_msg="{} {} {}".format(boundary, shape, name))
+
+def test_threaded_controller_matches_single_thread(pool, monkeypatch):
+    for diffuse_solver in solver.DIFFUSE_SOLVERS:
+        monkeypatch.setattr(solver, "diffuse_solver", diffuse_solver)
+
+        # Large enough for multigrid to smooth on three levels (72, 36, 18) before its direct solve
+        expected, sim = make_sim(N=72, boundary="periodic")
+        wld, threaded = make_sim(N=72, boundary="periodic")
+        threaded.pool = pool
+        for k in range(5):
+            sim.tick()
+            threaded.tick()
+
+        for name in ("air_vel_u", "air_vel_v", "air_pressure", "dbg_coriolis_u", "dbg_coriolis_v"):
+            np.testing.assert_array_equal(getattr(wld, name), getattr(expected, name), err_msg="{} {}".format(diffuse_solver, name))
+
+def test_controller_threads_can_be_changed():
+    sim = Controller(World("strips_test World", wld_grid_size=8), threads=2)
+    assert sim.threads == 2
+    sim.threads = 1
+    assert sim.threads == 1
+    sim.close()
+
+    with pytest.raises(ValueError):
+        sim.threads = 0
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+
+import ClWxSim.sim.Wind as w
+import ClWxSim.sweep as sweeper
+
+def test_combinations_in_grid_order():
+    assert sweeper.combinations({"diff": [1., 2.], "begin_pgf_tick": [3]}) == [{"diff": 1., "begin_pgf_tick": 3}, {"diff": 2., "begin_pgf_tick": 3}]
+    with pytest.raises(ValueError):
+        sweeper.combinations({"PGF_modifier": [1.]})
+
+def test_runs_match_in_process_runs_and_keep_globals():
+    grid = {"pgf_modifier": [0.5, 2.], "begin_pgf_tick": [1]}
+    results = sweeper.sweep(grid, ticks=4, processes=2, size=12)
+
+    assert w.PGF_modifier == 1.0
+    assert [r["status"] for r in results] == ["ok", "ok"]
+    for params, result in zip(sweeper.combinations(grid), results):
+        assert result["params"] == params
+        expected = sweeper.run_one(params, 4, size=12)
+        for name, field in expected["fields"].items():
+            np.testing.assert_array_equal(result["fields"][name], field)
+
+    assert not np.array_equal(results[0]["fields"]["air_vel_u"], results[1]["fields"]["air_vel_u"])
+
+def flaky(params, ticks, **options):
+    # Module level, so worker processes can import it however they are started
+    if params["diff"] == 2.:
+        os._exit(3)
+    if params["diff"] == 3.:
+        raise RuntimeError("bad run")
+    return sweeper.run_one(params, ticks, **options)
+
+def test_crashed_and_failed_runs_keep_the_others(tmp_path):
+    seen = []
+    results = sweeper.sweep({"diff": [1., 2., 3., 4.]}, ticks=2, processes=2, on_result=lambda index, result: seen.append(index), runner=flaky, size=8)
+
+    assert sorted(seen) == [0, 1, 2, 3]
+    assert [r["status"] for r in results] == ["ok", "crashed", "error", "ok"]
+    assert "code 3" in results[1]["error"]
+    assert "bad run" in results[2]["error"]
+
+    path = tmp_path / "sweep.npz"
+    sweeper.save_results(path, results[:3] + [None])
+    with np.load(path) as table:
+        np.testing.assert_array_equal(table["diff"], [1., 2., 3., np.nan])
+        assert list(table["status"]) == ["ok", "crashed", "error", "not run"]
+        assert table["air_pressure"].shape == (4, 10, 10)
+        assert np.isnan(table["air_pressure"][1]).all() and not np.isnan(table["air_pressure"][0]).any()
+        assert table["max_wind"][0] > 0 and np.isnan(table["max_wind"][2])
+
+def test_main_writes_results(tmp_path, capsys):
+    path = tmp_path / "out.npz"
+    assert sweeper.main(["--param", "angular-vel=0.00007,0.0001", "--size", "8", "--ticks", "2", "--processes", "2", "--output", str(path)]) == 0
+    with np.load(path) as table:
+        np.testing.assert_array_equal(table["angular_vel"], [0.00007, 0.0001])
+    assert "Wrote 2 runs" in capsys.readouterr().out
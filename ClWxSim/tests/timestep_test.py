@@ -0,0 +1,77 @@
+import numpy as np
+
+import ClWxSim.sim.timestep as timestep
+from ClWxSim.data.Ensemble import Ensemble
+from ClWxSim.sim.Controller import Controller
+from ClWxSim.tests.controller_test import make_sim
+
+def test_stable_dt_limits():
+    N = 10
+    u = np.zeros((N + 2, N + 2))
+    v = np.zeros((N + 2, N + 2))
+
+    # Calm, only diffusion limits the step
+    assert timestep.stable_dt(N, u, v, 0.001, 0.002) == timestep.diffusion_number / (0.002 * N * N)
+    assert timestep.stable_dt(N, u, v, 0., 0.) == np.inf
+
+    # Boundary cells are not counted
+    u[0, 3] = 100.
+    v[4, 5] = -2.
+    assert timestep.stable_dt(N, u, v, 0., 0.) == timestep.cfl / (2. * N)
+    assert timestep.stable_dt(N, u, v, 0., 0., speed_scale=4.) == timestep.cfl / (8. * N)
+
+    # One per member, shaped like Ensemble parameters
+    batch = np.zeros((2, N + 2, N + 2))
+    batch[1, 2, 2] = 1.
+    np.testing.assert_array_equal(timestep.stable_dt(N, batch, batch, 0., 0.), np.reshape([np.inf, timestep.cfl / N], (2, 1, 1)))
+    np.testing.assert_array_equal(timestep.stable_dt(N, batch, batch, np.full((2, 1, 1), 0.001), 0.), np.reshape([timestep.diffusion_number / (0.001 * N * N), timestep.cfl / N], (2, 1, 1)))
+
+def test_plan_steps_sub_steps_or_enlarges():
+    assert timestep.plan_steps(0.1, 0.1, 10.) == (1, 0.1)
+    assert timestep.plan_steps(0.1, np.inf, 10.) == (1, 0.1 * 8)
+    assert timestep.plan_steps(0.1, 0.3, 10.) == (1, 0.1 * 2)
+    assert timestep.plan_steps(0.1, 0.03, 10.) == (4, 0.1 / 4)
+    assert timestep.plan_steps(0.1, 0.02, 10.) == (8, 0.1 / 8)
+
+    # Members share the number of steps, and keep their own dts
+    steps, dt = timestep.plan_steps(np.array([0.1, 0.2]), np.array([0.05, 1.]), 10.)
+    assert steps == 2
+    np.testing.assert_array_equal(dt, [0.05, 0.1])
+
+def test_fixed_dt_counts_simulated_time():
+    wld, sim = make_sim(N=16)
+    for k in range(3):
+        sim.tick()
+    assert sim.last_steps == 1 and sim.last_dt == wld.dt
+    assert np.isclose(sim.sim_time, 3 * wld.dt)
+    assert sim.sim_rate > 0
+
+    sim.reset_clock()
+    assert sim.tickNum == 0 and sim.sim_time == 0. and sim.sim_rate == 0.
+
+def test_adaptive_dt_sub_steps_strong_wind_and_enlarges_calm_ticks():
+    N = 16
+    wld, sim = make_sim(N=N)
+    sim.adaptive_dt = True
+    sim.begin_pgf_tick = 100
+
+    # Calm, one long step
+    sim.tick()
+    assert sim.last_steps == 1 and sim.last_dt > wld.dt
+
+    # A wind that would cross several cells in one World.dt
+    wld.air_vel_u[1:N + 1, 1:N + 1] = 4. / (wld.dt * N)
+    time = sim.sim_time
+    sim.tick()
+    assert sim.last_steps >= 8
+    assert sim.last_dt * N * 4. / (wld.dt * N) <= timestep.cfl
+    assert np.isclose(sim.sim_time - time, wld.dt)
+    assert np.isfinite(wld.air_pressure).all()
+
+def test_adaptive_dt_ensemble():
+    ens = Ensemble("timestep_test Ensemble", 2, wld_grid_size=16, dt=[0.1, 0.2])
+    sim = Controller(ens, adaptive_dt=True)
+    sim.running = True
+    sim.max_dt_scale = 3.
+    sim.tick()
+    np.testing.assert_allclose(sim.sim_time.ravel(), [0.2, 0.4])
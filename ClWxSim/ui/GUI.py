@@ -36,6 +36,7 @@ class ClWxSimGUI(tk.Tk):
         self.info_ribbon_frame.grid_columnconfigure(0, weight=1)
         self.info_ribbon_frame.grid_columnconfigure(1, weight=1)
         self.info_ribbon_frame.grid_columnconfigure(2, weight=1)
+        self.info_ribbon_frame.grid_columnconfigure(3, weight=1)
         self.info_ribbon_frame.grid_rowconfigure(0, weight=1)
 
         self.info_ribbon_tick = tk.Label(self.info_ribbon_frame, text="Current Tick: Null", anchor=tk.W)
@@ -47,6 +48,9 @@ class ClWxSimGUI(tk.Tk):
         self.info_ribbon_status = tk.Label(self.info_ribbon_frame, text="No Sim Controller", fg="red", anchor=tk.W)
         self.info_ribbon_status.grid(row=0, column=2)
 
+        self.info_ribbon_metrics = tk.Label(self.info_ribbon_frame, text="", anchor=tk.W)
+        self.info_ribbon_metrics.grid(row=0, column=3)
+
         # Frames setup
         page_container = tk.Frame(main_container)
         page_container.grid(row=0, column=0, sticky="nsew")
@@ -104,6 +108,8 @@ class ClWxSimGUI(tk.Tk):
 
 # Commands
     def onExit(self):
+        # Finish saving stored images before the worker processes go
+        self.frames[SimControlPage].close_exporter()
         self.quit()
         self.destroy()
 
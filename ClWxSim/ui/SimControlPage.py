@@ -1,11 +1,17 @@
-from ClWxSim.data.world import World
-from ClWxSim.sim.controller import Controller as SimControl
+from ClWxSim.data.World import World
+from ClWxSim.sim.Controller import Controller as SimControl
+from ClWxSim.sim.SimThread import SimThread
+from ClWxSim.sim.metrics import format_report
+from ClWxSim.ui.export import FrameExporter
 
+from contextlib import nullcontext
 import tkinter as tk
 from tkinter import ttk
 
 LARGE_FONT= ("Verdana", 12)
 
+POLL_MS = 50    # Time between checks of the sim thread, for the info ribbon and stored images
+
 class SimControlPage(tk.Frame):
 
     def __init__(self, parent, controller):
@@ -18,6 +24,10 @@ class SimControlPage(tk.Frame):
         # Create world and sim vars
         self.wld = World(world_name="default-world", wld_grid_size=100)
         self.sim = None
+        self.sim_thread = None  # Runs the sim's ticks off the Tk thread, see ClWxSim.sim.SimThread
+        self.exporter = None    # Renders and saves stored images in worker processes, see ClWxSim.ui.export
+        self.metrics = None     # Live tick rate and memory figures for the info ribbon, see ClWxSim.sim.metrics
+        self.polling = False
 
         # Create Parts:
             # Heading
@@ -104,44 +114,105 @@ class SimControlPage(tk.Frame):
         # Update info ribbon
         self.cont.info_ribbon_wld.config(text="Current World: {}".format(self.wld.world_name))
 
-    def sim_tick_loop(self):
-        if self.sim != None:
-            if self.sim.running:
-            # Run tick calculations
+    def world_lock(self):
+        """returns a context manager to hold while changing the World, so no tick runs at the same time"""
+        if self.sim_thread != None:
+            return self.sim_thread.lock
+        return nullcontext()
+
+    def update_capture_settings(self):
+        # Ticks are captured by the sim thread, and handed to the exporter by poll_sim
+        try:
+            store_on_tick = int(self.img_setting_fields[0].get())
+        except Exception as e:
+            print("Error reading image settings, was the given time between ticks an integer? [{}]".format(e))
+            store_on_tick = 0
+
+        if self.store_imgs.get() and store_on_tick > 0:
+            path = self.img_setting_fields[1].get() + self.wld.world_name + "_{tick}.png"
+            if self.exporter == None or self.exporter.path != path:
+                self.close_exporter()
                 try:
-                    self.sim.tick()
-
-                    # Store img
-                    try:
-                        store_on_tick = int(self.img_setting_fields[0].get())
-                        if self.store_imgs.get() and self.sim.tickNum % store_on_tick == 0:
-                            self.save_fig_img()
-                    except Exception as e:
-                        print("Error saveing image, was the given time between ticks an integer and the image address correct? [{}]".format(e))
-
-                    # Update info ribbon
-                    self.cont.info_ribbon_tick.config(text="Current Tick: {}".format(self.sim.tickNum))
-
+                    self.exporter = FrameExporter(path)
                 except Exception as e:
-                    print("Error during tick {}: [{}]".format(self.sim.tickNum, e))
-                    self.sim.running = False
+                    print("Error preparing to store images, was the image address correct? [{}]".format(e))
+                    store_on_tick = 0
+
+        if self.store_imgs.get() and store_on_tick > 0:
+            self.sim_thread.capture_every = store_on_tick
+        else:
+            self.sim_thread.capture_every = 0
+
+    def close_exporter(self):
+        # Waits for the images being stored to be saved
+        if self.exporter != None:
+            self.exporter.close()
+            self.exporter = None
+
+    def poll_sim(self):
+        self.polling = False
+        if self.sim_thread != None:
+            # Store imgs of captured ticks, captures are left queued (so ticking waits) while the exporter is busy
+            while not self.sim_thread.captures.empty() and self.exporter != None and self.exporter.ready():
+                snapshot = self.sim_thread.captures.get()
+                self.exporter.submit(snapshot, snapshot.tick)
+
+            if self.exporter != None and self.exporter.error != None:
+                print("Error saveing image, was the image address correct? [{}]".format(self.exporter.error))
+                self.exporter.error = None
 
-                # check running again, possible error above
-                if self.sim.running:
-                    self.cont.after(10, self.sim_tick_loop)
+            # Update info ribbon
+            self.cont.info_ribbon_tick.config(text="Current Tick: {}".format(self.sim.tickNum))
+            self.cont.info_ribbon_metrics.config(text=format_report(self.metrics.report()))
+
+            # The sim thread pauses itself if a tick fails
+            if self.sim_thread.error != None:
+                print("Error during tick {}: [{}]".format(self.sim.tickNum, self.sim_thread.error))
+                self.sim_thread.error = None
+                self.show_paused()
+
+            if self.sim_thread.running or not self.sim_thread.captures.empty() or (self.exporter != None and self.exporter.in_flight):
+                self.schedule_poll()
+
+    def schedule_poll(self):
+        if not self.polling:
+            self.polling = True
+            self.cont.after(POLL_MS, self.poll_sim)
+
+    def run_sim_thread(self):
+        # Start (or resume) ticking on the sim thread, the info ribbon and graphs follow it at their own rates
+        self.update_capture_settings()
+        self.metrics.reset()    # So time spent paused is not counted
+        self.sim_thread.start()
+        self.schedule_poll()
+        if self.dataPage_ref != None:
+            self.dataPage_ref.refresh_loop()
+
+    def show_paused(self):
+        # Update info ribbon
+        self.cont.info_ribbon_status.config(text="Sim Paused", fg="yellow")
 
-    def save_fig_img(self):
-        self.dataPage_ref.refresh()
-        self.cont.fig_ref.savefig(self.img_setting_fields[1].get() + "{}_{}.png".format(self.wld.world_name, self.sim.tickNum))
+        # Lock/Unlock buttons
+        self.pau_res_sim_btn.config(text="Resume Sim")
+        self.clear_world_btn.config(state='normal')
+        self.clear_sim_btn.config(state='normal')
 
 # Commands
     def clear_sim(self):
-        # Clear sim reference
+        # Stop the sim thread, then clear sim reference
+        if self.sim_thread != None:
+            self.sim_thread.stop()
+            self.sim.close()
+        self.close_exporter()
         self.sim = None
+        self.metrics = None
+        self.sim_thread = None
+        self.polling = False
 
         # Update info ribbon
         self.cont.info_ribbon_status.config(text="No Sim Controller", fg="red")
         self.cont.info_ribbon_tick.config(text="Current Tick: Null")
+        self.cont.info_ribbon_metrics.config(text="")
 
         # Unlock setup sim button, lock clear sim button
         self.clear_sim_btn.config(state='disabled')
@@ -161,6 +232,8 @@ class SimControlPage(tk.Frame):
         if self.sim == None:
             # Create a new sim class controller
             self.sim = SimControl(self.wld)
+            self.metrics = self.sim.monitor()
+            self.sim_thread = SimThread(self.sim)
 
             # Update info ribbon
             self.cont.info_ribbon_status.config(text="Sim Ready", fg="yellow")
@@ -192,40 +265,30 @@ class SimControlPage(tk.Frame):
 
             self.pau_res_sim_btn.config(text="Pause Sim")
 
-            # Start repeating sim tick loop after 10ms
-            self.sim.running = True
-
-            if self.store_imgs:
-                loop_every = 50
-            else:
-                loop_every = 20
-            self.cont.after(loop_every, self.sim_tick_loop)
+            # Start ticking on the sim thread
+            self.run_sim_thread()
 
     def next_tick(self):
-        if self.sim != None:
+        if self.sim != None and not self.sim_thread.running:
             self.cont.info_ribbon_status.config(text="Sim Running", fg="green")
-            self.sim.running = True
-            self.sim.tick()
+            self.update_capture_settings()
+            try:
+                self.sim_thread.step()
+            except Exception as e:
+                print("Error during tick {}: [{}]".format(self.sim.tickNum, e))
             self.cont.info_ribbon_tick.config(text="Current Tick: {}".format(self.sim.tickNum))
-            self.sim.running = False
             self.cont.info_ribbon_status.config(text="Sim Paused", fg="yellow")
+            self.poll_sim()
 
     def pause_resume_sim(self):
         # Check if sim.running, if true pause, if false resume. Update button text
         if self.sim != None:
-            if self.sim.running:
-                # Stop running sim
-                self.sim.running = False
-
-                # Update info ribbon
-                self.cont.info_ribbon_status.config(text="Sim Paused", fg="yellow")
+            if self.sim_thread.running:
+                # Stop running sim, once the current tick is finished
+                self.sim_thread.pause()
+                self.show_paused()
 
-                # Lock/Unlock buttons
-                self.pau_res_sim_btn.config(text="Resume Sim")
-                self.clear_world_btn.config(state='normal')
-                self.clear_sim_btn.config(state='normal')
-
-            elif not self.sim.running:
+            else:
                 # Lock/Unlock buttons
                 self.pau_res_sim_btn.config(text="Pause Sim")
                 self.clear_world_btn.config(state='disabled')
@@ -235,18 +298,13 @@ class SimControlPage(tk.Frame):
                 self.cont.info_ribbon_status.config(text="Sim Running", fg="green")
 
                 # Start running sim
-                self.sim.running = True
-
-                if self.store_imgs:
-                    loop_every = 50
-                else:
-                    loop_every = 20
-                self.cont.after(loop_every, self.sim_tick_loop)
+                self.run_sim_thread()
 
     def clear_wld(self):
-        self.sim.tickNum = 0
+        with self.world_lock():
+            self.sim.reset_clock()
+            self.wld.clear_data()
         self.cont.info_ribbon_tick.config(text="Current Tick: {}".format(self.sim.tickNum))
-        self.wld.clear_data()
 
     def update_wld_settings(self):
         if self.sim == None:    # Only update world settings if the sim is not prepared
@@ -271,7 +329,7 @@ class SimControlPage(tk.Frame):
             if text != "":
                 self.wld.world_name = text
             else:
-                self.cont.logger.log("Error setting world Name: [No text entered]")
+                self.cont.logger.error("Error setting world Name: [No text entered]")
                 failed = True
                 self.setting_fields[0].configure({"background": "red"})
 
@@ -282,12 +340,12 @@ class SimControlPage(tk.Frame):
                     self.wld.wld_grid_size = int(text)
                     self.wld.grid_size = int(text)+2
                 else:
-                    self.cont.logger.log("Error setting world Array Size: [Value less than 1]")
+                    self.cont.logger.error("Error setting world Array Size: [Value less than 1]")
                     failed = True
                     self.setting_fields[1].configure({"background": "red"})
 
             except Exception as e:
-                self.cont.logger.log("Error setting world Array Size: [{}]".format(e))
+                self.cont.logger.error("Error setting world Array Size: [{}]", e)
                 failed = True
                 self.setting_fields[1].configure({"background": "red"})
 
@@ -297,12 +355,12 @@ class SimControlPage(tk.Frame):
                 if float(text) >= 0:
                     self.wld.starting_pressure = float(text)
                 else:
-                    self.cont.logger.log("Error setting world Starting Pressure: [Value less than 0]")
+                    self.cont.logger.error("Error setting world Starting Pressure: [Value less than 0]")
                     failed = True
                     self.setting_fields[2].configure({"background": "red"})
 
             except Exception as e:
-                self.cont.logger.log("Error setting world Starting Pressure: [{}]".format(e))
+                self.cont.logger.error("Error setting world Starting Pressure: [{}]", e)
                 failed = True
                 self.setting_fields[2].configure({"background": "red"})
 
@@ -312,12 +370,12 @@ class SimControlPage(tk.Frame):
                 if float(text) > 0:
                     self.wld.angular_vel = float(text)
                 else:
-                    self.cont.logger.log("Error setting world Angular Velocity: [Value less than 1]")
+                    self.cont.logger.error("Error setting world Angular Velocity: [Value less than 1]")
                     failed = True
                     self.setting_fields[3].configure({"background": "red"})
 
             except Exception as e:
-                self.cont.logger.log("Error setting world Angular Velocity: [{}]".format(e))
+                self.cont.logger.error("Error setting world Angular Velocity: [{}]", e)
                 failed = True
                 self.setting_fields[3].configure({"background": "red"})
 
@@ -5,15 +5,22 @@ import matplotlib
 matplotlib.use("TkAgg")
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg#, NavigationToolbar2TkAgg
 import matplotlib.pyplot as plt
-from matplotlib.colors import DivergingNorm
-
-import numpy as np
+try:
+    from matplotlib.colors import TwoSlopeNorm
+except ImportError:
+    # Matplotlib before 3.2
+    from matplotlib.colors import DivergingNorm as TwoSlopeNorm
 
 # Pages
 from ClWxSim.ui.SimControlPage import SimControlPage
 
+from ClWxSim.ui.pyramid import ViewPyramid, axes_level
+from ClWxSim.ui.render import CONTOUR_POINTS, QUIVER_ARROWS, ContourThrottle, quiver_uv
+
 LARGE_FONT= ("Verdana", 12)
 
+FRAME_MS = 100  # Time between graph refreshes while the sim is running
+
 class SimDataPage(tk.Frame):
 
     quiver_w_scale = 1000000000.
@@ -34,6 +41,9 @@ class SimDataPage(tk.Frame):
         self.fig, self.axar = plt.subplots(1,1)
 
         self.wld_ref = None
+        self.ctrl_ref = None
+        self.shown_tick = None
+        self.refreshing = False
 
             # Refresh Button
         refresh_btn = ttk.Button(self, text="Refresh Graphs", command=self.refresh)
@@ -44,13 +54,13 @@ class SimDataPage(tk.Frame):
         cori_style.configure("tur.TCheckbutton", foreground="turquoise")
 
         self.show_coriolis = tk.IntVar()
-        show_coriolis_chkbox = ttk.Checkbutton(self, text="View Coriolis Effect", variable=self.show_coriolis)
+        show_coriolis_chkbox = ttk.Checkbutton(self, text="View Coriolis Effect", variable=self.show_coriolis, command=self.toggle_layer)
         show_coriolis_chkbox.configure(style="tur.TCheckbutton")
         show_coriolis_chkbox.pack()
 
                 # Show Wind Tickbox
         self.show_wind = tk.IntVar()
-        show_wind_chkbox = ttk.Checkbutton(self, text="View Wind Speed", variable=self.show_wind)
+        show_wind_chkbox = ttk.Checkbutton(self, text="View Wind Speed", variable=self.show_wind, command=self.toggle_layer)
         show_wind_chkbox.pack()
 
                 # Show PGF Tickbox
@@ -58,13 +68,14 @@ class SimDataPage(tk.Frame):
         pgf_style.configure("red.TCheckbutton", foreground="red")
 
         self.show_pgf = tk.IntVar()
-        show_pgf_chkbox = ttk.Checkbutton(self, text="View Pressure Gradient Force", variable=self.show_pgf)
+        show_pgf_chkbox = ttk.Checkbutton(self, text="View Pressure Gradient Force", variable=self.show_pgf, command=self.toggle_layer)
         show_pgf_chkbox.configure(style="red.TCheckbutton")
         show_pgf_chkbox.pack()
 
     def onFirstShow(self):
         # Create graph widget
-        self.wld_ref = self.cont.frames[SimControlPage].wld
+        self.ctrl_ref = self.cont.frames[SimControlPage]
+        self.wld_ref = self.ctrl_ref.wld
 
         self.createGraph()
         plt.close(self.fig)
@@ -80,146 +91,129 @@ class SimDataPage(tk.Frame):
         self.axar.xaxis.set_ticks([])
         self.axar.yaxis.set_ticks([])
 
+        # Fields are drawn from a pyramid of downsampled copies, at the resolution the graph can show, see ClWxSim.ui.pyramid
+        self.pyramid = ViewPyramid(self.wld_ref)
+
         # Contour
-        X, Y = np.mgrid[0:self.wld_ref.wld_grid_size + 2, 0:self.wld_ref.wld_grid_size + 2]
-        X[0:self.wld_ref.wld_grid_size + 2] = X[0:self.wld_ref.wld_grid_size + 2] + 0.5
-        Y[0:self.wld_ref.wld_grid_size + 2] = Y[0:self.wld_ref.wld_grid_size + 2] + 0.5
-        self.graph_contour = self.axar.contour(X, Y, np.transpose(self.wld_ref.air_pressure), 16, colors='black', alpha=0.5)
+        self.contour_throttle = ContourThrottle()
+        self.graph_contour = None
+        self.draw_contour()
         plt.clabel(self.graph_contour, inline=True, fontsize=8)
 
         # Background Img
-        self.graph_img = self.axar.imshow(self.wld_ref.air_pressure, cmap='coolwarm', alpha=0.5, origin='lower', norm=DivergingNorm(self.wld_ref.starting_pressure))
+        level = self.view_level()
+        pressure = self.pyramid.get("air_pressure", level)
+        self.graph_img = self.axar.imshow(pressure, extent=self.pyramid.extent(level), cmap='coolwarm', alpha=0.5, origin='lower', norm=TwoSlopeNorm(self.wld_ref.starting_pressure))
         plt.colorbar(self.graph_img, ax=self.axar)
-        self.graph_img.set_clim([self.wld_ref.air_pressure.min(), self.wld_ref.air_pressure.max()])
-
-        # Wind quiver (remove zero vals and scale down)
-        data_u = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
-        data_v = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
-
-        data_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.air_vel_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-        data_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.air_vel_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-
-        for i in range(self.wld_ref.grid_size):
-            for j in range(self.wld_ref.grid_size):
-                if data_u[i, j] == 0:
-                    data_u[i, j] = 0.0000000000000000000000000000001
-
-                if data_v[i, j] == 0:
-                    data_v[i, j] = 0.0000000000000000000000000000001
-
-        self.graph_w_arrows = self.axar.quiver(X, Y, np.transpose(data_u), np.transpose(data_v), alpha=0.5) #scale=.1, angles='xy', scale_units='xy',
+        self.graph_img.set_clim([pressure.min(), pressure.max()])
 
-        # Coriolis quiver (remove zero vals and scale down)
-        data_u = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
-        data_v = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
+        # Quivers, each arrow the mean of a block of cells
+        self.quiver_shape = None
+        self.create_quivers()
 
-        data_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.dbg_coriolis_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-        data_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.dbg_coriolis_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
+    def view_level(self, points=None, at_most=False):
+        # Pyramid level matching the graph's size in pixels (or points blocks along a side, if fewer), see ClWxSim.ui.pyramid.axes_level
+        return axes_level(self.axar, self.pyramid.n, points, at_most)
 
-        for i in range(self.wld_ref.grid_size):
-            for j in range(self.wld_ref.grid_size):
-                if data_u[i, j] == 0:
-                    data_u[i, j] = 0.0000000000000000000000000000001
+    def create_quivers(self):
+        # (Re)create the arrows for the pyramid's grid size, the number of arrows is fixed once a quiver is made
+        if self.quiver_shape != None:
+            for quiver in (self.graph_w_arrows, self.graph_c_arrows, self.graph_g_arrows):
+                quiver.remove()
 
-                if data_v[i, j] == 0:
-                    data_v[i, j] = 0.0000000000000000000000000000001
+        self.quiver_level = self.view_level(QUIVER_ARROWS, at_most=True)
+        self.quiver_shape = (self.pyramid.n, self.quiver_level)
+        X, Y = self.pyramid.grid(self.quiver_level)
 
-        self.graph_c_arrows = self.axar.quiver(X, Y, np.transpose(data_u), np.transpose(data_v), color="c", angles='xy', scale_units='xy', scale=.1, alpha=0.5)
+        # Wind quiver
+        U, V = quiver_uv(*self.pyramid.vectors("air_vel_u", "air_vel_v", self.quiver_level))
+        self.graph_w_arrows = self.axar.quiver(X, Y, U, V, alpha=0.5) #scale=.1, angles='xy', scale_units='xy',
 
-        # PGF quiver (remove zero vals and scale down)
-        data_u = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
-        data_v = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
+        # Coriolis quiver
+        U, V = quiver_uv(*self.pyramid.vectors("dbg_coriolis_u", "dbg_coriolis_v", self.quiver_level))
+        self.graph_c_arrows = self.axar.quiver(X, Y, U, V, color="c", angles='xy', scale_units='xy', scale=.1, alpha=0.5)
 
-        data_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.air_pressure_grad_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-        data_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.air_pressure_grad_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
+        # PGF quiver
+        U, V = quiver_uv(*self.pyramid.vectors("air_pressure_grad_u", "air_pressure_grad_v", self.quiver_level))
+        self.graph_g_arrows = self.axar.quiver(X, Y, U, V, color="r", angles='xy', scale_units='xy', scale=.25, alpha=0.5)
 
-        for i in range(self.wld_ref.grid_size):
-            for j in range(self.wld_ref.grid_size):
-                if data_u[i, j] == 0:
-                    data_u[i, j] = 0.0000000000000000000000000000001
-
-                if data_v[i, j] == 0:
-                    data_v[i, j] = 0.0000000000000000000000000000001
-
-        self.graph_g_arrows = self.axar.quiver(X, Y, np.transpose(data_u), np.transpose(data_v), color="r", angles='xy', scale_units='xy', scale=.25, alpha=0.5)
-
-
-# Commands
-    def refresh(self):
+    def draw_contour(self):
         # Replace old contour with updated contour
-        for tp in self.graph_contour.collections:
-            tp.remove()
-
-        X, Y = np.mgrid[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-        X[0:self.wld_ref.grid_size] = X[0:self.wld_ref.grid_size] + 0.5
-        Y[0:self.wld_ref.grid_size] = Y[0:self.wld_ref.grid_size] + 0.5
-        self.graph_contour = self.axar.contour(X, Y, np.transpose(self.wld_ref.air_pressure), 16, colors='black', alpha=0.5)
-
-        # Update img
-        self.graph_img.set_array(self.wld_ref.air_pressure)
-        self.graph_img.set_clim([self.wld_ref.air_pressure.min(), self.wld_ref.air_pressure.max()])
+        if self.graph_contour != None:
+            for tp in self.graph_contour.collections:
+                tp.remove()
+
+        level = self.view_level(CONTOUR_POINTS)
+        pressure = self.pyramid.get("air_pressure", level)
+        coords = self.pyramid.coords(level)
+        self.graph_contour = self.axar.contour(coords, coords, pressure, self.contour_throttle.levels, colors='black', alpha=0.5)
+        self.contour_throttle.drawn(pressure)
+
+    def update_quiver(self, quiver, show, u, v):
+        # Hidden quivers are left as they are, they are brought up to date when shown again
+        quiver.set_visible(show)
+        if show:
+            quiver.set_UVC(*quiver_uv(*self.pyramid.vectors(u, v, self.quiver_level)))
+
+    def refresh_loop(self):
+        # Redraw the latest snapshot every FRAME_MS while the sim thread is running, whatever its tick rate
+        if self.refreshing or self.wld_ref == None:
+            return
+
+        sim_thread = self.ctrl_ref.sim_thread
+        if sim_thread == None:
+            return
+
+        with sim_thread.snapshot() as snapshot:
+            if snapshot != None and snapshot.tick != self.shown_tick:
+                self.refresh(snapshot, throttle=True)
+
+        if sim_thread.running:
+            self.refreshing = True
+            self.after(FRAME_MS, self.end_refresh_wait)
+
+    def end_refresh_wait(self):
+        self.refreshing = False
+        self.refresh_loop()
 
-        # Update wind quiver (remove zero vals and scale down)
-        data_u = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
-        data_v = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
-
-        data_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.air_vel_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-        data_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.air_vel_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-
-        for i in range(self.wld_ref.grid_size):
-            for j in range(self.wld_ref.grid_size):
-                if data_u[i, j] == 0:
-                    data_u[i, j] = 0.0000000000000000000000000000001
-
-                if data_v[i, j] == 0:
-                    data_v[i, j] = 0.0000000000000000000000000000001
-
-        if self.show_wind.get():
-            self.graph_w_arrows.set_visible(True)
-        else:
-            self.graph_w_arrows.set_visible(False)
-
-        self.graph_w_arrows.set_UVC(np.transpose(data_u), np.transpose(data_v))
-
-        # Update coriolis quiver (remove zero vals and scale down)
-        data_u = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
-        data_v = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
-
-        data_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.dbg_coriolis_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-        data_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.dbg_coriolis_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-        for i in range(self.wld_ref.grid_size):
-            for j in range(self.wld_ref.grid_size):
-                if data_u[i, j] == 0:
-                    data_u[i, j] = 0.0000000000000000000000000000001
-
-                if data_v[i, j] == 0:
-                    data_v[i, j] = 0.0000000000000000000000000000001
-
-        if self.show_coriolis.get():
-            self.graph_c_arrows.set_visible(True)
+# Commands
+    def refresh(self, snapshot=None, throttle=False):
+        # Draw the given snapshot, or the latest snapshot of the running sim, or the World itself if there is no sim
+        # If throttle, the contour is only redrawn when the pressure has changed enough, see ClWxSim.ui.render.ContourThrottle
+        if snapshot == None and self.ctrl_ref != None and self.ctrl_ref.sim_thread != None:
+            with self.ctrl_ref.sim_thread.snapshot() as snapshot:
+                if snapshot != None:
+                    self.refresh(snapshot, throttle)
+                    return
+
+        if snapshot == None:
+            data = self.wld_ref
         else:
-            self.graph_c_arrows.set_visible(False)
-
-        self.graph_c_arrows.set_UVC(np.transpose(data_u), np.transpose(data_v))
-
-        # Update PGF quiver (remove zero vals and scale down)
-        data_u = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
-        data_v = np.zeros((self.wld_ref.grid_size, self.wld_ref.grid_size))
+            data = snapshot
+            self.shown_tick = snapshot.tick
 
-        data_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.air_pressure_grad_u[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
-        data_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size] = self.wld_ref.air_pressure_grad_v[0:self.wld_ref.grid_size, 0:self.wld_ref.grid_size]
+        self.pyramid.update(data)
 
-        for i in range(self.wld_ref.grid_size):
-            for j in range(self.wld_ref.grid_size):
-                if data_u[i, j] == 0:
-                    data_u[i, j] = 0.0000000000000000000000000000001
+        # Update contour
+        if not throttle or self.contour_throttle.due(self.pyramid.get("air_pressure", self.view_level(CONTOUR_POINTS))):
+            self.draw_contour()
 
-                if data_v[i, j] == 0:
-                    data_v[i, j] = 0.0000000000000000000000000000001
-
-        if self.show_pgf.get():
-            self.graph_g_arrows.set_visible(True)
-        else:
-            self.graph_g_arrows.set_visible(False)
-
-        self.graph_g_arrows.set_UVC(np.transpose(data_u), np.transpose(data_v))
+        # Update img
+        level = self.view_level()
+        pressure = self.pyramid.get("air_pressure", level)
+        self.graph_img.set_data(pressure)
+        self.graph_img.set_extent(self.pyramid.extent(level))
+        self.graph_img.set_clim([pressure.min(), pressure.max()])
+
+        # Update quivers, only those shown
+        if (self.pyramid.n, self.view_level(QUIVER_ARROWS, at_most=True)) != self.quiver_shape:
+            self.create_quivers()
+
+        self.update_quiver(self.graph_w_arrows, self.show_wind.get(), "air_vel_u", "air_vel_v")
+        self.update_quiver(self.graph_c_arrows, self.show_coriolis.get(), "dbg_coriolis_u", "dbg_coriolis_v")
+        self.update_quiver(self.graph_g_arrows, self.show_pgf.get(), "air_pressure_grad_u", "air_pressure_grad_v")
+
+    def toggle_layer(self):
+        # Show or hide a quiver straight away, hidden quivers are not kept up to date
+        if self.wld_ref != None:
+            self.refresh()
@@ -140,8 +140,9 @@ class SimTestsPage(tk.Frame):
         mask = (x[np.newaxis,:] - cx) ** 2 + (y[:,np.newaxis] - cy) ** 2 < r ** 2
         src[mask] = val
 
-        # Add source array to pressure
-        solver.add_source(self.wld_ref.wld_grid_size, arr, src, self.wld_ref.dt)
+        # Add source array to pressure, between ticks if the sim is running
+        with self.cont.frames[SimControlPage].world_lock():
+            solver.add_source(self.wld_ref.wld_grid_size, arr, src, self.wld_ref.dt)
 
 # Commands
     def preset_A(self):
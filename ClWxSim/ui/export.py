@@ -0,0 +1,260 @@
+"""Contains the FrameExporter, which renders and encodes images of World fields in worker processes, off the tick thread
+
+Submitting a frame only copies the fields it is drawn from, the frame is rendered (and for image sequences, encoded
+and written) by a pool of worker processes, so neither ticks nor the GUI wait for matplotlib or the disk. At most
+queue_size frames are in flight, submit waits for room beyond that so a slow disk holds the sim back rather than
+filling memory.
+
+Frames are written either as an image sequence, a PNG per frame named from a path holding "{tick}", or into a single
+video (or animated GIF) file, any container ffmpeg can write, with the frames piped to ffmpeg in tick order.
+"""
+
+import multiprocessing
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ClWxSim.ui.render import CONTOUR_POINTS, QUIVER_ARROWS, contour_data, quiver_grid, quiver_uv, stride
+from ClWxSim.utils.logging import Logger
+
+IMAGE_FORMATS = (".png",)
+
+# World arrays each frame is drawn from, if no fields are given
+EXPORT_FIELDS = ("air_pressure", "air_vel_u", "air_vel_v")
+
+def write_png(path, image, level=6):
+    """Writes an RGB or RGBA image (a (height, width, 3 or 4) uint8 array, top row first) to a PNG file"""
+
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width, channels = image.shape
+    if channels not in (3, 4):
+        raise ValueError("Expected an RGB or RGBA image, not {} channels".format(channels))
+
+    # Every row starts with its filter type, 0 (none)
+    rows = np.zeros((height, 1 + width * channels), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, -1)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2 if channels == 3 else 6, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), level)))
+        f.write(chunk(b"IEND", b""))
+
+def render_frame(fields, tick, title="Pressure (mbar) and Wind Map", size=(6., 6.), dpi=100, contour=True, arrows=True):
+    """returns an RGB image (a (height, width, 3) uint8 array) of the pressure, its contour and the wind, drawn like the data page
+
+    matplotlib is only imported here, by the worker processes, and through its object oriented API so whatever
+    backend the GUI uses is left alone.
+
+    Args:
+        fields (dict): World arrays by name, air_pressure and (for arrows) air_vel_u and air_vel_v
+        tick (int): The tick the fields are from, shown in the title
+        title (str, optional): Title of the graph, defaults to "Pressure (mbar) and Wind Map"
+        size (tuple of float, optional): Size of the image in inches, defaults to (6, 6)
+        dpi (int, optional): Pixels per inch, defaults to 100
+        contour (bool, optional): If true, draw pressure contours, defaults to True
+        arrows (bool, optional): If true, draw wind arrows, defaults to True
+    """
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    pressure = fields["air_pressure"]
+    n = pressure.shape[-1]
+
+    fig = Figure(figsize=size, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_title("{}, tick {}".format(title, tick))
+    ax.xaxis.set_ticks([])
+    ax.yaxis.set_ticks([])
+
+    img = ax.imshow(pressure, cmap="coolwarm", alpha=0.5, origin="lower")
+    fig.colorbar(img, ax=ax)
+    if contour and np.ptp(pressure) > 0:
+        ax.contour(*contour_data(pressure, stride(n, CONTOUR_POINTS)), 16, colors="black", alpha=0.5)
+    if arrows and "air_vel_u" in fields:
+        step = stride(n, QUIVER_ARROWS)
+        ax.quiver(*quiver_grid(n, step), *quiver_uv(fields["air_vel_u"], fields["air_vel_v"], step), alpha=0.5)
+
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba())[..., :3].copy()
+
+def _export(render, options, fields, tick, path):
+    """Renders one frame in a worker process, writes it to path if given, otherwise returns it"""
+
+    image = render(fields, tick, **options)
+    if path is None:
+        return image
+    write_png(path, image)
+
+class FrameExporter:
+    """Renders frames of World fields in worker processes and writes them as an image sequence or a video, see the module docstring
+
+    Attributes:
+        path (str): The image path, holding "{tick}", or the video file
+        every (int): Tick interval between frames, see after_tick
+        fields (tuple of str): World arrays each frame is drawn from
+        queue_size (int): Most frames in flight before submit waits
+        exported (int): Number of frames written
+        in_flight (int): Number of frames submitted but not yet written
+        error (Exception or None): The error raised by the last frame that failed, frames after it carry on
+    """
+
+    def __init__(self, path, every=1, fields=EXPORT_FIELDS, processes=1, queue_size=None, fps=30, render=render_frame, ffmpeg="ffmpeg", **options):
+        """Creates a new FrameExporter and its worker processes
+
+        Args:
+            path (str): A path ending in .png holding "{tick}" (replaced by each frame's tick) for an image sequence,
+                anything else is a video file written by ffmpeg, its type taken from the extension (eg .mp4, .webm or .gif)
+            every (int, optional): Export a frame every this many ticks, see after_tick, defaults to 1
+            fields (tuple of str, optional): World arrays each frame is drawn from, defaults to EXPORT_FIELDS
+            processes (int, optional): Number of worker processes, defaults to 1
+            queue_size (int, optional): Most frames in flight before submit waits, defaults to twice the processes
+            fps (float, optional): Frame rate of a video, defaults to 30
+            render (function, optional): Called in the workers with (fields, tick, **options) to draw an RGB image,
+                must be importable by the workers, defaults to render_frame
+            ffmpeg (str, optional): The ffmpeg program, for videos, defaults to "ffmpeg"
+            options: Passed on to render, eg size and dpi
+        """
+
+        if every < 1 or processes < 1:
+            raise ValueError("every and processes must be at least 1")
+
+        self.path = path
+        self.every = every
+        self.fields = tuple(fields)
+        self.queue_size = queue_size or 2 * processes
+        self.fps = fps
+        self.render = render
+        self.options = options
+        self.exported = 0
+        self.in_flight = 0
+        self.error = None
+        self.logger = Logger(log_ID="frame_exporter")
+
+        self.video = os.path.splitext(path)[1].lower() not in IMAGE_FORMATS
+        if self.video:
+            self._ffmpeg = shutil.which(ffmpeg)
+            if self._ffmpeg is None:
+                raise RuntimeError("ffmpeg ({}) was not found, it is needed to write video, export an image sequence (a .png path holding {{tick}}) instead".format(ffmpeg))
+        elif "{tick" not in path:
+            raise ValueError("An image sequence path must hold {{tick}}, not {}".format(path))
+        self._encoder = None
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        # Workers are spawned, not forked, this process is running threads (Tk, the sim and log threads) whose locks a fork could copy held
+        self._pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.Semaphore(self.queue_size)
+        self._count_lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._writer = threading.Thread(target=self._write_frames, name="ClWxSim frame writer", daemon=True)
+        self._writer.start()
+        self._closed = False
+
+    def ready(self):
+        """returns True if a frame can be submitted without waiting"""
+        return self.in_flight < self.queue_size
+
+    def submit(self, data, tick):
+        """Copies the fields of a World or Snapshot and queues a frame of them, waiting while queue_size frames are in flight
+
+        Args:
+            data (World or Snapshot): Holds the fields as attributes
+            tick (int): The tick the fields are from
+        """
+
+        if self._closed:
+            raise ValueError("FrameExporter is closed")
+
+        # Copied now, the arrays are sent to the worker later while the World carries on
+        fields = {name: np.array(getattr(data, name)) for name in self.fields}
+        self._slots.acquire()
+        with self._count_lock:
+            self.in_flight += 1
+        path = None if self.video else self.path.format(tick=tick)
+        self._pending.put((tick, self._pool.submit(_export, self.render, self.options, fields, tick, path)))
+
+    def after_tick(self, sim):
+        """Submits a frame of the Controller's World if one is due after its latest tick"""
+        if sim.tickNum % self.every == 0:
+            self.submit(sim.world, sim.tickNum)
+
+    def _write_frames(self):
+        """Waits for each frame in the order submitted, piping video frames to ffmpeg, until sent None"""
+
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            tick, future = item
+            try:
+                image = future.result()
+                if self.video:
+                    self._encode(image)
+                self.exported += 1
+            except Exception as e:
+                self.error = e
+                self.logger.error("Error exporting frame of tick {}: [{}]", tick, e)
+            finally:
+                with self._count_lock:
+                    self.in_flight -= 1
+                self._slots.release()
+
+        if self._encoder is not None:
+            self._encoder.stdin.close()
+            if self._encoder.wait() != 0:
+                self.error = RuntimeError("ffmpeg exited with code {} writing {}".format(self._encoder.returncode, self.path))
+                self.logger.error("{}", self.error)
+
+    def _encode(self, image):
+        """Pipes a frame to ffmpeg, starting it on the first frame, once the frame size is known"""
+
+        if self._encoder is None:
+            height, width = image.shape[:2]
+            args = [self._ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                    "-s", "{}x{}".format(width, height), "-r", str(self.fps), "-i", "-"]
+            if not self.path.lower().endswith(".gif"):
+                # Most players only read yuv420p, which needs an even width and height
+                args += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p"]
+            self._encoder = subprocess.Popen(args + [self.path], stdin=subprocess.PIPE)
+            self._size = image.shape
+        if image.shape != self._size:
+            raise ValueError("Frame is {}, the video's frames are {}".format(image.shape, self._size))
+        self._encoder.stdin.write(np.ascontiguousarray(image, dtype=np.uint8).tobytes())
+
+    def wait(self):
+        """Waits for every frame submitted so far to be written"""
+        for k in range(self.queue_size):
+            self._slots.acquire()
+        for k in range(self.queue_size):
+            self._slots.release()
+
+    def close(self):
+        """Writes every frame submitted, finishes the video (if any) and stops the worker processes"""
+
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.put(None)
+        self._writer.join()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,69 +1,64 @@
-import numpy as np
-
-import matplotlib.pyplot as plt
+from types import SimpleNamespace
 
-import tkinter
-
-import keyboard
+import numpy as np
 
-from ClWxSim.data.world import World
-from ClWxSim.sim.controller import Controller as Control
+from ClWxSim.data.World import World
+from ClWxSim.sim.Controller import Controller as Control
 
 import ClWxSim.sim.fluid_solver as solver
 
+from ClWxSim.ui.pyramid import ViewPyramid, axes_level
+
 from ClWxSim.utils.logging import Logger
 
 cbar_arr = []
 
+# Heatmaps drawn by startHeatmap: (axes row, axes column, field, colour map, title)
+HEATMAPS = ((0, 0, "air_pressure", 'hot', 'Pressure (mbar) Map'),
+            (0, 1, "air_pressure_grad_u", 'Greys', 'Pressure Gradient [u] Map'),
+            (0, 2, "air_pressure_grad_v", 'Greys', 'Pressure Gradient [v] Map'),
+            (1, 0, "air_vel_u", 'hot', 'Wind [u] Map'),
+            (1, 1, "air_vel_v", 'hot', 'Wind [v] Map'))
 
-def startHeatmap(axar, array1, array2, array3, world):
-    global im0, im1, im2, im3, im4
-    im0 = axar[0,0].imshow(array1, cmap='hot')
-    axar[0,0].set_title('Pressure (mbar) Map')
-    plt.colorbar(im0, ax=axarr[0,0])
+pyramid = ViewPyramid()     # Downsampled copies of the fields, each heatmap is drawn at the resolution it is shown at
+images = {}
 
+def heatmap_fields(array1, array2, array3, world):
     full_grad_u, full_grad_v = world.calcPressureGrad(array1)
+    return SimpleNamespace(air_pressure=array1, air_vel_u=array2, air_vel_v=array3, air_pressure_grad_u=full_grad_u, air_pressure_grad_v=full_grad_v)
 
-    im3 = axar[0,1].imshow(full_grad_u, cmap='Greys')
-    axar[0,1].set_title('Pressure Gradient [u] Map')
-    plt.colorbar(im3, ax=axarr[0,1])
-
-    im4 = axar[0,2].imshow(full_grad_v, cmap='Greys')
-    axar[0,2].set_title('Pressure Gradient [v] Map')
-    plt.colorbar(im4, ax=axarr[0,2])
-
-    im1 = axar[1,0].imshow(array2, cmap='hot')
-    axarr[1,0].set_title('Wind [u] Map')
-    plt.colorbar(im1, ax=axarr[1,0])
+def startHeatmap(axar, array1, array2, array3, world):
+    import matplotlib.pyplot as plt
 
-    im2 = axar[1,1].imshow(array3, cmap='hot')
-    axar[1,1].set_title('Wind [v] Map')
-    plt.colorbar(im2, ax=axarr[1,1])
+    pyramid.update(heatmap_fields(array1, array2, array3, world))
 
+    for row, col, name, cmap, title in HEATMAPS:
+        level = axes_level(axar[row, col], pyramid.n)
+        images[name] = axar[row, col].imshow(pyramid.get(name, level), cmap=cmap, extent=pyramid.extent(level, origin='upper'))
+        axar[row, col].set_title(title)
+        plt.colorbar(images[name], ax=axar[row, col])
 
     plt.pause(0.00001)
 
 def loadHeatmap(axar, array1, array2, array3, world):
-    im0.set_array(array1)
-    im0.set_clim([array1.min(), array1.max()])
-
-    full_grad_u, full_grad_v = world.calcPressureGrad(array1)
+    import matplotlib.pyplot as plt
 
-    im3.set_array(full_grad_u)
-    im3.set_clim([full_grad_u.min(), full_grad_u.max()])
+    pyramid.update(heatmap_fields(array1, array2, array3, world))
 
-    im4.set_array(full_grad_v)
-    im4.set_clim([full_grad_v.min(), full_grad_v.max()])
-
-    im1.set_array(array2)
-    im1.set_clim([array2.min(), array2.max()])
-
-    im2.set_array(array3)
-    im2.set_clim([array3.min(), array3.max()])
+    for row, col, name, cmap, title in HEATMAPS:
+        level = axes_level(axar[row, col], pyramid.n)
+        data = pyramid.get(name, level)
+        images[name].set_data(data)
+        images[name].set_extent(pyramid.extent(level, origin='upper'))
+        images[name].set_clim([data.min(), data.max()])
 
     plt.pause(0.00001)
 
 if __name__ == "__main__":
+    # Only imported when run as a script, so importing this module does not need a display or keyboard access
+    import matplotlib.pyplot as plt
+    import keyboard
+
     logger = Logger(log_ID="ui")
 
     wld = World(world_name="world", wld_grid_size=100)
@@ -112,15 +107,15 @@ if __name__ == "__main__":
         try:
             sim.tick()
         except Exception as e:
-            logger.log("Error during tick {}: [{}]".format(sim.tickNum, e))
+            logger.error("Error during tick {}: [{}]", sim.tickNum, e)
             break
 
         if keyboard.is_pressed('s'):
             loadHeatmap(axarr, wld.air_pressure, wld.air_vel_u, wld.air_vel_v, wld)
-            logger.log("Showing data for tick {}".format(sim.tickNum))
+            logger.log("Showing data for tick {}", sim.tickNum)
 
         elif sim.tickNum % 100 == 0:
-            logger.log("Reached tick {}".format(sim.tickNum))
+            logger.log("Reached tick {}", sim.tickNum)
 
         ## Output average difference between current and previous pressure maps to check the data isnt blowing up
         # if sim.tickNum % 5 == 0:
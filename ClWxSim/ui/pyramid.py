@@ -0,0 +1,132 @@
+"""Contains the ViewPyramid, which serves World fields downsampled to the resolution they are displayed at
+
+Level k of the pyramid averages blocks of 2^k by 2^k cells (blocks at the far edges may be smaller, and are
+averaged over the cells they hold). Winds are averaged a component at a time, so each block's arrow is the mean
+wind vector of its cells, not a sample of one of them. Levels are only worked out when asked for, once per update,
+so the levels no graph is showing cost nothing.
+
+Graph coordinates follow imshow: cell i is centred on i, so contours and arrows at coords() line up with the
+image drawn over extent().
+"""
+
+import numpy as np
+
+def pool(arr, factor):
+    """returns the mean of every factor by factor block of the last two axes of arr, blocks at the far edges may be smaller"""
+
+    if factor == 1:
+        return arr
+    rows = np.arange(0, arr.shape[-2], factor)
+    cols = np.arange(0, arr.shape[-1], factor)
+    sums = np.add.reduceat(np.add.reduceat(arr, rows, axis=-2), cols, axis=-1)
+    counts = np.outer(np.diff(np.append(rows, arr.shape[-2])), np.diff(np.append(cols, arr.shape[-1])))
+    return sums / counts
+
+def centres(n, factor):
+    """returns the graph coordinates of the centres of the blocks along a side of n cells, cell i being centred on i
+
+    A smaller block at the far edge is centred on its own cells, rather than on the whole block extent() draws for it.
+    """
+    starts = np.arange(0, n, factor)
+    return starts + (np.minimum(factor, n - starts) - 1) / 2
+
+def level_for(cells, points, at_most=False):
+    """returns the coarsest level that still shows at least points blocks (or every cell, if fewer) along cells cells
+
+    Args:
+        cells (float): Number of cells along the side of the view, eg the zoomed in part of the grid
+        points (float): Blocks wanted along that side, eg the width of the graph in pixels
+        at_most (bool, optional): If true, return the finest level showing at most points blocks instead, eg for arrows, defaults to False
+    """
+
+    if points <= 0 or cells <= points:
+        return 0
+    if at_most:
+        return int(np.ceil(np.log2(cells / points)))
+    return int(np.log2(cells / points))
+
+def axes_level(ax, n, points=None, at_most=False):
+    """returns the level that matches a matplotlib Axes, one block per pixel of the cells in view (or points blocks, if fewer)
+
+    Args:
+        ax (matplotlib Axes): The graph the grid is drawn on, its size and zoom (x limits) are used
+        n (int): Number of cells along a side of the grid
+        points (int, optional): Blocks wanted along the side in view, if fewer than the width of ax in pixels, defaults to None
+        at_most (bool, optional): If true, show at most points blocks rather than at least, see level_for, defaults to False
+    """
+
+    pixels = ax.get_window_extent().width
+    if points is not None:
+        pixels = min(pixels, points)
+    left, right = ax.get_xlim()
+    return level_for(min(abs(right - left), n), pixels, at_most)
+
+class ViewPyramid:
+    """Downsampled copies of a World's (or Snapshot's) fields, see the module docstring
+
+    Attributes:
+        data (World or Snapshot): Holds the full resolution fields as attributes
+        n (int): Number of cells along a side of the full resolution grid
+    """
+
+    def __init__(self, data=None):
+        """Creates a new ViewPyramid, optionally of data, see update"""
+        self.data = None
+        self.n = 0
+        self._levels = {}
+        if data is not None:
+            self.update(data)
+
+    def update(self, data):
+        """Points the pyramid at new fields, eg the latest snapshot, levels are worked out again as they are asked for"""
+        self.data = data
+        self.n = data.air_pressure.shape[-1]
+        self._levels = {}
+
+    def get(self, name, level=0):
+        """returns the field downsampled to a level, level 0 is the field itself
+
+        Args:
+            name (str): Name of the field
+            level (int, optional): Level of the pyramid, each level halves the resolution, defaults to 0
+        """
+
+        if level == 0:
+            return getattr(self.data, name)
+        key = (name, level)
+        if key not in self._levels:
+            # A finer level already worked out is pooled again if its blocks tile the grid exactly, it is smaller
+            finer = level - 1
+            if (name, finer) in self._levels and self.n % 2 ** level == 0:
+                self._levels[key] = pool(self._levels[(name, finer)], 2)
+            else:
+                self._levels[key] = pool(getattr(self.data, name), 2 ** level)
+        return self._levels[key]
+
+    def vectors(self, u, v, level=0):
+        """returns (U, V), the mean wind (or other vector) of every block of a level, see get"""
+        return self.get(u, level), self.get(v, level)
+
+    def coords(self, level=0):
+        """returns the graph coordinates of the block centres along a side at a level"""
+        return centres(self.n, 2 ** level)
+
+    def grid(self, level=0):
+        """returns (X, Y), the graph coordinates of every block centre at a level, eg for a quiver"""
+        c = self.coords(level)
+        return np.meshgrid(c, c)
+
+    def extent(self, level=0, origin="lower"):
+        """returns the (left, right, bottom, top) imshow extent that lines a level up with the full resolution grid
+
+        A smaller block at the far edge is drawn as wide as the rest, so it overhangs the grid by part of a block.
+
+        Args:
+            level (int, optional): Level of the pyramid drawn, defaults to 0
+            origin (str, optional): The imshow origin, "lower" or "upper", defaults to "lower"
+        """
+        factor = 2 ** level
+        size = -(-self.n // factor) * factor
+        if origin == "upper":
+            return (-0.5, size - 0.5, size - 0.5, -0.5)
+        return (-0.5, size - 0.5, -0.5, size - 0.5)
@@ -0,0 +1,84 @@
+"""Contains array functions preparing World fields for the data page's graphs, kept free of matplotlib and tkinter
+
+Arrows are drawn on a grid subsampled to about QUIVER_ARROWS per side whatever the World's size, and contours
+from pressure subsampled to about CONTOUR_POINTS per side, a screen can not show more than that anyway.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+QUIVER_ARROWS = 32      # Arrows drawn along each side of the grid
+CONTOUR_POINTS = 256    # Most points along each side of the grid contours are drawn from
+QUIVER_ZERO = 1e-31     # Zero vectors are drawn as this, so every arrow keeps a direction
+
+def stride(n, points):
+    """returns the step between cells that keeps at most points cells of the n along a side"""
+    return max(1, -(-n // points))
+
+@lru_cache(maxsize=8)
+def coords(n, step):
+    """returns the graph coordinates of every step'th cell along a side of n cells, cell i is centred on i as imshow draws it"""
+    c = np.arange(0, n, step, dtype=float)
+    c.setflags(write=False)
+    return c
+
+@lru_cache(maxsize=8)
+def quiver_grid(n, step):
+    """returns (X, Y), the graph coordinates of the arrows for an n by n grid drawn every step'th cell"""
+    X, Y = np.meshgrid(coords(n, step), coords(n, step))
+    X.setflags(write=False)
+    Y.setflags(write=False)
+    return X, Y
+
+def quiver_uv(u, v, step=1):
+    """returns (U, V), the vectors of the arrows drawn every step'th cell, with zeros swapped for QUIVER_ZERO
+
+    Args:
+        u (2D array): The x components, indexed [y, x] like imshow
+        v (2D array): The y components
+        step (int, optional): Step between the cells arrows are drawn for, see stride, defaults to 1 (every cell)
+    """
+    u = u[::step, ::step]
+    v = v[::step, ::step]
+    return np.where(u == 0, QUIVER_ZERO, u), np.where(v == 0, QUIVER_ZERO, v)
+
+def contour_data(pressure, step):
+    """returns (x, y, Z) to draw contours of pressure from every step'th cell"""
+    n = pressure.shape[-1]
+    return coords(n, step), coords(pressure.shape[-2], step), pressure[::step, ::step]
+
+class ContourThrottle:
+    """Decides when a contour is worth redrawing, contouring a large grid takes far longer than the rest of a refresh
+
+    A contour is redrawn once at least min_frames refreshes have passed since the last was drawn, and only if the
+    field has since changed somewhere by more than threshold times the spacing between contour levels.
+
+    Attributes:
+        threshold (float): Smallest change worth redrawing for, as a fraction of the spacing between levels
+        min_frames (int): Fewest refreshes between contours
+        levels (int): Number of contour levels drawn
+    """
+
+    def __init__(self, threshold=0.25, min_frames=5, levels=16):
+        self.threshold = threshold
+        self.min_frames = min_frames
+        self.levels = levels
+        self.frames = 0
+        self.last = None
+
+    def due(self, field):
+        """returns True if the contour of field should be redrawn, called once per refresh"""
+
+        self.frames += 1
+        if self.last is None or self.last.shape != field.shape:
+            return True
+        if self.frames < self.min_frames:
+            return False
+        spacing = np.ptp(self.last) / self.levels
+        return np.max(np.abs(field - self.last)) > self.threshold * spacing
+
+    def drawn(self, field):
+        """Records that the contour of field has been drawn"""
+        self.last = np.array(field)
+        self.frames = 0
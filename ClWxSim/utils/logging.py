@@ -1,37 +1,225 @@
+"""Contains the Logger, which hands log lines to a background writer thread so logging never waits on the disk
+
+Every Logger shares one writer thread. log only checks the level and queues the message, the writer formats
+queued lines, writes them in batches to log files it keeps open, echoes them to the console and starts a new
+file once one grows past its Logger's maxSize. Call flush to wait for everything logged so far to be written,
+it is called on exit.
+
+Log files are written to log_dir, named "<log ID><date>-<time>.LOG".
+"""
+
+import atexit
 import os
+import queue
+import sys
+import threading
 import time
+from collections import OrderedDict
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+log_dir = os.path.join(os.path.dirname(__file__), "LOGS")	# Folder log files are written to
+default_level = INFO	# Level of new Loggers
+echo = True				# If true, log lines are also written to the console
+max_open_files = 32		# Most log files the writer keeps open at once
+
+_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
 
 class Logger:
+	"""Writes timestamped lines to its own log file, see the module docstring
+
+	Attributes:
+		log_ID (str): Start of the log file names
+		level (int): Messages below this level (DEBUG, INFO, WARNING or ERROR) are dropped before they are formatted
+		maxSize (float): Size a log file can grow to before a new one is started, in MB
+	"""
 
-	currentLogName = ""
-	log_loc = ""
-	maxSize = 512	# max size of log files before a new one is created, in MB
+	def __init__(self, log_ID="main", maxSize=512, level=None):
+		"""Creates a new Logger, its log file is only made once something is written to it
+
+		Args:
+			log_ID (str, optional): Start of the log file names, defaults to "main"
+			maxSize (float, optional): Size a log file can grow to before a new one is started, in MB, defaults to 512
+			level (int, optional): Lowest level of message to write, defaults to logging.default_level
+		"""
 
-	def __init__(self, log_ID="main", maxSize=512):
 		self.log_ID = log_ID
-		self.currentLogName = "LOGS\\{}{}.LOG".format(self.log_ID, str(time.strftime('%Y%m%d-%H%M%S')))
-		self.log_loc = os.path.join(os.path.dirname(__file__), self.currentLogName)
 		self.maxSize = maxSize
-		print(self.log_loc)
+		self.level = default_level if level is None else level
+
+		# Only used by the writer thread
+		self.log_loc = None
+		self._size = 0
+
+	def enabled(self, level):
+		"""returns True if messages of this level are written, eg to skip building an expensive message"""
+		return level >= self.level
+
+	def log(self, txt, *args, level=INFO):
+		"""Queues a line for the log file, formatted with txt.format(*args) on the writer thread if any args are given
+
+		Args:
+			txt (str): The message, or a format string for args
+			args: Values for the format string, only formatted if the message is written
+			level (int, optional): DEBUG, INFO, WARNING or ERROR, defaults to INFO
+		"""
+
+		if level < self.level:
+			return
+		_submit((self, level, time.time(), txt, args))
+
+	def debug(self, txt, *args):
+		self.log(txt, *args, level=DEBUG)
+
+	def info(self, txt, *args):
+		self.log(txt, *args, level=INFO)
+
+	def warning(self, txt, *args):
+		self.log(txt, *args, level=WARNING)
+
+	def error(self, txt, *args):
+		self.log(txt, *args, level=ERROR)
+
+	def flush(self):
+		"""Waits for everything logged so far (by any Logger) to be written"""
+		flush()
+
+def _submit(item):
+	"""Queues an item for the writer thread, starting the thread first if it is not running (eg in a forked process)"""
+
+	if _writer is None or not _writer.is_alive():
+		_start_writer()
+	_queue.put(item)
+
+def _start_writer():
+	global _writer
+	with _writer_lock:
+		if _writer is None or not _writer.is_alive():
+			_writer = threading.Thread(target=_run, args=(_queue,), name="ClWxSim log writer", daemon=True)
+			_writer.start()
+
+def flush(timeout=10.):
+	"""Waits (up to timeout seconds) for everything logged so far to be written, returns False if it timed out"""
+
+	if _writer is None or not _writer.is_alive():
+		return True
+	done = threading.Event()
+	_queue.put(done)
+	return done.wait(timeout)
+
+def shutdown(timeout=10.):
+	"""Writes everything logged so far, then closes the log files and stops the writer thread, logging again starts a new one"""
+
+	global _writer
+	if _writer is None or not _writer.is_alive():
+		return
+	_queue.put(None)
+	_writer.join(timeout)
+	_writer = None
+
+atexit.register(shutdown)
+
+def _reset_after_fork():
+	"""Gives a forked child its own queue, the parent's writer thread does not exist in the child"""
+	global _queue, _writer, _writer_lock
+	_queue = queue.SimpleQueue()
+	_writer = None
+	_writer_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _format(level, created, txt, args):
+	if args:
+		txt = txt.format(*args)
+	return "{} {} >>> {}\n".format(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created)), LEVEL_NAMES.get(level, level), txt)
+
+def _new_file(logger):
+	"""Points the Logger at a new log file, named by the time (and a count, if that name is taken)"""
+
+	os.makedirs(log_dir, exist_ok=True)
+	base = os.path.join(log_dir, "{}{}".format(logger.log_ID, time.strftime('%Y%m%d-%H%M%S')))
+	path = base + ".LOG"
+	count = 1
+	while os.path.exists(path):
+		path = "{}-{}.LOG".format(base, count)
+		count += 1
+	logger.log_loc = path
+	logger._size = 0
+
+def _run(items):
+	"""Writes queued lines until it is sent None, each batch of lines is written and flushed together"""
+
+	files = OrderedDict()	# Open log files by path, least recently used first
+
+	def handle(path):
+		f = files.pop(path, None)
+		if f is None:
+			if len(files) >= max_open_files:
+				files.popitem(last=False)[1].close()
+			f = open(path, "a")
+		files[path] = f
+		return f
+
+	while True:
+		batch = [items.get()]
+		while True:
+			try:
+				batch.append(items.get_nowait())
+			except queue.Empty:
+				break
 
-	def convertBytesToMB(self, num):
-		mb = num/1000000
-		return mb
+		stop = False
+		waiting = []
+		touched = set()
+		console = []
+		for item in batch:
+			if item is None:
+				stop = True
+				continue
+			if isinstance(item, threading.Event):
+				waiting.append(item)
+				continue
 
-	def fileSize(self, filePath):
-		if os.path.isfile(filePath):
-			fileInfo = os.stat(filePath)
-			return self.convertBytesToMB(fileInfo.st_size)
-		return 0
+			logger, level, created, txt, args = item
+			try:
+				line = _format(level, created, txt, args)
+			except Exception as e:
+				line = _format(ERROR, created, "Could not format log message {!r}: [{}]".format(txt, e), ())
 
-	def log(self, txt):
-		if self.fileSize(self.log_loc) > self.maxSize:
-			self.currentLogName = "LOGS\\{}{}.LOG".format(self.log_ID, str(time.strftime('%Y%m%d-%H%M%S')))
-			self.log_loc = os.path.join(os.path.dirname(__file__), self.currentLogName)
+			try:
+				# Rotating here keeps the stat and the new file off the thread that logged
+				if logger.log_loc is None or logger._size + len(line) > logger.maxSize * 1000000:
+					if logger.log_loc is not None and logger.log_loc in files:
+						files.pop(logger.log_loc).close()
+					_new_file(logger)
+				handle(logger.log_loc).write(line)
+				logger._size += len(line)
+				touched.add(logger.log_loc)
+			except OSError as e:
+				console.append(_format(ERROR, created, "Could not write to log file {}: [{}]".format(logger.log_loc, e), ()))
+			if echo:
+				console.append(line)
 
-		updateText = time.strftime("%Y-%m-%d %H:%M:%S") + " >>> " + txt + "\n"
-		print(updateText)
+		for path in touched:
+			if path in files:
+				files[path].flush()
+		if console:
+			try:
+				sys.stdout.write("".join(console))
+				sys.stdout.flush()
+			except Exception:
+				pass
+		for done in waiting:
+			done.set()
 
-		f_Log = open(self.log_loc, 'a+')
-		f_Log.write(updateText)
-		f_Log.close()
+		if stop:
+			for f in files.values():
+				f.close()
+			return
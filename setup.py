@@ -10,5 +10,7 @@ setup(
     install_requires=[
     'Cython',
     'numpy',
-    'matplotlib']
+    'matplotlib'],
+    extras_require={
+    'jit': ['numba']}
 )